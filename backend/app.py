@@ -21,6 +21,10 @@ from routers.payments import payments_router
 from services.sales_agent import sales_agent_router
 from routers.inventory import inventory_router
 from routers.loyalty import loyalty_router
+from routers.events import events_router
+from routers.recommendation import recommendation_router
+from services.product_store import start_catalog_sync
+from services.stock_reservations import start_hold_sync
 
 # Create FastAPI app
 app = FastAPI(
@@ -51,6 +55,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Total-Count", "X-Next-Offset"],
 )
 
 # Root health check
@@ -62,6 +67,13 @@ def root():
         "version": "1.0.0"
     }
 
+# Log checkout holds and sales into the inventory, and follow catalog
+# reloads from other workers, off the request path
+@app.on_event("startup")
+def start_background_sync():
+    start_hold_sync()
+    start_catalog_sync()
+
 # APIs Registration
 app.include_router(
     catalog_router,
@@ -110,3 +122,15 @@ app.include_router(
     prefix="/api/loyalty",
     tags=["Loyalty"]
 )
+
+app.include_router(
+    events_router,
+    prefix="/api",
+    tags=["Events"]
+)
+
+app.include_router(
+    recommendation_router,
+    prefix="/api",
+    tags=["Recommendations"]
+)
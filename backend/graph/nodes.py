@@ -7,9 +7,11 @@ import re
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from services.recommendation import recommend_products
+from services.fuzzy_match import closest_term
+from services.refinement import recommend_turn
 from services.cart_service import CartService
 from services.order_service import OrderService
+from services.stock_reservations import release, reserve
 
 
 def infer_params_from_text(text: str):
@@ -79,10 +81,17 @@ def infer_params_from_text(text: str):
     best_length = 0
     
     for token, (cat, sub) in cat_map.items():
-        if token in text_l and len(token) > best_length:
+        # Whole words only, plurals included ("heel" is not in "wheel")
+        if len(token) > best_length and re.search(rf"\b{re.escape(token)}(?:e?s)?\b", text_l):
             best_match = (cat, sub)
             best_length = len(token)
     
+    if not best_match:
+        # Tolerate typos in the keywords ("snekers", "kurtha")
+        typo = closest_term(text_l, list(cat_map))
+        if typo:
+            best_match = cat_map[typo]
+
     if best_match:
         params["category"] = best_match[0]
         params["sub_category"] = best_match[1]
@@ -225,7 +234,9 @@ async def processor_node(state):
                 # Router params take precedence when present
                 inferred = infer_params_from_text(user_msg)
                 merged_params = {**inferred, **(params or {})}
-                recs = recommend_products(customer_id, merged_params, user_msg)
+                recs, state["candidates"] = recommend_turn(
+                    customer_id, merged_params, user_msg, state.get("candidates")
+                )
                 results["recommendations"] = recs
                 results["recommendation_count"] = len(recs)
                 
@@ -247,8 +258,18 @@ async def processor_node(state):
                 cart = CartService.get_or_create_cart(customer_id)
                 totals = CartService.calculate_cart_total(cart)
                 
-                order = OrderService.create_order(customer_id, cart["items"], totals)
+                # Hold the stock until payment, as the checkout route does
+                reservation = reserve(cart["items"])
+                if "error" in reservation:
+                    results["order"] = reservation
+                    continue
+
+                order = OrderService.create_order(
+                    customer_id, cart["items"], totals, reservation_id=reservation["reservation_id"]
+                )
                 results["order"] = order
+                if "error" in order and reservation["reservation_id"]:
+                    release(reservation["reservation_id"])
                 
                 if order.get("order_id"):
                     # Initialize payment
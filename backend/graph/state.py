@@ -15,5 +15,7 @@ class AgentState(TypedDict, total=False):
     recommendations: List[Dict[str, Any]]
     inventory: Dict[str, Any]
     loyalty_quote: Dict[str, Any]
+    # Previous recommendation turn's candidates (services.refinement)
+    candidates: Optional[Dict[str, Any]]
 
     final_reply: str
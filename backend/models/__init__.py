@@ -47,6 +47,9 @@ class InventoryItem(BaseModel):
     store_type: str
     quantity_available: int
     last_updated: str
+    city: Optional[str] = None
+    # Units of quantity_available held by checkouts (services.stock_reservations)
+    quantity_reserved: int = 0
 
 
 class CartItem(BaseModel):
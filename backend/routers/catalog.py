@@ -1,26 +1,199 @@
 # backend/routers/catalog.py
-from fastapi import APIRouter, Query, HTTPException
+import hashlib
+import hmac
+import os
+
+from fastapi import APIRouter, Depends, Header, Query, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from typing import List, Optional
 
 from models import Product
-from services.catalog_service import list_products, get_product_by_sku
+from services.catalog_service import (
+    PRODUCT_FIELDS,
+    SORT_ORDERS,
+    CachedBody,
+    faceted_search,
+    get_suggestions,
+    listing_body,
+    product_body,
+)
+from services.product_store import ProductStore, catalog_status, get_store, start_reload
 
 catalog_router = APIRouter()
 
+# Clients must revalidate, but a matching ETag costs them a 304 and no body
+CACHE_CONTROL = "no-cache"
+
+# Token the admin routes require in X-Admin-Token; unset disables them
+ADMIN_TOKEN = os.getenv("CATALOG_ADMIN_TOKEN")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Catalog admin is disabled (CATALOG_ADMIN_TOKEN is not set)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def _etag(request: Request, store: ProductStore) -> str:
+    """
+    Strong ETag: the version of `store` plus a digest of the request URL.
+    Build the body from the same store, so a reload in between cannot pair
+    one version's ETag with another's body.
+    """
+    digest = hashlib.sha1(
+        f"{request.url.path}?{sorted(request.query_params.multi_items())}".encode()
+    ).hexdigest()[:16]
+    return f'"{store.version}-{digest}"'
+
+
+def _wants_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "").lower()
+
+
+def _gzip_etag(etag: str) -> str:
+    # Strong ETags must differ between the identity and gzip representations
+    return etag[:-1] + '-gz"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return header.strip() == "*" or etag in tags or _gzip_etag(etag) in tags
+
+
+def _json_response(request: Request, cached: CachedBody, headers: dict) -> Response:
+    """Send a pre-serialized body as-is, gzipped when the client accepts it"""
+    headers["Vary"] = "Accept-Encoding"
+    if cached.compressible and _wants_gzip(request):
+        headers["ETag"] = _gzip_etag(headers["ETag"])
+        headers["Content-Encoding"] = "gzip"
+        return Response(cached.gzipped(), media_type="application/json", headers=headers)
+    return Response(cached.body, media_type="application/json", headers=headers)
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in PRODUCT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return wanted
+
 
 @catalog_router.get("/products", response_model=List[Product])
 async def get_products(
+    request: Request,
     category: Optional[str] = Query(None),
     sub_category: Optional[str] = Query(None),
     max_price: Optional[int] = Query(None),
     color: Optional[str] = Query(None),
+    sort: Optional[str] = Query(None, pattern="^(" + "|".join(SORT_ORDERS) + ")$"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    fields: Optional[str] = Query(None, description="Comma-separated product fields to return"),
+):
+    """
+    Filtered catalog listing. The body stays a plain list of products;
+    pagination metadata is returned in X-Total-Count / X-Next-Offset.
+    """
+    wanted = _parse_fields(fields)
+    store = get_store()
+    etag = _etag(request, store)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    cached = listing_body(category, sub_category, max_price, color, sort, offset, limit, wanted, store)
+    headers["X-Total-Count"] = str(cached.total)
+    end = cached.total if limit is None else min(offset + limit, cached.total)
+    if end < cached.total:
+        headers["X-Next-Offset"] = str(end)
+    return _json_response(request, cached, headers)
+
+
+@catalog_router.get("/search")
+async def search_products(
+    request: Request,
+    q: Optional[str] = Query(None),
+    category: Optional[List[str]] = Query(None),
+    sub_category: Optional[List[str]] = Query(None),
+    brand: Optional[List[str]] = Query(None),
+    color: Optional[List[str]] = Query(None),
+    size: Optional[List[str]] = Query(None),
+    occasion: Optional[List[str]] = Query(None),
+    price_bucket: Optional[List[str]] = Query(None),
+    max_price: Optional[int] = Query(None),
+    sort: Optional[str] = Query(None, pattern="^(" + "|".join(SORT_ORDERS) + ")$"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(24, ge=1, le=500),
+    fields: Optional[str] = Query(None, description="Comma-separated product fields to return"),
 ):
-    return list_products(category, sub_category, max_price, color)
+    """
+    Faceted search: matching products plus per-facet counts. Repeat a
+    parameter to select several values (?color=Black&color=White).
+    """
+    wanted = _parse_fields(fields)
+    store = get_store()
+    etag = _etag(request, store)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    filters = {
+        "category": category,
+        "sub_category": sub_category,
+        "brand": brand,
+        "base_color": color,
+        "size": size,
+        "occasion": occasion,
+        "price_bucket": price_bucket,
+    }
+    result = faceted_search(filters, q, max_price, sort, offset, limit, wanted, store)
+    return JSONResponse(result, headers=headers)
+
+
+@catalog_router.get("/suggest")
+async def suggest(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(8, ge=1, le=20),
+):
+    """
+    Typeahead suggestions for a partial query: product names, brands,
+    sub-categories, style tags and popular past searches, best first.
+    """
+    return {"query": q, "suggestions": get_suggestions(q, limit)}
 
 
 @catalog_router.get("/products/{sku}", response_model=Product)
-async def get_product(sku: str):
-    product = get_product_by_sku(sku)
-    if not product:
+async def get_product(
+    request: Request,
+    sku: str,
+    fields: Optional[str] = Query(None, description="Comma-separated product fields to return"),
+):
+    wanted = _parse_fields(fields)
+    store = get_store()
+    # A missing product is a 404 whatever the client has cached ("If-None-Match: *")
+    if store.row_of(sku) is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    etag = _etag(request, store)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return _json_response(request, product_body(sku, wanted, store), headers)
+
+
+@catalog_router.post("/admin/reload", status_code=202, dependencies=[Depends(require_admin)])
+async def reload_catalog(source: str = Query("file", pattern="^(file|mongo)$")):
+    """Rebuild the catalog on every worker, in the background, from the JSON file or MongoDB"""
+    started = start_reload(source)
+    return {"started": started, **catalog_status()}
+
+
+@catalog_router.get("/admin/status")
+async def get_catalog_status():
+    """Current catalog version, build time and reload state"""
+    return catalog_status()
@@ -5,6 +5,7 @@ from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 from services.cart_service import CartService
 from services.order_service import OrderService
+from services.stock_reservations import release, reserve
 
 checkout_router = APIRouter()
 
@@ -33,15 +34,23 @@ async def create_order(req: CheckoutRequest):
     # Calculate totals using a temporary cart dict
     totals = CartService.calculate_cart_total({"items": cart_items})
 
+    # Hold the stock until payment (committed or released by the payment step)
+    reservation = reserve(cart_items)
+    if "error" in reservation:
+        raise HTTPException(status_code=409, detail=reservation)
+
     # Create order
     order_result = OrderService.create_order(
         req.customer_id,
         cart_items,
         totals,
-        req.delivery_address
+        req.delivery_address,
+        reservation_id=reservation["reservation_id"],
     )
     
     if "error" in order_result:
+        if reservation["reservation_id"]:
+            release(reservation["reservation_id"])
         raise HTTPException(status_code=400, detail=order_result["error"])
     
     order_id = order_result["order_id"]
@@ -1,25 +1,26 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import List
 from pathlib import Path
-import json
 
 from models import Customer
+from services.record_stream import RecordIndex, iter_records, json_array
 
 customers_router = APIRouter()
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
-
-with open(DATA_DIR / "customers_fashion.json", "r", encoding="utf-8") as f:
-    CUSTOMERS: List[Customer] = [Customer(**c) for c in json.load(f)]
+CUSTOMERS_FILE = DATA_DIR / "customers_fashion.json"
+CUSTOMERS_BY_ID = RecordIndex(CUSTOMERS_FILE, "customer_id")
 
 
 @customers_router.get("/customers", response_model=List[Customer])
-async def list_customers():
-    return CUSTOMERS
+def list_customers():
+    customers = (Customer(**c).model_dump(mode="json") for c in iter_records(CUSTOMERS_FILE))
+    return StreamingResponse(json_array(customers), media_type="application/json")
 
 
 @customers_router.get("/customers/{customer_id}", response_model=Customer)
-async def get_customer(customer_id: str):
-    for c in CUSTOMERS:
-        if c.customer_id == customer_id:
-            return c
-    raise HTTPException(status_code=404, detail="Customer not found")
+def get_customer(customer_id: str):
+    customer = CUSTOMERS_BY_ID.get(customer_id)
+    if customer is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return Customer(**customer)
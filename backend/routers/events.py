@@ -1,17 +1,34 @@
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from itertools import chain
 from typing import List
 from pathlib import Path
-import json
 
 from models import BrowsingEvent
+from services.customer_profiles import EVENT_LOG, record_event
+from services.record_stream import append_records, iter_records, json_array
 
 events_router = APIRouter()
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+EVENTS_FILE = DATA_DIR / "browsing_history_fashion.json"
 
-with open(DATA_DIR / "browsing_history_fashion.json", "r", encoding="utf-8") as f:
-    EVENTS: List[BrowsingEvent] = [BrowsingEvent(**e) for e in json.load(f)]
+
+def _iter_events():
+    # The shipped history, then the events recorded since (all workers)
+    logged = iter_records(EVENT_LOG) if EVENT_LOG.exists() else ()
+    for e in chain(iter_records(EVENTS_FILE), logged):
+        yield BrowsingEvent(**e).model_dump(mode="json")
 
 
 @events_router.get("/events", response_model=List[BrowsingEvent])
-async def list_events():
-    return EVENTS
+def list_events():
+    return StreamingResponse(json_array(_iter_events()), media_type="application/json")
+
+
+@events_router.post("/events", response_model=BrowsingEvent)
+def add_event(event: BrowsingEvent):
+    """Record a browsing event and fold it into the customer's profile"""
+    data = event.model_dump(mode="json")
+    append_records(EVENT_LOG, [data])
+    record_event(data)
+    return event
@@ -1,14 +1,31 @@
 # backend/routers/inventory.py
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 
 from models import InventoryItem
+from routers.catalog import require_admin
 from services.inventory_service import (
     list_inventory,
     get_inventory_by_sku,
     get_inventory_by_store,
     check_inventory_for_recs,
+    get_availability,
+    get_stock_levels,
+    ingest_deltas,
+    compact_inventory,
+)
+from services.stock_reservations import (
+    RESERVATION_TTL,
+    adjust_stock,
+    available,
+    commit,
+    holds_reservation,
+    release,
+    reservation_token,
+    reserve,
 )
 
 inventory_router = APIRouter()
@@ -27,6 +44,12 @@ async def api_inventory_by_sku(sku: str):
     return items
 
 
+@inventory_router.get("/sku/{sku}/stock")
+async def api_stock_levels(sku: str):
+    """Units of the SKU in total, online, and in physical stores per city"""
+    return asdict(get_stock_levels(sku))
+
+
 @inventory_router.get("/store/{store_id}", response_model=List[InventoryItem])
 async def api_inventory_by_store(store_id: str):
     items = get_inventory_by_store(store_id)
@@ -44,3 +67,86 @@ class InventoryCheckRequest(BaseModel):
 @inventory_router.post("/inventory/availability")
 async def api_check_availability(req: InventoryCheckRequest):
     return check_inventory_for_recs(req.store_id, req.size, req.recommendations)
+
+
+class BatchAvailabilityRequest(BaseModel):
+    skus: List[str]
+    store_id: Optional[str] = None
+
+
+@inventory_router.post("/inventory/availability/batch")
+async def api_batch_availability(req: BatchAvailabilityRequest):
+    """Per-SKU total and per-store quantities for a list of SKUs"""
+    return get_availability(req.skus, req.store_id)
+
+
+class ReservationRequest(BaseModel):
+    items: List[Dict[str, Any]]  # [{ "sku": "...", "quantity": 1, "store_id": "ONLINE" }]
+    # Seconds to hold the stock; never longer than a checkout's hold
+    ttl: Optional[int] = Field(None, ge=1, le=RESERVATION_TTL)
+
+
+def require_holder(reservation_id: str, x_reservation_token: Optional[str] = Header(None)):
+    """Only the client that made a reservation (it got the token) may commit or release it"""
+    if not holds_reservation(reservation_id, x_reservation_token):
+        raise HTTPException(status_code=403, detail="Invalid reservation token")
+
+
+@inventory_router.get("/sku/{sku}/available")
+async def api_available_stock(sku: str, store_id: Optional[str] = None):
+    """Units left to reserve (shared by every worker), or null if not stock-managed"""
+    kwargs = {"store_id": store_id} if store_id else {}
+    return {"sku": sku, "available": available(sku, **kwargs)}
+
+
+@inventory_router.post("/reservations")
+async def api_reserve(req: ReservationRequest):
+    """Hold stock; the response's token (X-Reservation-Token) commits or releases it"""
+    kwargs = {"ttl": req.ttl} if req.ttl else {}
+    result = reserve(req.items, **kwargs)
+    if "error" in result:
+        raise HTTPException(status_code=409, detail=result)
+    if result["reservation_id"]:
+        result["token"] = reservation_token(result["reservation_id"])
+    return result
+
+
+@inventory_router.post("/reservations/{reservation_id}/commit", dependencies=[Depends(require_holder)])
+async def api_commit_reservation(reservation_id: str):
+    result = commit(reservation_id)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
+
+@inventory_router.post("/reservations/{reservation_id}/release", dependencies=[Depends(require_holder)])
+async def api_release_reservation(reservation_id: str):
+    result = release(reservation_id)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
+
+class InventoryDeltasRequest(BaseModel):
+    # [{ "sku": "...", "store_id": "...", "quantity_change": -2 }]
+    deltas: List[Dict[str, Any]]
+
+
+# Admin only; plain defs, so the log lock and file writes run in the threadpool
+@inventory_router.post("/deltas", dependencies=[Depends(require_admin)])
+def api_ingest_deltas(req: InventoryDeltasRequest):
+    """
+    Apply a batch of quantity changes: logged on disk, applied to the
+    indexes and stock levels, and to the reservable stock counters.
+    """
+    result = ingest_deltas(req.deltas)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result)
+    adjust_stock(req.deltas)
+    return result
+
+
+@inventory_router.post("/deltas/compact", dependencies=[Depends(require_admin)])
+def api_compact_inventory():
+    """Fold the change log into a new snapshot"""
+    return {"generation": compact_inventory()}
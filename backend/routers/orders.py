@@ -1,36 +1,35 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import List
 from pathlib import Path
-import json
 
 from models import Order, OrderItem
+from services.record_stream import RecordIndex, iter_records, json_array
 
 orders_router = APIRouter()
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
-
-with open(DATA_DIR / "orders.json", "r", encoding="utf-8") as f:
-    ORDERS: List[Order] = [Order(**o) for o in json.load(f)]
-
-with open(DATA_DIR / "order_items.json", "r", encoding="utf-8") as f:
-    ORDER_ITEMS: List[OrderItem] = [OrderItem(**oi) for oi in json.load(f)]
+ORDERS_FILE = DATA_DIR / "orders.json"
+ORDER_ITEMS_FILE = DATA_DIR / "order_items.json"
+ORDERS_BY_ID = RecordIndex(ORDERS_FILE, "order_id")
 
 
 @orders_router.get("/orders", response_model=List[Order])
-async def list_orders():
-    return ORDERS
+def list_orders():
+    orders = (Order(**o).model_dump(mode="json") for o in iter_records(ORDERS_FILE))
+    return StreamingResponse(json_array(orders), media_type="application/json")
 
 
 @orders_router.get("/orders/{order_id}", response_model=Order)
-async def get_order(order_id: str):
-    for o in ORDERS:
-        if o.order_id == order_id:
-            return o
-    raise HTTPException(status_code=404, detail="Order not found")
+def get_order(order_id: str):
+    order = ORDERS_BY_ID.get(order_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return Order(**order)
 
 
 @orders_router.get("/orders/{order_id}/items", response_model=List[OrderItem])
-async def get_order_items(order_id: str):
-    items = [oi for oi in ORDER_ITEMS if oi.order_id == order_id]
+def get_order_items(order_id: str):
+    items = [OrderItem(**oi) for oi in iter_records(ORDER_ITEMS_FILE) if oi.get("order_id") == order_id]
     if not items:
         raise HTTPException(status_code=404, detail="No items for this order")
     return items
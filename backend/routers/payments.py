@@ -27,6 +27,16 @@ class PayPalCaptureRequest(BaseModel):
     payment_id: str
 
 
+def _check_payment(result: Dict[str, Any]):
+    """Raise unless the payment went through and its order is confirmed"""
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    if result.get("status") == "refund_pending":
+        raise HTTPException(status_code=409, detail=result)
+    if result.get("status") != "success":
+        raise HTTPException(status_code=402, detail=result)
+
+
 @payments_router.post("/init")
 async def init_payment(req: CreatePaymentRequest):
     """Initialize payment for order"""
@@ -70,6 +80,11 @@ async def create_paypal_payment(req: CreatePaymentRequest):
 @payments_router.post("/paypal/capture-order")
 async def capture_paypal_order_endpoint(req: PayPalCaptureRequest):
     """Capture PayPal order after user approval"""
+
+    # No money is taken for stock that is no longer there
+    held = OrderService.hold_stock(req.payment_id)
+    if "error" in held:
+        raise HTTPException(status_code=409, detail=held)
     
     result = await capture_paypal_order(req.paypal_order_id)
     
@@ -85,6 +100,7 @@ async def capture_paypal_order_endpoint(req: PayPalCaptureRequest):
             "paypal_order_id": req.paypal_order_id
         }
     )
+    _check_payment(payment_result)
     
     return {
         "success": True,
@@ -109,10 +125,7 @@ async def process_payment(req: ProcessPaymentRequest):
     }
     
     result = OrderService.process_payment(req.payment_id, payment_details)
-    
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    
+    _check_payment(result)
     return result
 
 
@@ -131,9 +144,7 @@ async def simulate_payment_capture(req: SimulateCaptureRequest):
         "transaction_id": tx_id,
         "details": {"simulated": True}
     })
-
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
+    _check_payment(result)
 
     return {
         "success": True,
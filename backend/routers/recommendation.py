@@ -1,16 +1,20 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from typing import Dict, Any, List, Optional
-from pathlib import Path
 import json
+import logging
+import os
 
-from models import Product
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
 
-recommendation_router = APIRouter()
-DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+from routers.catalog import require_admin
+from services.batch_recommendation import iter_batch
+from services.product_store import get_store
+from services.recommendation_cache import RESULT_CACHE
+from services.recommendation_feed import get_feed, materialize_status, start_materialize
 
-with open(DATA_DIR / "products_fashion.json", "r", encoding="utf-8") as f:
-    PRODUCTS: List[Product] = [Product(**p) for p in json.load(f)]
+recommendation_router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 class RecommendationRequest(BaseModel):
@@ -23,18 +27,19 @@ class RecommendationRequest(BaseModel):
     occasion: Optional[str] = None
 
 
+class BatchRecommendationRequest(BaseModel):
+    customer_ids: List[str]
+    params: Dict[str, Any] = Field(default_factory=dict)
+    query: str = ""
+    workers: int = Field(1, ge=1)
+
+
 @recommendation_router.post("/recommendations")
 async def recommend(req: RecommendationRequest):
     # filter
-    candidates = PRODUCTS
-    if req.category:
-        candidates = [p for p in candidates if p.category.lower() == req.category.lower()]
-    if req.sub_category:
-        candidates = [p for p in candidates if p.sub_category.lower() == req.sub_category.lower()]
-    if req.max_price is not None:
-        candidates = [p for p in candidates if p.price <= req.max_price]
-    if req.color:
-        candidates = [p for p in candidates if p.base_color.lower() == req.color.lower()]
+    store = get_store()
+    rows = store.index.list_rows(req.category, req.sub_category, req.color, req.max_price)
+    candidates = [store.model(row) for row in rows]
     if req.occasion:
         candidates = [p for p in candidates if req.occasion in p.occasion]
 
@@ -62,3 +67,53 @@ async def recommend(req: RecommendationRequest):
         }
         for p in top
     ]
+
+
+@recommendation_router.get("/recommendations/cache-stats")
+async def recommendation_cache_stats():
+    """Hit/miss counters of the recommend_products result cache"""
+    return RESULT_CACHE.stats()
+
+
+# Admin only: ranks many customers and can fan out to a process pool
+@recommendation_router.post("/recommendations/batch", dependencies=[Depends(require_admin)])
+def recommend_batch(req: BatchRecommendationRequest):
+    """
+    Recommendations for many customers, streamed as JSONL: one
+    {"customer_id", "recommendations"} line per customer, as soon as its
+    ranking is ready. Customers whose profiles resolve to the same filters
+    share one ranking; `workers` > 1 fans rankings out to a process pool.
+    """
+    workers = min(req.workers, os.cpu_count() or 1)
+
+    def progress(done: int, total: int):
+        logger.info("Batch recommendations: %d/%d customers", done, total)
+
+    def lines():
+        for line in iter_batch(req.customer_ids, req.params, req.query, workers, progress):
+            yield json.dumps(line, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@recommendation_router.get("/recommendations/feed/{customer_id}")
+async def recommendation_feed(customer_id: str):
+    """
+    The customer's landing-page recommendations (no query): read from the
+    materialized feed in Redis, or recomputed when that is missing or stale.
+    """
+    return get_feed(customer_id)
+
+
+@recommendation_router.post(
+    "/recommendations/feed/materialize", status_code=202, dependencies=[Depends(require_admin)]
+)
+async def materialize_feeds(workers: int = Query(1, ge=1)):
+    """Recompute every customer's feed in the background; one run at a time"""
+    started = start_materialize(min(workers, os.cpu_count() or 1))
+    return {"started": started, **materialize_status()}
+
+
+@recommendation_router.get("/recommendations/feed/materialize/status")
+async def materialize_feeds_status():
+    return materialize_status()
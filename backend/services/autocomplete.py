@@ -0,0 +1,150 @@
+# backend/services/autocomplete.py
+"""
+Typeahead suggestions for the chat input and catalog search.
+
+Suggestions are product names, brands, sub_categories, style tags and past
+search queries from the browsing history, each weighted by popularity. Every
+word-start suffix of a suggestion ("white chunky sneakers", "chunky
+sneakers", "sneakers") is kept in one sorted array, so the suggestions for a
+prefix are a contiguous slice found with two bisects. The best suggestions
+for every prefix of up to PRECOMPUTED_PREFIX characters are computed at
+build time, since those slices are the largest.
+
+The index is built with every catalog snapshot (ProductStore, so during a
+background reload), never on a request.
+"""
+
+import heapq
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services.customer_profiles import EVENT_LOG
+from services.record_stream import iter_records
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+HISTORY_FILE = DATA_DIR / "browsing_history_fashion.json"
+
+MAX_SUGGESTIONS = 20
+PRECOMPUTED_PREFIX = 3
+
+# Popularity earned by a product per browsing event of each type
+EVENT_WEIGHTS = {"view_product": 1, "add_to_cart": 3, "purchase": 5}
+BESTSELLER_WEIGHT = 5
+# Popularity of a past search query per time it was searched
+SEARCH_WEIGHT = 2
+
+
+def _normalize(text: str) -> str:
+    return " ".join(str(text or "").lower().split())
+
+
+class SuggestionIndex:
+    """Prefix lookup over weighted suggestions (text, type, weight, sku)"""
+
+    def __init__(self, suggestions: Iterable[Tuple[str, str, int, Optional[str]]]):
+        # Same text and type from several sources: keep one, add up weights
+        merged: Dict[tuple, list] = {}
+        for text, kind, weight, sku in suggestions:
+            key = (kind, _normalize(text))
+            if not key[1]:
+                continue
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = [text, kind, weight, sku]
+            else:
+                entry[2] += weight
+
+        # Best first, so "top k of a slice" is the k smallest entry ids
+        self._entries = sorted(merged.values(), key=lambda e: (-e[2], _normalize(e[0]), e[1]))
+
+        self._texts = [" " + _normalize(e[0]) for e in self._entries]
+
+        keys: List[Tuple[str, int]] = []
+        for eid, (text, _, _, _) in enumerate(self._entries):
+            words = _normalize(text).split()
+            for start in range(len(words)):
+                keys.append((" ".join(words[start:]), eid))
+        keys.sort()
+        self._keys = [key for key, _ in keys]
+        self._ids = array("I", [eid for _, eid in keys])
+
+        short_prefixes = {
+            key[:length] for key in self._keys for length in range(1, min(len(key), PRECOMPUTED_PREFIX) + 1)
+        }
+        self._top = {prefix: self._best(prefix, MAX_SUGGESTIONS) for prefix in short_prefixes}
+        # Keystrokes from many users repeat the same prefixes
+        self._cached_best = lru_cache(maxsize=4096)(self._best)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _best(self, prefix: str, limit: int) -> List[int]:
+        """Ids of the `limit` best entries with a word starting with `prefix`"""
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + "\uffff", lo)
+        if (hi - lo) ** 2 > limit * len(self._entries):
+            # Dense match: walking entries best-first finds `limit` hits
+            # sooner than reading the whole slice
+            needle = " " + prefix
+            hits = (eid for eid, text in enumerate(self._texts) if needle in text)
+            return list(islice(hits, limit))
+        return heapq.nsmallest(limit, set(self._ids[lo:hi]))
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict[str, Any]]:
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+        if len(prefix) <= PRECOMPUTED_PREFIX:
+            eids = self._top.get(prefix, [])[:limit]
+        else:
+            eids = self._cached_best(prefix, limit)
+        out = []
+        for eid in eids:
+            text, kind, weight, sku = self._entries[eid]
+            suggestion = {"text": text, "type": kind, "weight": weight}
+            if sku:
+                suggestion["sku"] = sku
+            out.append(suggestion)
+        return out
+
+
+def _history_popularity() -> Tuple[Dict[str, int], Dict[str, int]]:
+    """Per-SKU popularity and per-query search counts from the browsing history"""
+    sku_weights: Dict[str, int] = {}
+    queries: Dict[str, int] = {}
+    logged = iter_records(EVENT_LOG) if EVENT_LOG.exists() else ()
+    for event in chain(iter_records(HISTORY_FILE), logged):
+        event_type = event.get("event_type")
+        if event_type in EVENT_WEIGHTS and event.get("sku"):
+            sku_weights[event["sku"]] = sku_weights.get(event["sku"], 0) + EVENT_WEIGHTS[event_type]
+        elif event_type == "search" and event.get("search_query"):
+            query = _normalize(event["search_query"])
+            queries[query] = queries.get(query, 0) + 1
+    return sku_weights, queries
+
+
+def build_suggestions(index) -> SuggestionIndex:
+    """Suggestion index for a catalog snapshot (a CatalogIndex)"""
+    sku_weights, queries = _history_popularity()
+
+    def suggestions():
+        for p in index.records():
+            sku = p.get("sku")
+            popularity = 1 + sku_weights.get(sku, 0)
+            if "bestseller" in (p.get("tags") or []):
+                popularity += BESTSELLER_WEIGHT
+            yield p.get("name"), "product", popularity, sku
+            # Attributes are as popular as the products carrying them
+            yield p.get("brand"), "brand", popularity, None
+            yield p.get("sub_category"), "sub_category", popularity, None
+            for tag in p.get("style_tags") or []:
+                yield tag, "style_tag", popularity, None
+        for query, count in queries.items():
+            yield query, "query", SEARCH_WEIGHT * count, None
+
+    return SuggestionIndex(suggestions())
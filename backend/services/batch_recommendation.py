@@ -0,0 +1,140 @@
+# backend/services/batch_recommendation.py
+"""
+Recommendations for many customers at once (campaign precomputation).
+
+Customers are first resolved to the filters they would be ranked with
+(explicit params plus their profile's style, occasion, colour and budget);
+customers that resolve alike share one ranking. The distinct rankings are
+computed in-process, or fanned out to a process pool whose workers only need
+the catalog, since profiles were already applied by the parent.
+
+CLI:
+
+    python -m services.batch_recommendation customers.txt \\
+        --params '{"category": "Footwear"}' --query "white sneakers" \\
+        --workers 4 --output picks.jsonl
+
+`customers.txt` holds one customer_id per line ("-" reads stdin; "all"
+uses every known customer). Output is JSONL, one line per customer, with
+progress reported on stderr.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from services.product_store import get_store
+from services.recommendation import rank_products, resolve_params
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 1))
+# Rankings sent to a worker per task
+CHUNK_SIZE = 64
+PROGRESS_EVERY = 10000  # customers between progress reports
+
+logger = logging.getLogger(__name__)
+
+
+def _rank_chunk(chunk: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, List[Dict]]]:
+    """Worker task: rankings for (group key, resolved filters) pairs"""
+    store = get_store()
+    return [(key, rank_products(store, resolved)) for key, resolved in chunk]
+
+
+def _group_customers(
+    customer_ids: Iterable[str], params: Dict[str, Any], query: str
+) -> Dict[str, Tuple[Dict[str, Any], List[str]]]:
+    groups: Dict[str, Tuple[Dict[str, Any], List[str]]] = {}
+    for customer_id in customer_ids:
+        resolved = resolve_params(customer_id, params, query)
+        key = json.dumps(resolved, sort_keys=True, default=str)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = (resolved, [])
+        group[1].append(customer_id)
+    return groups
+
+
+def iter_batch(
+    customer_ids: Iterable[str],
+    params: Optional[Dict[str, Any]] = None,
+    query: str = "",
+    workers: int = BATCH_WORKERS,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield {"customer_id", "recommendations"} for every customer, in the
+    order rankings complete. `on_progress(done, total)` is called as
+    customers are emitted.
+    """
+    groups = _group_customers(customer_ids, params or {}, query)
+    total = sum(len(ids) for _, ids in groups.values())
+    done = 0
+    logger.info("Batch: %d customers in %d distinct rankings", total, len(groups))
+
+    def emit(key: str, recs: List[Dict]) -> Iterator[Dict[str, Any]]:
+        nonlocal done
+        for customer_id in groups[key][1]:
+            yield {"customer_id": customer_id, "recommendations": recs}
+            done += 1
+            if on_progress and (done % PROGRESS_EVERY == 0 or done == total):
+                on_progress(done, total)
+
+    pending = [(key, resolved) for key, (resolved, _) in groups.items()]
+    chunks = [pending[i:i + CHUNK_SIZE] for i in range(0, len(pending), CHUNK_SIZE)]
+
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            for key, recs in _rank_chunk(chunk):
+                yield from emit(key, recs)
+        return
+
+    # spawn: safe to start from a threaded server, and workers only need
+    # the catalog, which they map from the compiled file when present
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(_rank_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            for key, recs in future.result():
+                yield from emit(key, recs)
+
+
+def _read_customer_ids(source: str) -> List[str]:
+    if source == "all":
+        from services.customer_profiles import known_customers
+
+        return known_customers()
+    stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    with stream:
+        return [line.strip() for line in stream if line.strip()]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Batch recommendations as JSONL")
+    parser.add_argument("customers", help='file with one customer_id per line, "-" for stdin, or "all"')
+    parser.add_argument("--params", default="{}", help="JSON object of recommendation params")
+    parser.add_argument("--query", default="", help="free-text query applied to every customer")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--output", default="-", help='JSONL file to write ("-" for stdout)')
+    args = parser.parse_args(argv)
+
+    customer_ids = _read_customer_ids(args.customers)
+    started = time.perf_counter()
+
+    def progress(done: int, total: int):
+        elapsed = time.perf_counter() - started
+        print(f"{done}/{total} customers ({done / elapsed:.0f}/s)", file=sys.stderr, flush=True)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    with out:
+        for line in iter_batch(customer_ids, json.loads(args.params), args.query, args.workers, progress):
+            out.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,11 @@
 # backend/services/cart_service.py
 
-import json
-from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional
 import logging
 
 from db.mongo_client import get_collection
-
-# Load data
-DATA_DIR = Path(__file__).resolve().parent.parent / "data"
-
-with open(DATA_DIR / "products_fashion.json", "r", encoding="utf-8") as f:
-    PRODUCTS_DB = {p["sku"]: p for p in json.load(f)}
+from services.product_store import get_product
 
 # In-memory carts (in production, use Redis)
 CARTS = {}
@@ -60,7 +53,7 @@ class CartService:
         cart = CartService.get_or_create_cart(customer_id)
         
         # Get product details
-        product = PRODUCTS_DB.get(sku)
+        product = get_product(sku)
         if not product:
             return {"error": "Product not found"}
         
@@ -0,0 +1,216 @@
+# backend/services/catalog_binary.py
+"""
+Compiled, memory-mapped product catalog.
+
+`python -m services.catalog_binary [products.json] [products.bin]` compiles
+the JSON catalog into a single binary file:
+
+    header     magic, counts and section offsets
+    strings    u64 offset table + UTF-8 blob; every distinct string once
+    list pool  u32 string ids referenced by the list columns
+    rows       fixed-width row records (price, string ids, list refs,
+               location of the full JSON record)
+    sku index  u32 row numbers sorted by SKU, for binary search
+    records    compact JSON of every product, decoded only on demand
+
+Workers open the file with mmap, so they share its pages through the OS
+page cache instead of each holding a parsed copy of the catalog.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from services.record_stream import iter_records
+
+MAGIC = b"FSCATv01"
+HEADER = struct.Struct("<8sIII6Q")
+# price, 7 string ids, 4 (offset, count) list refs, record offset, record length
+ROW = struct.Struct("<d7I8IQI")
+U32 = struct.Struct("<I")
+U64 = struct.Struct("<Q")
+
+STRING_COLUMNS = ("sku", "name", "category", "sub_category", "brand", "gender", "base_color")
+LIST_COLUMNS = ("style_tags", "occasion", "sizes", "tags")
+
+RECORD_CACHE_SIZE = 4096  # decoded records kept per open catalog
+
+
+def encode_record(p: Dict[str, Any]) -> bytes:
+    """A product's compact JSON record, as stored in the records section"""
+    return json.dumps(p, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def compile_catalog(records: Iterable[Dict[str, Any]], dst: Path) -> int:
+    """Write `records` to `dst` in the binary catalog format; returns the row count"""
+    strings: Dict[str, int] = {}
+    pool: List[int] = []
+    rows: List[bytes] = []
+    skus: List[str] = []
+    blob = bytearray()
+
+    def string_id(value: Any) -> int:
+        value = "" if value is None else str(value)
+        sid = strings.get(value)
+        if sid is None:
+            sid = strings[value] = len(strings)
+        return sid
+
+    for p in records:
+        record = encode_record(p)
+        list_refs = []
+        for column in LIST_COLUMNS:
+            values = p.get(column) or []
+            list_refs += [len(pool), len(values)]
+            pool.extend(string_id(v) for v in values)
+        rows.append(ROW.pack(
+            p.get("price", 0),
+            *(string_id(p.get(column)) for column in STRING_COLUMNS),
+            *list_refs,
+            len(blob),
+            len(record),
+        ))
+        skus.append(str(p.get("sku") or ""))
+        blob += record
+
+    encoded = [s.encode("utf-8") for s in strings]
+    sku_order = sorted(range(len(skus)), key=skus.__getitem__)
+
+    tmp = dst.with_suffix(dst.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        off_str_offsets = f.tell()
+        position = 0
+        for s in encoded:
+            f.write(U64.pack(position))
+            position += len(s)
+        f.write(U64.pack(position))
+        off_str_blob = f.tell()
+        for s in encoded:
+            f.write(s)
+        off_pool = f.tell()
+        f.write(struct.pack(f"<{len(pool)}I", *pool))
+        off_rows = f.tell()
+        for row in rows:
+            f.write(row)
+        off_sku_index = f.tell()
+        f.write(struct.pack(f"<{len(sku_order)}I", *sku_order))
+        off_records = f.tell()
+        f.write(blob)
+        f.seek(0)
+        f.write(HEADER.pack(
+            MAGIC, len(rows), len(encoded), len(pool),
+            off_str_offsets, off_str_blob, off_pool, off_rows, off_sku_index, off_records,
+        ))
+    # Atomic replace: workers that already mapped the old file keep its inode
+    os.replace(tmp, dst)
+    return len(rows)
+
+
+class BinaryCatalog:
+    """
+    Read-only, sequence-like view of a compiled catalog.
+
+    `catalog[row]` decodes that product's JSON record (with a small LRU);
+    `index_rows()` yields just the indexed fields straight from the
+    fixed-width columns, which is what CatalogIndex builds from.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self._rows, self._strings, _, self._off_str_offsets, self._off_str_blob,
+         self._off_pool, self._off_rows, self._off_sku_index, self._off_records) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled catalog")
+        self._string = lru_cache(maxsize=65536)(self._read_string)
+        self._record = lru_cache(maxsize=RECORD_CACHE_SIZE)(self._read_record)
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        if not 0 <= row < self._rows:
+            raise IndexError(row)
+        return self._record(row)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        # Full scans bypass the LRU so they don't evict the hot records
+        for row in range(self._rows):
+            yield self._read_record(row)
+
+    def _read_string(self, sid: int) -> str:
+        start, end = struct.unpack_from("<QQ", self._mm, self._off_str_offsets + sid * U64.size)
+        base = self._off_str_blob
+        return self._mm[base + start:base + end].decode("utf-8")
+
+    def _row(self, row: int) -> tuple:
+        return ROW.unpack_from(self._mm, self._off_rows + row * ROW.size)
+
+    def _read_record(self, row: int) -> Dict[str, Any]:
+        offset, length = self._row(row)[-2:]
+        start = self._off_records + offset
+        return json.loads(self._mm[start:start + length])
+
+    def digest(self):
+        """sha1 over the records section: every encode_record, in row order"""
+        with memoryview(self._mm) as view:
+            return hashlib.sha1(view[self._off_records:])
+
+    def sku(self, row: int) -> str:
+        return self._string(self._row(row)[1])
+
+    def index_rows(self) -> Iterator[Dict[str, Any]]:
+        """Indexed fields of every row, without decoding the JSON records"""
+        mm, pool = self._mm, self._off_pool
+        strings: Dict[int, str] = {}
+
+        def string(sid: int) -> str:
+            value = strings.get(sid)
+            if value is None:
+                value = strings[sid] = self._read_string(sid)
+            return value
+
+        for values in ROW.iter_unpack(mm[self._off_rows:self._off_rows + self._rows * ROW.size]):
+            p: Dict[str, Any] = {"price": values[0]}
+            for column, sid in zip(STRING_COLUMNS, values[1:8]):
+                p[column] = string(sid)
+            # A row's list columns are written back to back in the pool
+            start = values[8]
+            ids = struct.unpack_from(f"<{values[9] + values[11] + values[13] + values[15]}I", mm, pool + start * U32.size)
+            offset = 0
+            for i, column in enumerate(LIST_COLUMNS):
+                count = values[9 + 2 * i]
+                p[column] = [string(sid) for sid in ids[offset:offset + count]]
+                offset += count
+            yield p
+
+    def find(self, sku: str) -> Optional[int]:
+        """Row number of `sku` by binary search over the SKU index"""
+        lo, hi = 0, self._rows
+        while lo < hi:
+            mid = (lo + hi) // 2
+            row = U32.unpack_from(self._mm, self._off_sku_index + mid * U32.size)[0]
+            current = self.sku(row)
+            if current == sku:
+                return row
+            if current < sku:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+
+if __name__ == "__main__":
+    data_dir = Path(__file__).resolve().parent.parent / "data"
+    src = Path(sys.argv[1]) if len(sys.argv) > 1 else data_dir / "products_fashion.json"
+    dst = Path(sys.argv[2]) if len(sys.argv) > 2 else src.with_suffix(".bin")
+    count = compile_catalog(iter_records(src), dst)
+    print(f"Compiled {count} products into {dst}")
@@ -0,0 +1,494 @@
+# backend/services/catalog_index.py
+
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from services.fuzzy_match import TrigramIndex
+
+# Byte value -> positions of its set bits, used to walk bitmaps quickly
+_BYTE_BITS = [tuple(i for i in range(8) if b >> i & 1) for b in range(256)]
+
+
+# Query relevance weights per matched field (exact value match)
+EXACT_FIELD_WEIGHTS = (
+    ("sub_category", 6),
+    ("category", 5),
+    ("brand", 4),
+    ("style_tag", 3),
+    ("tag", 3),
+)
+
+# Query relevance weights per matched field (substring of a word), and whether
+# the singularized token is also tried
+WORD_FIELD_WEIGHTS = (
+    ("occasion", 2, True),
+    ("name", 2, True),
+    ("combined", 1, False),
+)
+
+# Price buckets used for faceted search counts: (low, high inclusive, label)
+PRICE_BUCKETS = (
+    (0, 999, "0-999"),
+    (1000, 1999, "1000-1999"),
+    (2000, 2999, "2000-2999"),
+    (3000, 4999, "3000-4999"),
+    (5000, None, "5000+"),
+)
+
+# Fields the faceted search reports counts for
+FACET_FIELDS = ("category", "sub_category", "brand", "base_color", "size", "occasion", "price_bucket")
+
+# Sort orders supported by listings and search; ties keep catalog order
+SORT_ORDERS = ("price", "-price", "newness", "bestseller")
+
+
+def _lower(value: Any) -> str:
+    return str(value or "").lower()
+
+
+def singular(token: str) -> str:
+    """Singularize simple plurals (kurtas -> kurta)"""
+    if token.endswith('ies'):
+        return token[:-3] + 'y'
+    if token.endswith('s') and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+def _signature_keys(tags: Iterable[str], occasions: Iterable[str], brands: Iterable[str]) -> List[tuple]:
+    """The (kind, value) pairs cross-sell signatures are matched on"""
+    return (
+        [("tag", t) for t in tags]
+        + [("occ", o) for o in occasions]
+        + [("brand", b) for b in brands if b]
+    )
+
+
+def price_bucket(price) -> str:
+    for low, high, label in PRICE_BUCKETS:
+        if price >= low and (high is None or price <= high):
+            return label
+    return PRICE_BUCKETS[0][2]
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Yield the row numbers set in a bitmap, in ascending order"""
+    if not mask:
+        return
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    for byte_no, byte in enumerate(data):
+        if byte:
+            base = byte_no * 8
+            for bit in _BYTE_BITS[byte]:
+                yield base + bit
+
+
+def bits_from_rows(rows, size: int) -> int:
+    """Build a bitmap with the given row numbers set"""
+    buf = bytearray((size + 7) // 8)
+    for row in rows:
+        buf[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(buf, "little")
+
+
+class CatalogIndex:
+    """
+    Read-only lookup structures over the product catalog, built once at load.
+
+    Each filterable value maps to a bitmap (a Python int) whose bit N is set
+    when product row N carries that value, so combining filters is a handful
+    of `&` operations instead of one pass over the catalog per filter. Prices
+    are kept in a sorted array so the budget cut is a bisect.
+
+    Free-text relevance uses a term -> rows posting table (a sparse
+    term/product matrix), so scoring a query only touches the rows that
+    actually contain its terms. It stays in plain arrays rather than a
+    NumPy/SciPy matrix: a query walks a few short posting lists, and NumPy
+    is optional (only the semantic index needs it).
+
+    Cross-sell candidates only depend on a product's (style tags, occasions,
+    brand) signature, so products are grouped by signature, and each tag,
+    occasion and brand lists the groups carrying it.
+
+    Catalog listings filter on (category, sub_category, colour) and a price
+    cap, so every combination of those three (with wildcards) has its rows
+    stored both in catalog order and sorted by price.
+    """
+
+    FIELDS = (
+        "gender", "category", "sub_category", "style_tag", "occasion", "base_color",
+        "brand", "size", "price_bucket",
+    )
+
+    def __init__(self, products: Sequence[Dict[str, Any]], version: int = 1):
+        # Only used to hand full records back to callers; the index keeps
+        # its own columns so ranking never has to materialize a product
+        self.products = products
+        self.version = version
+        self.size = len(products)
+        self.all_mask = (1 << self.size) - 1
+        self.prices = array("d")
+
+        postings: Dict[str, Dict[str, List[int]]] = {f: {} for f in self.FIELDS}
+        # Lowercased key -> value as first seen in the catalog, for display
+        self._labels: Dict[str, Dict[str, str]] = {f: {} for f in self.FIELDS}
+        exact: Dict[str, Dict[str, List[int]]] = {f: {} for f, _ in EXACT_FIELD_WEIGHTS}
+        words: Dict[str, Dict[str, List[int]]] = {f: {} for f, _, _ in WORD_FIELD_WEIGHTS}
+        signatures: Dict[tuple, int] = {}
+        group_members: List[List[int]] = []
+        self._group_of = array("I")
+        combos: Dict[tuple, List[int]] = {}
+        vocabulary = set()
+
+        # One pass over the rows feeds every structure, so a compiled or
+        # streamed catalog is only read once
+        for row, p in enumerate(self.records()):
+            price = p.get("price", 0)
+            self.prices.append(price)
+
+            values = {
+                "gender": [p.get("gender")],
+                "category": [p.get("category")],
+                "sub_category": [p.get("sub_category")],
+                "base_color": [p.get("base_color")],
+                "brand": [p.get("brand")],
+                "style_tag": p.get("style_tags", []),
+                "occasion": p.get("occasion", []),
+                "size": p.get("sizes", []),
+                "price_bucket": [price_bucket(price)],
+            }
+            for field, raw_values in values.items():
+                for raw in raw_values:
+                    key = _lower(raw)
+                    rows = postings[field].setdefault(key, [])
+                    if not rows or rows[-1] != row:
+                        rows.append(row)
+                    self._labels[field].setdefault(key, str(raw or ""))
+
+            name = _lower(p.get("name"))
+            category = _lower(p.get("category"))
+            sub_category = _lower(p.get("sub_category"))
+            brand = _lower(p.get("brand"))
+            color = _lower(p.get("base_color"))
+            style_tags = [_lower(t) for t in p.get("style_tags", [])]
+            tags = [_lower(t) for t in p.get("tags", [])]
+            occasions = [_lower(o) for o in p.get("occasion", [])]
+
+            # Relevance postings
+            occasion = " ".join(occasions)
+            combined = " ".join([name, category, sub_category, brand, occasion] + style_tags + tags)
+            terms = {
+                "sub_category": {sub_category},
+                "category": {category},
+                "brand": {brand},
+                "style_tag": set(style_tags),
+                "tag": set(tags),
+            }
+            for field, field_terms in terms.items():
+                for value in field_terms:
+                    exact[field].setdefault(value, []).append(row)
+            for field, text in (("occasion", occasion), ("name", name), ("combined", combined)):
+                for word in set(text.split()):
+                    words[field].setdefault(word, []).append(row)
+            # Words typos are corrected towards
+            for text in [name, brand, sub_category] + style_tags + tags:
+                vocabulary.update(text.split())
+
+            # Cross-sell signature group
+            sig = (frozenset(style_tags), frozenset(occasions), brand)
+            gid = signatures.setdefault(sig, len(signatures))
+            if gid == len(group_members):
+                group_members.append([])
+            self._group_of.append(gid)
+            if p.get("sku"):
+                group_members[gid].append(row)
+
+            # Listing combinations
+            for key in (
+                (category, sub_category, color), (category, sub_category, None),
+                (category, None, color), (None, sub_category, color),
+                (category, None, None), (None, sub_category, None), (None, None, color),
+                (None, None, None),
+            ):
+                combos.setdefault(key, []).append(row)
+
+        self._bitmaps: Dict[str, Dict[str, int]] = {
+            field: {value: bits_from_rows(rows, self.size) for value, rows in field_postings.items()}
+            for field, field_postings in postings.items()
+        }
+
+        self._price_order = sorted(range(self.size), key=lambda row: (self.prices[row], row))
+        self._sorted_prices = [self.prices[row] for row in self._price_order]
+
+        # Budgets repeat a lot across turns (inferred budgets, "under 2000"...)
+        self.price_mask = lru_cache(maxsize=256)(self._price_mask)
+        self.category_mask = lru_cache(maxsize=256)(self._category_mask)
+
+        self._build_relevance(exact, words)
+        self._word_rows = lru_cache(maxsize=4096)(self._match_words)
+        self.vocabulary = TrigramIndex(vocabulary)
+
+        self._build_related(list(signatures), group_members)
+        self._build_listing(combos)
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Rows with (at least) the indexed fields, read in catalog order"""
+        index_rows = getattr(self.products, "index_rows", None)
+        return index_rows() if index_rows else iter(self.products)
+
+    def _build_relevance(self, exact: Dict[str, Dict[str, List[int]]], words: Dict[str, Dict[str, List[int]]]):
+        self._exact_terms = {
+            field: {value: array("I", rows) for value, rows in values.items()}
+            for field, values in exact.items()
+        }
+        self._words = {
+            field: {word: array("I", rows) for word, rows in values.items()}
+            for field, values in words.items()
+        }
+
+    def _match_words(self, field: str, term: str) -> frozenset:
+        """Rows where `term` is a substring of some word in `field`"""
+        rows = set()
+        for word, word_rows in self._words[field].items():
+            if term in word:
+                rows.update(word_rows)
+        return frozenset(rows)
+
+    def correct_tokens(self, tokens: Iterable[str]) -> List[str]:
+        """
+        Query tokens with likely typos replaced by the closest catalog words
+        ("snekers" -> "sneakers"). Only tokens that match nothing at all are
+        corrected; they are looked up in the vocabulary's trigram index.
+        """
+        corrected: List[str] = []
+        for tok in tokens:
+            if self._word_rows("combined", tok) or self._word_rows("combined", singular(tok)):
+                corrected.append(tok)
+                continue
+            matches = self.vocabulary.lookup(tok)
+            corrected.extend(m for m in (matches or (tok,)) if m not in corrected)
+        return corrected
+
+    def score_query(self, tokens: Iterable[str], rows: Optional[Iterable[int]] = None) -> Dict[int, int]:
+        """
+        Relevance of each candidate row to the query tokens (all rows when
+        `rows` is None).
+
+        Equivalent to summing the field weights of every (token, field) match,
+        but computed by walking the posting lists of the query terms rather
+        than re-reading every product. Rows with no match are left out.
+        Misspelled tokens are corrected first (see correct_tokens).
+        """
+        tokens = self.correct_tokens(tokens)
+        if rows is None:
+            candidates = None
+        else:
+            candidates = rows if isinstance(rows, (set, frozenset)) else set(rows)
+        scores: Dict[int, int] = {}
+
+        def add(matched: Iterable[int], weight: int):
+            for row in matched:
+                if candidates is None or row in candidates:
+                    scores[row] = scores.get(row, 0) + weight
+
+        empty = array("I")
+        for tok in tokens:
+            tok_sing = singular(tok)
+            for field, weight in EXACT_FIELD_WEIGHTS:
+                postings = self._exact_terms[field]
+                matched = postings.get(tok, empty)
+                if tok_sing != tok and tok_sing in postings:
+                    matched = set(matched).union(postings[tok_sing])
+                add(matched, weight)
+            for field, weight, with_singular in WORD_FIELD_WEIGHTS:
+                matched = self._word_rows(field, tok)
+                if with_singular and tok_sing != tok:
+                    matched = matched | self._word_rows(field, tok_sing)
+                add(matched, weight)
+
+        return scores
+
+    def _build_related(self, signatures: List[tuple], group_members: List[List[int]]):
+        self._group_sigs = signatures
+        self._group_rows = []
+        self._group_prices = []
+        for members in group_members:
+            members.sort(key=lambda row: (self.prices[row], row))
+            self._group_rows.append(array("I", members))
+            self._group_prices.append([self.prices[row] for row in members])
+
+        # (kind, value) -> groups whose signature carries it, so the groups
+        # related to any combination of signatures can be collected exactly
+        self._groups_by_value: Dict[tuple, array] = {}
+        for gid, (tags, occasions, brand) in enumerate(self._group_sigs):
+            for key in _signature_keys(tags, occasions, (brand,)):
+                self._groups_by_value.setdefault(key, array("I")).append(gid)
+
+    def _nearest_in_group(self, gid: int, target: float, count: int, keep: Callable[[int], bool]) -> List[int]:
+        """
+        Up to `count` rows of a group passing `keep`, closest in price to
+        `target` (plus rows tied with the last), found walking outward from it
+        """
+        prices = self._group_prices[gid]
+        rows = self._group_rows[gid]
+        hi = bisect_left(prices, target)
+        lo = hi - 1
+        found: List[int] = []
+        while len(found) < count and (lo >= 0 or hi < len(prices)):
+            gap = min(
+                target - prices[lo] if lo >= 0 else float("inf"),
+                prices[hi] - target if hi < len(prices) else float("inf"),
+            )
+            # Rows at the same distance on either side are ordered by row
+            tied = []
+            while lo >= 0 and target - prices[lo] == gap:
+                tied.append(rows[lo])
+                lo -= 1
+            while hi < len(prices) and prices[hi] - target == gap:
+                tied.append(rows[hi])
+                hi += 1
+            found.extend(row for row in sorted(tied) if keep(row))
+        return found
+
+    def related_rows(self, top_rows: List[int], limit: int = 3, allowed: Optional[int] = None) -> List[int]:
+        """
+        Cross-sell rows for a set of top results: products sharing style tags,
+        occasions or brand with them, best overlap first, then closest in
+        price to the results' average. Only rows set in the `allowed` bitmap
+        qualify, when one is given.
+        """
+        if not top_rows:
+            return []
+
+        prices = self.prices
+        top_tags, top_occasions, top_brands = set(), set(), set()
+        for row in top_rows:
+            tags, occasions, brand = self._group_sigs[self._group_of[row]]
+            top_tags |= tags
+            top_occasions |= occasions
+            if brand:
+                top_brands.add(brand)
+        top_set = set(top_rows)
+        avg_price = sum(prices[row] for row in top_rows) / len(top_rows)
+
+        # Every group sharing a value with the combined signature of the
+        # results, scored by how many of its values it shares
+        overlap: Dict[int, int] = {}
+        for key in _signature_keys(top_tags, top_occasions, top_brands):
+            for gid in self._groups_by_value.get(key, ()):
+                overlap[gid] = overlap.get(gid, 0) + 1
+        by_score: Dict[int, List[int]] = {}
+        for gid in sorted(overlap):
+            by_score.setdefault(overlap[gid], []).append(gid)
+
+        def keep(row: int) -> bool:
+            return row not in top_set and (allowed is None or bool(allowed >> row & 1))
+
+        picked: List[int] = []
+        for score in sorted(by_score, reverse=True):
+            wanted = limit - len(picked)
+            level = [
+                (abs(prices[row] - avg_price), row)
+                for gid in by_score[score]
+                for row in self._nearest_in_group(gid, avg_price, wanted, keep)
+            ]
+            level.sort()
+            picked.extend(row for _, row in level[:wanted])
+            if len(picked) >= limit:
+                break
+        return picked
+
+    def _build_listing(self, combos: Dict[tuple, List[int]]):
+        self._listing: Dict[tuple, tuple] = {}
+        for key, rows in combos.items():
+            by_price = sorted(rows, key=lambda row: (self.prices[row], row))
+            prices = [self.prices[row] for row in by_price]
+            self._listing[key] = (array("I", rows), array("I", by_price), prices)
+
+    def list_rows(
+        self,
+        category: Optional[str] = None,
+        sub_category: Optional[str] = None,
+        color: Optional[str] = None,
+        max_price: Optional[int] = None,
+    ) -> List[int]:
+        """Rows matching the listing filters (case-insensitive), in catalog order"""
+        key = (
+            _lower(category) if category else None,
+            _lower(sub_category) if sub_category else None,
+            _lower(color) if color else None,
+        )
+        entry = self._listing.get(key)
+        if entry is None:
+            return []
+        rows, by_price, prices = entry
+        if max_price is None:
+            return list(rows)
+        cut = bisect_right(prices, max_price)
+        if cut == len(prices):
+            return list(rows)
+        return sorted(by_price[:cut])
+
+    def sort_key(self, order: str) -> Callable[[int], Any]:
+        """Row sort key for one of SORT_ORDERS"""
+        if order == "price":
+            return self.prices.__getitem__
+        if order == "-price":
+            return lambda row: -self.prices[row]
+        tag = {"newness": "new_arrival", "bestseller": "bestseller"}[order]
+        tagged = frozenset(self._exact_terms["tag"].get(tag, ()))
+        return lambda row: row not in tagged
+
+    def values(self, field: str) -> List[str]:
+        """Distinct (lowercased) values of an indexed field"""
+        return list(self._bitmaps[field])
+
+    def lookup(self, field: str, value: Any) -> int:
+        """Bitmap of products whose `field` equals `value` (case-insensitive)"""
+        return self._bitmaps[field].get(_lower(value), 0)
+
+    def _category_mask(self, category: str) -> int:
+        # Same semantics as the original filter: category, sub_category, or
+        # any style tag containing the term. Substring matching scans the tag
+        # vocabulary, which is tiny compared to the catalog.
+        category_lower = _lower(category)
+        mask = self.lookup("category", category_lower) | self.lookup("sub_category", category_lower)
+        for tag, tag_mask in self._bitmaps["style_tag"].items():
+            if category_lower in tag:
+                mask |= tag_mask
+        return mask
+
+    def _price_mask(self, max_price) -> int:
+        """Bitmap of products priced at or below `max_price`"""
+        cut = bisect_right(self._sorted_prices, max_price)
+        if cut >= self.size:
+            return self.all_mask
+        if cut <= self.size // 2:
+            return bits_from_rows(self._price_order[:cut], self.size)
+        return self.all_mask & ~bits_from_rows(self._price_order[cut:], self.size)
+
+    def facet_mask(self, field: str, values: Iterable[Any]) -> int:
+        """Bitmap of products matching any of `values` for a facet"""
+        mask = 0
+        for value in values:
+            mask |= self.lookup(field, value)
+        return mask
+
+    def facet_counts(self, field: str, mask: int) -> Dict[str, int]:
+        """Number of products in `mask` per value of a facet (non-zero only)"""
+        counts = {}
+        for value, bitmap in self._bitmaps[field].items():
+            count = (bitmap & mask).bit_count()
+            if count:
+                counts[self._labels[field][value]] = count
+        if field == "price_bucket":
+            order = {label: i for i, (_, _, label) in enumerate(PRICE_BUCKETS)}
+            return dict(sorted(counts.items(), key=lambda kv: order[kv[0]]))
+        return dict(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+
+    def products_for(self, mask: int) -> List[Dict[str, Any]]:
+        """Products selected by a bitmap, in catalog order"""
+        products = self.products
+        return [products[row] for row in iter_bits(mask)]
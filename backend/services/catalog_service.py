@@ -1,14 +1,12 @@
 # backend/services/catalog_service.py
+import gzip
 import json
-from pathlib import Path
-from typing import List, Optional, Dict, Any
+import threading
+from typing import Callable, List, Optional, Dict, Any, Iterable, Tuple
 
 from models import Product
-
-DATA_DIR = Path(__file__).resolve().parent.parent / "data"
-
-with open(DATA_DIR / "products_fashion.json", "r", encoding="utf-8") as f:
-    _PRODUCTS: List[Product] = [Product(**p) for p in json.load(f)]
+from services.catalog_index import FACET_FIELDS, SORT_ORDERS, bits_from_rows, iter_bits
+from services.product_store import ProductStore, get_store
 
 
 def list_products(
@@ -17,23 +15,202 @@ def list_products(
     max_price: Optional[int] = None,
     color: Optional[str] = None,
 ) -> List[Product]:
-    products = _PRODUCTS
-    if category:
-        products = [p for p in products if p.category.lower() == category.lower()]
-    if sub_category:
-        products = [p for p in products if p.sub_category.lower() == sub_category.lower()]
+    # Composite (category, sub_category, color) index with a price-sorted
+    # secondary order: one dict lookup plus a bisect for the price cap
+    store = get_store()
+    rows = store.index.list_rows(category, sub_category, color, max_price)
+    return [store.model(row) for row in rows]
+
+
+PRODUCT_FIELDS = tuple(Product.model_fields)
+
+RESPONSE_CACHE_SIZE = 4096  # serialized bodies kept per catalog snapshot
+GZIP_MIN_BYTES = 1024  # smaller bodies are not worth compressing
+
+_RESPONSE_LOCK = threading.Lock()
+
+
+def query_products(
+    category: Optional[str] = None,
+    sub_category: Optional[str] = None,
+    max_price: Optional[int] = None,
+    color: Optional[str] = None,
+    sort: Optional[str] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    store: Optional[ProductStore] = None,
+) -> Tuple[int, List[Product]]:
+    """One page of the filtered, sorted catalog, plus the total match count"""
+    store = store or get_store()
+    rows = store.index.list_rows(category, sub_category, color, max_price)
+    if sort:
+        rows.sort(key=store.index.sort_key(sort))
+    page = rows[offset:] if limit is None else rows[offset:offset + limit]
+    return len(rows), [store.model(row) for row in page]
+
+
+def project(product: Product, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Product as a JSON-ready dict, limited to `fields` when given"""
+    data = product.model_dump()
+    if fields:
+        return {f: data[f] for f in fields}
+    return data
+
+
+class CachedBody:
+    """A serialized JSON response, with its gzip variant built on first use"""
+    __slots__ = ("body", "total", "_gzipped")
+
+    def __init__(self, body: bytes, total: Optional[int] = None):
+        self.body = body
+        self.total = total
+        self._gzipped: Optional[bytes] = None
+
+    @property
+    def compressible(self) -> bool:
+        return len(self.body) >= GZIP_MIN_BYTES
+
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzipped
+
+
+def _dumps(data: Any) -> bytes:
+    # Same encoding as fastapi.responses.JSONResponse
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _cached_body(
+    store: ProductStore, key: tuple, build: Callable[[], Optional[CachedBody]]
+) -> Optional[CachedBody]:
+    # The cache belongs to the store snapshot, so a catalog reload drops it
+    cache = store.response_cache
+    with _RESPONSE_LOCK:
+        entry = cache.get(key)
+        if entry is not None:
+            cache.move_to_end(key)
+            return entry
+    entry = build()
+    if entry is not None:
+        with _RESPONSE_LOCK:
+            cache[key] = entry
+            while len(cache) > RESPONSE_CACHE_SIZE:
+                cache.popitem(last=False)
+    return entry
+
+
+def listing_body(
+    category: Optional[str] = None,
+    sub_category: Optional[str] = None,
+    max_price: Optional[int] = None,
+    color: Optional[str] = None,
+    sort: Optional[str] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    fields: Optional[Iterable[str]] = None,
+    store: Optional[ProductStore] = None,
+) -> CachedBody:
+    """
+    Serialized page of the catalog listing, reused until the next reload.
+    Pass the `store` the response's ETag was taken from, so both describe
+    the same snapshot.
+    """
+    store = store or get_store()
+    fields = tuple(fields) if fields else None
+    key = ("list", category, sub_category, max_price, color, sort, offset, limit, fields)
+
+    def build() -> CachedBody:
+        total, page = query_products(category, sub_category, max_price, color, sort, offset, limit, store)
+        return CachedBody(_dumps([project(p, fields) for p in page]), total)
+
+    return _cached_body(store, key, build)
+
+
+def product_body(
+    sku: str, fields: Optional[Iterable[str]] = None, store: Optional[ProductStore] = None
+) -> Optional[CachedBody]:
+    """Serialized product detail, reused until the next reload"""
+    store = store or get_store()
+    fields = tuple(fields) if fields else None
+
+    def build() -> Optional[CachedBody]:
+        product = store.get_model(sku)
+        return None if product is None else CachedBody(_dumps(project(product, fields)))
+
+    return _cached_body(store, ("sku", sku, fields), build)
+
+
+def faceted_search(
+    filters: Dict[str, List[str]],
+    q: Optional[str] = None,
+    max_price: Optional[int] = None,
+    sort: Optional[str] = None,
+    offset: int = 0,
+    limit: int = 24,
+    fields: Optional[Iterable[str]] = None,
+    store: Optional[ProductStore] = None,
+) -> Dict[str, Any]:
+    """
+    Catalog search returning one page of products plus counts per facet
+    value (category, sub_category, brand, base_color, size, occasion,
+    price_bucket).
+
+    Values within a facet are OR-ed and facets are AND-ed. Each facet's
+    counts ignore that facet's own selection, so the UI can show what
+    choosing another value would give. Everything is bitmap AND plus
+    popcount over the index; results are never rescanned.
+    """
+    store = store or get_store()
+    index = store.index
+    base = index.all_mask
     if max_price is not None:
-        products = [p for p in products if p.price <= max_price]
-    if color:
-        products = [p for p in products if p.base_color.lower() == color.lower()]
-    return products
+        base &= index.price_mask(max_price)
+
+    scores: Dict[int, int] = {}
+    if q and q.strip():
+        scores = index.score_query(list(set(q.lower().split())))
+        base &= bits_from_rows(scores, index.size)
+
+    selected = {
+        field: index.facet_mask(field, values)
+        for field, values in filters.items()
+        if values
+    }
+    mask = base
+    for facet_mask in selected.values():
+        mask &= facet_mask
+
+    facets = {}
+    for field in FACET_FIELDS:
+        others = base
+        for other, facet_mask in selected.items():
+            if other != field:
+                others &= facet_mask
+        facets[field] = index.facet_counts(field, others)
+
+    rows = list(iter_bits(mask))
+    if sort:
+        rows.sort(key=index.sort_key(sort))
+    elif scores:
+        rows.sort(key=lambda row: -scores[row])
+
+    return {
+        "total": len(rows),
+        "offset": offset,
+        "limit": limit,
+        "items": [project(store.model(row), fields) for row in rows[offset:offset + limit]],
+        "facets": facets,
+    }
+
+
+def get_suggestions(prefix: str, limit: int = 8) -> List[Dict[str, Any]]:
+    """Typeahead suggestions for `prefix` from the current catalog snapshot"""
+    return get_store().suggestions.suggest(prefix, limit)
 
 
 def get_product_by_sku(sku: str) -> Optional[Product]:
-    for p in _PRODUCTS:
-        if p.sku == sku:
-            return p
-    return None
+    return get_store().get_model(sku)
 
 
 def recommend_products_for_params(params: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -0,0 +1,145 @@
+# backend/services/customer_profiles.py
+
+import hashlib
+import json
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from services.record_stream import iter_records
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+# Browsing events recorded at runtime (POST /events), one JSON object per line
+EVENT_LOG = DATA_DIR / "browsing_events.jsonl"
+
+RECENT_ACTIONS = 10  # event types kept for "recent_actions"
+RECENT_SEARCHES = 20  # latest queries kept for "search_queries"
+RECENT_ORDERS = 5  # orders averaged to infer a budget
+CATEGORY_EVENTS = ("view_product", "add_to_cart", "purchase")
+
+
+def _preferences_from_customer(customer: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "primary_style": customer.get("primary_style"),
+        "color_preferences": customer.get("color_preferences", []),
+        "size_profile": customer.get("size_profile", {}),
+        "loyalty_tier": customer.get("loyalty_tier"),
+        "preferred_occasion": customer.get("preferred_occasion_focus", []),
+    }
+
+
+@dataclass
+class CustomerProfile:
+    """Everything the recommendation engine derives about one customer"""
+    customer_id: str
+    preferences: Dict[str, Any] = field(default_factory=lambda: _preferences_from_customer({}))
+    viewed_categories: Dict[str, int] = field(default_factory=dict)
+    search_queries: Deque[str] = field(default_factory=lambda: deque(maxlen=RECENT_SEARCHES))
+    recent_actions: Deque[str] = field(default_factory=lambda: deque(maxlen=RECENT_ACTIONS))
+    recent_order_totals: Deque[Any] = field(default_factory=lambda: deque(maxlen=RECENT_ORDERS))
+    # Bumped on every change so callers can tell when cached results are stale
+    version: int = 0
+
+    def apply_event(self, event: Dict[str, Any]):
+        event_type = event.get("event_type")
+        if event_type in CATEGORY_EVENTS:
+            cat = event.get("category", "unknown")
+            self.viewed_categories[cat] = self.viewed_categories.get(cat, 0) + 1
+        if event_type == "search" and event.get("search_query"):
+            self.search_queries.append(event["search_query"])
+        self.recent_actions.append(event_type)
+        self.version += 1
+
+    def apply_order(self, order: Dict[str, Any]):
+        self.recent_order_totals.append(order.get("total_amount"))
+        self.version += 1
+
+    def browsing_patterns(self) -> Dict[str, Any]:
+        return {
+            "viewed_categories": dict(self.viewed_categories),
+            "search_queries": list(self.search_queries),
+            "recent_actions": list(self.recent_actions),
+        }
+
+    def fingerprint(self) -> str:
+        """
+        Digest of what no-query recommendations depend on (preferences and
+        the inferred budget): equal in every process holding the same data,
+        unlike `version`, which counts this process's updates.
+        """
+        data = json.dumps([self.preferences, self.budget()], sort_keys=True, default=str)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+
+    def budget(self, default=5000) -> int:
+        """Average of the most recent order totals, or `default` without orders"""
+        if not self.recent_order_totals:
+            return default
+        totals = [default if t is None else t for t in self.recent_order_totals]
+        return int(sum(totals) / len(totals))
+
+
+_PROFILES: Dict[str, CustomerProfile] = {}
+_LOCK = threading.Lock()
+
+
+def _profile_for_update(customer_id: str) -> CustomerProfile:
+    profile = _PROFILES.get(customer_id)
+    if profile is None:
+        profile = _PROFILES[customer_id] = CustomerProfile(customer_id)
+    return profile
+
+
+def get_profile(customer_id: Optional[str]) -> CustomerProfile:
+    """Cached profile for a customer; unknown customers get an empty one"""
+    profile = _PROFILES.get(customer_id)
+    if profile is None:
+        return CustomerProfile(customer_id)
+    return profile
+
+
+def known_customers() -> List[str]:
+    """Ids of every customer with a profile"""
+    return list(_PROFILES)
+
+
+def update_customer(customer: Dict[str, Any]):
+    """Refresh the profile-derived preferences after a customer record changes"""
+    with _LOCK:
+        profile = _profile_for_update(customer["customer_id"])
+        profile.preferences = _preferences_from_customer(customer)
+        profile.version += 1
+
+
+def record_event(event: Dict[str, Any]):
+    """Fold a new browsing event into the customer's profile"""
+    with _LOCK:
+        _profile_for_update(event["customer_id"]).apply_event(event)
+
+
+def record_order(order: Dict[str, Any]):
+    """Fold a new order into the customer's profile (budget inference)"""
+    customer_id = order.get("customer_id")
+    if not customer_id:
+        return
+    with _LOCK:
+        _profile_for_update(customer_id).apply_order(order)
+
+
+def _load_profiles():
+    # Streamed: browsing-history exports can be far larger than the profiles
+    for customer in iter_records(DATA_DIR / "customers_fashion.json"):
+        update_customer(customer)
+
+    for event in iter_records(DATA_DIR / "browsing_history_fashion.json"):
+        record_event(event)
+    if EVENT_LOG.exists():
+        for event in iter_records(EVENT_LOG):
+            record_event(event)
+
+    for order in iter_records(DATA_DIR / "orders.json"):
+        record_order(order)
+
+
+_load_profiles()
@@ -0,0 +1,160 @@
+# backend/services/fuzzy_match.py
+"""
+Typo-tolerant term lookup.
+
+`TrigramIndex` maps every character trigram of a vocabulary to the words
+containing it. A misspelled token only has to be compared against words that
+share enough trigrams with it (one edit changes at most three trigrams), and
+those few candidates are then checked with a Levenshtein distance that gives
+up as soon as it exceeds the allowed number of edits.
+
+Only tokens that are not English words are corrected ("wheel" and "jacked"
+are meant as typed), which needs a word list, one word per line
+(DICTIONARY_FILE, /usr/share/dict/words by default). Without one, query
+tokens are still corrected for relevance scoring, but `closest_term` finds
+nothing, so a fuzzy match never becomes a category filter.
+"""
+
+import logging
+import os
+import re
+from array import array
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DICTIONARY_FILE = Path(os.getenv("DICTIONARY_FILE", "/usr/share/dict/words"))
+
+# Tokens shorter than this are never corrected ("show" is not a typo of "shoe")
+MIN_FUZZY_LENGTH = 5
+# Tokens at least this long may be two edits away from the intended word
+TWO_EDIT_LENGTH = 8
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9\-]*")
+
+
+@lru_cache(maxsize=1)
+def english_words() -> Optional[FrozenSet[str]]:
+    """The word list (lowercased), or None when DICTIONARY_FILE is missing"""
+    try:
+        with open(DICTIONARY_FILE, encoding="utf-8", errors="ignore") as f:
+            return frozenset(line.strip().lower() for line in f if line.strip())
+    except OSError:
+        logger.warning(f"No word list at {DICTIONARY_FILE}: typos are not matched to category keywords")
+        return None
+
+
+def is_word(token: str) -> bool:
+    """True for tokens in the word list ("short", "means"), which are not typos"""
+    words = english_words()
+    return words is not None and token in words
+
+
+def max_edits(token: str) -> int:
+    """Edits tolerated for a token of this length (0 = exact only)"""
+    if len(token) >= TWO_EDIT_LENGTH:
+        return 2
+    if len(token) >= MIN_FUZZY_LENGTH:
+        return 1
+    return 0
+
+
+def trigrams(word: str) -> set:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance of a and b, or limit + 1 once it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+class TrigramIndex:
+    """Fuzzy lookup over a fixed vocabulary of lowercase words"""
+
+    def __init__(self, words: Iterable[str]):
+        self.words: List[str] = sorted(set(words))
+        postings: Dict[str, List[int]] = {}
+        for wid, word in enumerate(self.words):
+            for gram in trigrams(word):
+                postings.setdefault(gram, []).append(wid)
+        self._postings = {gram: array("I", wids) for gram, wids in postings.items()}
+        self._exact = set(self.words)
+        self.lookup = lru_cache(maxsize=4096)(self._lookup)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._exact
+
+    def _lookup(self, token: str, limit: Optional[int] = None) -> tuple:
+        """
+        Vocabulary words closest to `token` within `limit` edits (by default
+        what max_edits allows), all at the same, smallest distance.
+        """
+        if limit is None:
+            limit = max_edits(token)
+        if token in self._exact:
+            return (token,)
+        if limit <= 0 or is_word(token):
+            return ()
+
+        grams = trigrams(token)
+        # Each edit destroys at most three of the token's trigrams
+        needed = len(grams) - 3 * limit
+        if needed <= 0:
+            return ()
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for wid in self._postings.get(gram, ()):
+                shared[wid] = shared.get(wid, 0) + 1
+
+        best, matches = limit + 1, []
+        for wid, count in shared.items():
+            if count < needed:
+                continue
+            word = self.words[wid]
+            distance = edit_distance(token, word, min(limit, best))
+            if distance > limit:
+                continue
+            if distance < best:
+                best, matches = distance, [word]
+            elif distance == best:
+                matches.append(word)
+        return tuple(sorted(matches))
+
+
+@lru_cache(maxsize=32)
+def _term_index(terms: tuple) -> TrigramIndex:
+    return TrigramIndex(terms)
+
+
+def closest_term(text: str, terms: Sequence[str]) -> Optional[str]:
+    """
+    First word of `text` that is a likely misspelling of one of `terms`
+    (e.g. "kurtha" -> "kurta"), for keyword tables that only match exact
+    words. Returns the matched term, or None; always None without a word
+    list, as a real word one edit from a keyword would become a filter.
+    """
+    if english_words() is None:
+        return None
+    index = _term_index(tuple(terms))
+    for word in _WORD.findall(text.lower()):
+        matches = index.lookup(word)
+        if matches:
+            return matches[0]
+    return None
@@ -0,0 +1,203 @@
+# backend/services/inventory_log.py
+"""
+On-disk snapshot plus change log for inventory.
+
+Inventory state is a snapshot followed by the deltas appended since. Both
+live in DATA_DIR, numbered by generation:
+
+    inventory_fashion.json         generation 0 snapshot (the shipped data)
+    inventory_snapshot.<g>.json    snapshot written by compaction g
+    inventory_deltas.<g>.jsonl     deltas on top of snapshot <g>, one per line
+
+A delta is {"sku", "store_id", "quantity_change"}, optionally with
+"last_updated", a "reserved_change" (units taken or given back by checkout
+reservations, services.stock_reservations) and, for a store the SKU has no
+row in yet, the store's "store_name", "store_type" and "city". Writers
+only append whole lines, so every reader applies the same deltas in the
+same order, and a process catches up with other writers by reading the log
+from where it stopped. Compaction writes the current rows as snapshot
+<g + 1> and drops the older files, so a restart loads one snapshot and
+replays a short tail. Appends and compaction hold an OS lock on a lock
+file, so no delta lands in a log that is being compacted away.
+
+CLI (appends the deltas to the log; running servers pick them up):
+
+    python -m services.inventory_log deltas.jsonl [--compact]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+BASE_SNAPSHOT = "inventory_fashion.json"
+
+_SNAPSHOT = re.compile(r"^inventory_snapshot\.(\d+)\.json$")
+STORE_FIELDS = ("store_name", "store_type", "city")
+
+LOCK_TIMEOUT = 30.0  # seconds to wait for the lock file
+
+try:
+    import fcntl
+
+    def _try_lock(f) -> bool:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlock(f):
+        fcntl.flock(f, fcntl.LOCK_UN)
+except ImportError:  # Windows
+    import msvcrt
+
+    def _try_lock(f) -> bool:
+        f.seek(0)
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def parse_delta(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """A validated delta; ValueError when a field is missing or malformed"""
+    sku, store_id = raw.get("sku"), raw.get("store_id")
+    if not sku or not store_id:
+        raise ValueError("sku and store_id are required")
+    change = raw.get("quantity_change")
+    if isinstance(change, bool) or not isinstance(change, int):
+        raise ValueError("quantity_change must be an integer")
+    delta = {
+        "sku": str(sku),
+        "store_id": str(store_id),
+        "quantity_change": change,
+        "last_updated": raw.get("last_updated") or datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+    reserved = raw.get("reserved_change")
+    if reserved is not None:
+        if isinstance(reserved, bool) or not isinstance(reserved, int):
+            raise ValueError("reserved_change must be an integer")
+        if reserved:
+            delta["reserved_change"] = reserved
+    for field in STORE_FIELDS:
+        if raw.get(field):
+            delta[field] = str(raw[field])
+    return delta
+
+
+class DeltaLog:
+    """Snapshot and delta files of one inventory data directory"""
+
+    def __init__(self, directory: Path = DATA_DIR):
+        self.directory = Path(directory)
+
+    @contextmanager
+    def locked(self):
+        """
+        Cross-process lock around appends and compaction: an OS lock on a
+        lock file, which the OS drops when its holder exits, so a crashed
+        process never leaves it held and a slow one never loses it
+        """
+        path = self.directory / "inventory_deltas.lock"
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        with open(path, "a+b") as f:
+            while not _try_lock(f):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{path} is held by another process")
+                time.sleep(0.01)
+            try:
+                yield
+            finally:
+                _unlock(f)
+
+    def generation(self) -> int:
+        """Generation of the newest snapshot (0: the shipped data)"""
+        found = [int(m.group(1)) for m in map(_SNAPSHOT.match, os.listdir(self.directory)) if m]
+        return max(found, default=0)
+
+    def snapshot_path(self, generation: int) -> Path:
+        if generation == 0:
+            return self.directory / BASE_SNAPSHOT
+        return self.directory / f"inventory_snapshot.{generation}.json"
+
+    def log_path(self, generation: int) -> Path:
+        return self.directory / f"inventory_deltas.{generation}.jsonl"
+
+    def append(self, generation: int, deltas: Iterable[Dict[str, Any]]):
+        """Append deltas to the generation's log, as a single write"""
+        data = "".join(json.dumps(d, separators=(",", ":")) + "\n" for d in deltas)
+        if data:
+            with open(self.log_path(generation), "a", encoding="utf-8") as f:
+                f.write(data)
+
+    def read(self, generation: int, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Deltas logged after byte `offset`, and the offset they end at"""
+        try:
+            with open(self.log_path(generation), "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        # A line still being written is left for the next read
+        end = data.rfind(b"\n") + 1
+        deltas = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+        return deltas, offset + end
+
+    def write_snapshot(self, generation: int, rows: Iterable[Dict[str, Any]]):
+        """
+        Write snapshot `generation` (atomically), then remove the previous
+        generation's files, which it supersedes.
+        """
+        path = self.snapshot_path(generation)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("[\n")
+            for i, row in enumerate(rows):
+                f.write(("," if i else "") + json.dumps(row, ensure_ascii=False) + "\n")
+            f.write("]\n")
+        os.replace(tmp, path)
+        for old in range(generation):
+            if old:
+                self.snapshot_path(old).unlink(missing_ok=True)
+            self.log_path(old).unlink(missing_ok=True)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Append inventory deltas to the change log")
+    parser.add_argument("deltas", help='JSON array or JSONL file of deltas ("-" for stdin)')
+    parser.add_argument("--compact", action="store_true", help="write a new snapshot afterwards")
+    args = parser.parse_args(argv)
+
+    from services.inventory_service import compact_inventory, ingest_deltas
+    from services.record_stream import iter_records
+    from services.stock_reservations import adjust_stock
+
+    if args.deltas == "-":
+        deltas = [json.loads(line) for line in sys.stdin if line.strip()]
+    else:
+        deltas = list(iter_records(Path(args.deltas)))
+    result = ingest_deltas(deltas)
+    if "error" in result:
+        print(f"Rejected: {result}", file=sys.stderr)
+        sys.exit(1)
+    adjust_stock(deltas)
+    print(f"Logged {result['applied']} deltas (generation {result['generation']})", file=sys.stderr)
+    if args.compact:
+        print(f"Compacted into generation {compact_inventory()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,278 @@
 # backend/services/inventory_service.py
-import json
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Iterable, List, Dict, Any, Optional, Tuple
 
 from models import InventoryItem
+from services.inventory_log import STORE_FIELDS, DeltaLog, parse_delta
+from services.record_stream import iter_records
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 
-with open(DATA_DIR / "inventory_fashion.json", "r", encoding="utf-8") as f:
-    _INVENTORY: List[InventoryItem] = [InventoryItem(**i) for i in json.load(f)]
+# Deltas logged on top of a snapshot before it is compacted into a new one
+COMPACT_EVERY = int(os.getenv("INVENTORY_COMPACT_EVERY", 10000))
+SYNC_INTERVAL = 1.0  # seconds between checks for deltas logged by other processes
+CHANGE_JOURNAL_SIZE = 4096  # recent (version, sku) changes kept for incremental readers
+
+# Inventory versions are unique across reloads, so a reader holding a
+# version can tell whether anything changed
+_VERSIONS = itertools.count(1)
+
+logger = logging.getLogger(__name__)
+
+
+def _on_hand(item: InventoryItem) -> int:
+    # unify quantity field (quantity_available vs quantity)
+    quantity = getattr(item, "quantity_available", None)
+    if quantity is None:
+        quantity = getattr(item, "quantity", 0)
+    return quantity
+
+
+def _quantity(item: InventoryItem) -> int:
+    """Units on hand that no checkout holds: what stock levels and views report"""
+    return max(_on_hand(item) - (getattr(item, "quantity_reserved", 0) or 0), 0)
+
+
+@dataclass
+class StockLevels:
+    """Units of one SKU: in total, online, and in physical stores per city"""
+
+    total: int = 0
+    online: int = 0
+    cities: Dict[str, int] = field(default_factory=dict)
+
+
+def store_city(item: InventoryItem) -> str:
+    # Store names lead with the city ("Bengaluru Orion Mall")
+    return item.city or (item.store_name.split() or [item.store_id])[0]
+
+
+class InventoryIndex:
+    """
+    Inventory rows hashed by sku, by store_id and by (sku, store_id), plus
+    per-SKU stock levels kept current as rows are added or changed.
+    """
+
+    def __init__(self, items: Iterable[InventoryItem], generation: int = 0):
+        # Position in the change log (services.inventory_log) this index reflects
+        self.generation = generation
+        self.log_offset = 0
+        self.logged = 0  # deltas applied on top of the snapshot
+        self.items: List[InventoryItem] = []
+        self.by_sku: Dict[str, List[InventoryItem]] = {}
+        self.by_store: Dict[str, List[InventoryItem]] = {}
+        # First row of each (sku, store_id), which is the one availability reports
+        self.by_sku_store: Dict[Tuple[str, str], InventoryItem] = {}
+        self.stock: Dict[str, StockLevels] = {}
+        self.version = next(_VERSIONS)
+        self._changes: deque = deque(maxlen=CHANGE_JOURNAL_SIZE)
+        self._lock = threading.Lock()
+        for item in items:
+            self.add(item)
+
+    def changes_since(self, version: int) -> Optional[set]:
+        """SKUs changed after `version`; None when the journal no longer covers it"""
+        changes = list(self._changes)
+        if changes and changes[0][0] > version + 1:
+            return None
+        return {sku for v, sku in changes if v > version}
+
+    def _count(self, item: InventoryItem, units: int):
+        # Journaled before the version is published: a reader that sees the
+        # version finds the change in changes_since
+        version = next(_VERSIONS)
+        self._changes.append((version, item.sku))
+        levels = self.stock.get(item.sku)
+        if levels is None:
+            levels = self.stock[item.sku] = StockLevels()
+        levels.total += units
+        if item.store_type == "online":
+            levels.online += units
+        else:
+            city = store_city(item)
+            levels.cities[city] = levels.cities.get(city, 0) + units
+        self.version = version
+
+    def add(self, item: InventoryItem):
+        self.items.append(item)
+        self.by_sku.setdefault(item.sku, []).append(item)
+        self.by_store.setdefault(item.store_id, []).append(item)
+        self.by_sku_store.setdefault((item.sku, item.store_id), item)
+        self._count(item, _quantity(item))
+
+    def store_fields(self, store_id: str) -> Optional[Dict[str, Any]]:
+        """Name, type and city of a store that already has rows"""
+        rows = self.by_store.get(store_id)
+        if not rows:
+            return None
+        return {f: getattr(rows[0], f) for f in STORE_FIELDS}
+
+    def apply(self, delta: Dict[str, Any]) -> Optional[InventoryItem]:
+        """
+        Apply a logged quantity (and reserved quantity) change, never below
+        zero; None if it names an unknown store
+        """
+        with self._lock:
+            current = self.by_sku_store.get((delta["sku"], delta["store_id"]))
+            if current is None:
+                store = {f: delta[f] for f in STORE_FIELDS if f in delta} or self.store_fields(delta["store_id"])
+                if not store or "store_name" not in store or "store_type" not in store:
+                    return None
+                current = InventoryItem(
+                    sku=delta["sku"],
+                    store_id=delta["store_id"],
+                    quantity_available=max(delta["quantity_change"], 0),
+                    quantity_reserved=max(delta.get("reserved_change", 0), 0),
+                    last_updated=delta["last_updated"],
+                    **store,
+                )
+                self.add(current)
+                return current
+            self._count(current, -_quantity(current))
+            current.quantity_available = max(_on_hand(current) + delta["quantity_change"], 0)
+            current.quantity_reserved = max(current.quantity_reserved + delta.get("reserved_change", 0), 0)
+            current.last_updated = delta["last_updated"]
+            self._count(current, _quantity(current))
+            return current
+
+
+_LOG = DeltaLog(DATA_DIR)
+_SYNC_LOCK = threading.Lock()
+_last_sync = 0.0
+
+
+def _catch_up(index: InventoryIndex):
+    deltas, index.log_offset = _LOG.read(index.generation, index.log_offset)
+    for delta in deltas:
+        if index.apply(delta) is None:
+            logger.warning("Skipping inventory delta for unknown store %s", delta.get("store_id"))
+    index.logged += len(deltas)
+
+
+def _load_index() -> InventoryIndex:
+    """The newest snapshot plus the deltas logged since"""
+    generation = _LOG.generation()
+    index = InventoryIndex(
+        (InventoryItem(**i) for i in iter_records(_LOG.snapshot_path(generation))), generation
+    )
+    _catch_up(index)
+    return index
+
+
+_INDEX = _load_index()
+
+
+def sync_inventory() -> InventoryIndex:
+    """Apply what other processes logged (reloading after a compaction)"""
+    global _INDEX, _last_sync
+    with _SYNC_LOCK:
+        if _LOG.generation() != _INDEX.generation:
+            _INDEX = _load_index()
+        else:
+            _catch_up(_INDEX)
+        _last_sync = time.monotonic()
+        return _INDEX
+
+
+def _index() -> InventoryIndex:
+    if time.monotonic() - _last_sync >= SYNC_INTERVAL:
+        return sync_inventory()
+    return _INDEX
+
+
+def ingest_deltas(raw_deltas: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Validate a batch of deltas, append it to the change log and apply it
+    (with anything else logged meanwhile). A batch with an invalid delta is
+    rejected as a whole. Compacts once enough deltas have accumulated.
+    """
+    index = sync_inventory()
+    deltas = []
+    for i, raw in enumerate(raw_deltas):
+        try:
+            delta = parse_delta(raw)
+        except ValueError as e:
+            return {"error": str(e), "index": i}
+        if (delta["sku"], delta["store_id"]) not in index.by_sku_store and not (
+            index.store_fields(delta["store_id"]) or {"store_name", "store_type"} <= delta.keys()
+        ):
+            return {"error": f"Unknown store {delta['store_id']}: store_name and store_type are required", "index": i}
+        deltas.append(delta)
+
+    with _LOG.locked():
+        _LOG.append(_LOG.generation(), deltas)
+    index = sync_inventory()
+    if index.logged >= COMPACT_EVERY:
+        compact_inventory()
+    return {"applied": len(deltas), "generation": index.generation}
+
+
+def compact_inventory() -> int:
+    """Write the current rows as a new snapshot generation; returns it"""
+    with _LOG.locked():
+        index = sync_inventory()
+        with _SYNC_LOCK:
+            generation = index.generation + 1
+            _LOG.write_snapshot(generation, (item.model_dump() for item in index.items))
+            index.generation, index.log_offset, index.logged = generation, 0, 0
+    return generation
+
+
+def inventory_index() -> InventoryIndex:
+    """The current inventory index (caught up with the change log)"""
+    return _index()
 
 
 def list_inventory() -> List[InventoryItem]:
-    return _INVENTORY
+    return _index().items
 
 
 def get_inventory_by_sku(sku: str) -> List[InventoryItem]:
-    return [i for i in _INVENTORY if i.sku == sku]
+    return list(_index().by_sku.get(sku, ()))
 
 
 def get_inventory_by_store(store_id: str) -> List[InventoryItem]:
-    return [i for i in _INVENTORY if i.store_id == store_id]
+    return list(_index().by_store.get(store_id, ()))
+
+
+def get_stock_levels(sku: str) -> StockLevels:
+    return _index().stock.get(sku) or StockLevels()
+
+
+def get_availability(skus: Iterable[str], store_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Availability of a whole list of SKUs in one pass: for each SKU, its total
+    quantity and the stores holding it (only `store_id` when given). SKUs
+    without inventory come back with a total of 0 and no stores.
+    """
+    index = _index()
+    out: Dict[str, Dict[str, Any]] = {}
+    for sku in skus:
+        if sku in out:
+            continue
+        if store_id:
+            item = index.by_sku_store.get((sku, store_id))
+            rows = [item] if item is not None else []
+        else:
+            rows = index.by_sku.get(sku, ())
+        stores = [
+            {
+                "store_id": item.store_id,
+                "store_name": item.store_name,
+                "store_type": item.store_type,
+                "quantity_available": _quantity(item),
+            }
+            for item in rows
+        ]
+        out[sku] = {"total": sum(s["quantity_available"] for s in stores), "stores": stores}
+    return out
 
 
 def check_inventory_for_recs(
@@ -32,30 +284,26 @@ def check_inventory_for_recs(
     Given recommended SKUs and store_id/size, return availability.
     Works both if inventory JSON is store-based or only has size+quantity.
     """
+    index = _index()
     items_out = []
 
     for rec in recommendations:
         sku = rec["sku"]
-        # filter inventory for this sku (and store if present)
-        inv_items = [i for i in _INVENTORY if i.sku == sku]
+        # the sku's first inventory row (in the given store, if any)
         if store_id:
-            inv_items = [i for i in inv_items if (i.store_id == store_id or i.store_id is None)]
+            inv = index.by_sku_store.get((sku, store_id))
+        else:
+            inv = next(iter(index.by_sku.get(sku, ())), None)
 
-        if not inv_items:
+        if inv is None:
             continue
 
-        inv = inv_items[0]
-        # unify quantity field (quantity_available vs quantity)
-        quantity = (
-            inv.quantity_available
-            if inv.quantity_available is not None
-            else inv.quantity
-        )
+        quantity = _quantity(inv)
 
         item_payload = {
             "sku": sku,
             "quantity_available": quantity,
-            "size": size or inv.size,
+            "size": size or getattr(inv, "size", None),
         }
 
         if inv.store_id:
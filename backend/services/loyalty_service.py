@@ -8,10 +8,10 @@ from models import (
     Promotion,
     LoyaltyQuoteRequest,
     LoyaltyQuoteResponse,
-    Product,
     CartItem,
 )
 from services.order_service import OrderService
+from services.product_store import get_store
 from datetime import datetime, timedelta, timezone
 import logging
 
@@ -29,24 +29,20 @@ with open(DATA_DIR / "promotions_fashion.json", "r", encoding="utf-8") as f:
         p["promo_code"]: Promotion(**p) for p in json.load(f)
     }
 
-with open(DATA_DIR / "products_fashion.json", "r", encoding="utf-8") as f:
-    _PRODUCTS: Dict[str, Product] = {
-        p["sku"]: Product(**p) for p in json.load(f)
-    }
-
-    # Load styleclub loyalty program YAML/JSON
-    try:
-        with open(DATA_DIR / "loyalty_styleclub.json", "r", encoding="utf-8") as f:
-            _STYLECLUB = json.load(f).get("loyalty_program", {})
-    except Exception as e:
-        logger.warning("Could not load loyalty_styleclub.json: %s", e)
-        _STYLECLUB = {}
+# Load styleclub loyalty program YAML/JSON
+try:
+    with open(DATA_DIR / "loyalty_styleclub.json", "r", encoding="utf-8") as f:
+        _STYLECLUB = json.load(f).get("loyalty_program", {})
+except Exception as e:
+    logger.warning("Could not load loyalty_styleclub.json: %s", e)
+    _STYLECLUB = {}
 
 
 def _compute_subtotal(items: list[CartItem]) -> float:
     subtotal = 0.0
+    store = get_store()
     for item in items:
-        p = _PRODUCTS.get(item.sku)
+        p = store.get_model(item.sku)
         if not p:
             continue
         subtotal += p.price * item.quantity
@@ -199,9 +195,10 @@ def check_discount_eligibility(customer_id: str, items: list[dict]) -> dict:
     sku_categories = []
     eligible_item_total = 0.0
     has_applicable = False
+    store = get_store()
     for it in items:
         sku = it.get("sku")
-        product = _PRODUCTS.get(sku)
+        product = store.get_model(sku)
         if not product:
             continue
         cat = product.category
@@ -1,7 +1,8 @@
 from typing import Tuple, Dict, Any
 from services.sessions import SessionContext
 from services.llm_client import route_tasks, compose_reply
-from services.recommendation import recommend_products
+from services.refinement import recommend_turn
+from services.fuzzy_match import closest_term
 # from services.inventory_service import check_inventory
 from services.loyalty_service import quote_loyalty_for_cart as quote_loyalty
 from services.kestra_client import start_reserve_flow
@@ -81,10 +82,17 @@ async def process_message(req, ctx: SessionContext) -> Tuple[str, SessionContext
         best_length = 0
         
         for token, (cat, sub) in cat_map.items():
-            if token in text_l and len(token) > best_length:
+            # Whole words only, plurals included ("heel" is not in "wheel")
+            if len(token) > best_length and re.search(rf"\b{re.escape(token)}(?:e?s)?\b", text_l):
                 best_match = (cat, sub)
                 best_length = len(token)
         
+        if not best_match:
+            # Tolerate typos in the keywords ("snekers", "kurtha")
+            typo = closest_term(text_l, list(cat_map))
+            if typo:
+                best_match = cat_map[typo]
+
         if best_match:
             params["category"] = best_match[0]
             params["sub_category"] = best_match[1]
@@ -136,9 +144,10 @@ async def process_message(req, ctx: SessionContext) -> Tuple[str, SessionContext
             inferred = infer_params_from_text(req.message)
             merged_params = {**inferred, **(params or {})}
 
-            # recommend_products expects (customer_id, params, user_message)
+            # Refinements ("cheaper ones", "in black") re-rank the previous
+            # turn's candidates kept in the session
             customer_id = getattr(ctx, "customer_id", None)
-            recs = recommend_products(customer_id, merged_params, req.message)
+            recs, ctx.candidates = recommend_turn(customer_id, merged_params, req.message, ctx.candidates)
             task_results["RECOMMEND_PRODUCTS"] = recs
 
         elif ttype == "CHECK_INVENTORY":
@@ -1,19 +1,20 @@
 # backend/services/order_service.py
 
-import json
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional
 import uuid
 
+from services.customer_profiles import record_order
+from services.record_stream import iter_records
+from services.stock_reservations import commit, extend, release, reserve
+
 # Load data
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 
-with open(DATA_DIR / "orders.json", "r", encoding="utf-8") as f:
-    ORDERS_DB = json.load(f)
+ORDERS_DB = list(iter_records(DATA_DIR / "orders.json"))
 
-with open(DATA_DIR / "payments.json", "r", encoding="utf-8") as f:
-    PAYMENTS_DB = json.load(f)
+PAYMENTS_DB = list(iter_records(DATA_DIR / "payments.json"))
 
 # Generate unique IDs
 def generate_order_id():
@@ -27,8 +28,14 @@ class OrderService:
     """Manage orders and payments"""
     
     @staticmethod
-    def create_order(customer_id: str, cart_items: List[Dict], totals: Dict, delivery_address: Dict = None) -> Dict:
-        """Create order from cart"""
+    def create_order(
+        customer_id: str,
+        cart_items: List[Dict],
+        totals: Dict,
+        delivery_address: Dict = None,
+        reservation_id: Optional[str] = None,
+    ) -> Dict:
+        """Create order from cart (holding stock under `reservation_id`, if any)"""
         
         if not cart_items:
             return {"error": "Cart is empty"}
@@ -45,11 +52,13 @@ class OrderService:
             "total_amount": totals.get("total"),
             "status": "pending_payment",
             "delivery_address": delivery_address or {},
+            "reservation_id": reservation_id,
             "created_at": datetime.now().isoformat(),
             "updated_at": datetime.now().isoformat(),
         }
         
         ORDERS_DB.append(order)
+        record_order(order)
         
         return {
             "status": "created",
@@ -106,6 +115,40 @@ class OrderService:
             "redirect_url": f"/api/payments/{payment_id}/paypal-create"
         }
     
+    @staticmethod
+    def hold_stock(payment_id: str) -> Dict:
+        """
+        Make sure a payment's order still has its stock held before money is
+        taken: a live hold is extended, an expired one taken again from what
+        is left. Error dict when the stock is gone.
+        """
+        payment = OrderService.get_payment_status(payment_id)
+        if "error" in payment:
+            return payment
+        order = OrderService.get_order(payment["order_id"])
+        if not order or not order.get("reservation_id"):
+            return {"status": "held", "reservation_id": None}
+        held = extend(order["reservation_id"])
+        if "error" not in held:
+            return held
+        return reserve(order["items"], reservation_id=order["reservation_id"])
+
+    @staticmethod
+    def _commit_stock(order: Dict) -> Dict:
+        """
+        Commit the order's reservation; one that expired before payment is
+        taken again from what is left, under the same id
+        """
+        result = commit(order["reservation_id"])
+        if "error" not in result:
+            return result
+        again = reserve(order["items"], reservation_id=order["reservation_id"])
+        if "error" in again:
+            return again
+        if again["reservation_id"]:
+            return commit(again["reservation_id"])
+        return result
+
     @staticmethod
     def process_payment(payment_id: str, payment_details: Dict) -> Dict:
         """Process payment"""
@@ -124,10 +167,27 @@ class OrderService:
         payment_status = payment_details.get("status", "success")
         
         if payment_status == "success":
+            order = OrderService.get_order(payment["order_id"])
+            # The reserved units are sold now
             payment["status"] = "completed"
+            if order and order.get("reservation_id"):
+                sold = OrderService._commit_stock(order)
+                if "error" in sold:
+                    # The money is taken but the stock is gone: the order
+                    # waits for a refund instead of being confirmed
+                    order["status"] = "refund_pending"
+                    order["payment_id"] = payment_id
+                    order["updated_at"] = datetime.now().isoformat()
+                    return {
+                        "status": "refund_pending",
+                        "payment_id": payment_id,
+                        "order_id": payment["order_id"],
+                        "message": "Some items sold out before the payment went through; the amount will be refunded.",
+                        "stock": sold,
+                    }
+
             
             # Update order status
-            order = OrderService.get_order(payment["order_id"])
             if order:
                 order["status"] = "confirmed"
                 order["payment_id"] = payment_id
@@ -145,6 +205,10 @@ class OrderService:
             }
         else:
             payment["status"] = "failed"
+            # Give the held units back to stock
+            order = OrderService.get_order(payment["order_id"])
+            if order and order.get("reservation_id"):
+                release(order["reservation_id"])
             return {
                 "status": "failed",
                 "payment_id": payment_id,
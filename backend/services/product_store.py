@@ -0,0 +1,287 @@
+# backend/services/product_store.py
+
+import hashlib
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import redis
+
+from db.redis_client import redis_client
+from models import Product
+from services.autocomplete import build_suggestions
+from services.catalog_binary import BinaryCatalog, encode_record
+from services.catalog_index import CatalogIndex
+from services.record_stream import iter_records
+from services.segment_cache import SegmentCache
+from services.semantic_index import build_semantic_index
+from services.stock_index import StockIndex
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+PRODUCTS_FILE = DATA_DIR / "products_fashion.json"
+# Built by `python -m services.catalog_binary`; preferred when up to date
+PRODUCTS_BINARY = DATA_DIR / "products_fashion.bin"
+
+MODEL_CACHE_SIZE = 65536  # pydantic Product models kept per snapshot
+
+# Catalog version and source every worker should serve, shared through
+# Redis so that a reload requested from one worker reaches all of them
+SHARED_KEY = "catalog:current"
+SYNC_INTERVAL = 1.0  # seconds between checks of the shared version
+SYNC_MAX_BACKOFF = 60.0  # longest wait between checks while Redis is down
+
+logger = logging.getLogger(__name__)
+
+
+def _intern(value: Any) -> Any:
+    # Category, brand, colour, size and tag values repeat across thousands of
+    # rows; interning keeps one copy of each string
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [_intern(v) for v in value]
+    if isinstance(value, dict):
+        return {sys.intern(k): _intern(v) for k, v in value.items()}
+    return value
+
+
+class ProductStore:
+    """
+    The product catalog, loaded once per process and shared by every service
+    and router that needs product data.
+
+    Rows are addressed by row number. From JSON they are plain dicts (with
+    interned strings) plus a SKU -> row dict; from a compiled catalog
+    (services/catalog_binary.py) they stay in the memory-mapped file and are
+    decoded on access, with SKU lookups done by binary search. Pydantic
+    `Product` models are only built when a caller asks for one.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]], version: int = 1, source: str = "file"):
+        if isinstance(records, BinaryCatalog):
+            self.products: Sequence[Dict[str, Any]] = records
+            self._row_of = records.find
+            digest = records.digest()
+        else:
+            digest = hashlib.sha1()
+            self.products = []
+            for r in records:
+                digest.update(encode_record(r))
+                self.products.append(_intern(r))
+            by_sku: Dict[str, int] = {}
+            for row, p in enumerate(self.products):
+                by_sku.setdefault(p.get("sku"), row)
+            self._row_of = by_sku.get
+        self.size = len(self.products)
+        self.version = version
+        # Digest of the rows, equal in every process that loaded the same
+        # catalog (whatever its local version number)
+        self.fingerprint = digest.hexdigest()[:16]
+        self.index = CatalogIndex(self.products, version)
+        # Cold-start rankings and typeahead suggestions, rebuilt with every snapshot
+        self.segments = SegmentCache(self.index)
+        self.suggestions = build_suggestions(self.index)
+        # In-stock bitmaps over these rows, following the live inventory
+        self.stock = StockIndex(self._row_of, self.size)
+        # Precomputed embeddings describe the catalog files, not MongoDB
+        self.semantic = build_semantic_index(
+            self.size, (PRODUCTS_FILE, PRODUCTS_BINARY) if source == "file" else ()
+        )
+        self.built_at = time.time()
+        self.model = lru_cache(maxsize=MODEL_CACHE_SIZE)(self._build_model)
+        # Pre-serialized API responses for this snapshot (see catalog_service)
+        self.response_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+
+    def row_of(self, sku: str) -> Optional[int]:
+        return self._row_of(sku)
+
+    def get(self, sku: str) -> Optional[Dict[str, Any]]:
+        row = self._row_of(sku)
+        return None if row is None else self.products[row]
+
+    def _build_model(self, row: int) -> Product:
+        return Product(**self.products[row])
+
+    def get_model(self, sku: str) -> Optional[Product]:
+        row = self._row_of(sku)
+        return None if row is None else self.model(row)
+
+
+def _binary_is_fresh() -> bool:
+    """A compiled catalog exists and is not older than the JSON it came from"""
+    try:
+        return PRODUCTS_BINARY.stat().st_mtime >= PRODUCTS_FILE.stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+
+def _read_records(source: str) -> Iterable[Dict[str, Any]]:
+    """Catalog rows from `source`; JSON and Mongo rows are streamed, not listed"""
+    if source == "file":
+        if _binary_is_fresh():
+            return BinaryCatalog(PRODUCTS_BINARY)
+        return iter_records(PRODUCTS_FILE)
+    if source == "mongo":
+        from db.mongo_client import get_collection
+
+        collection = get_collection("products")
+        if collection is None:
+            raise RuntimeError("MongoDB is not available")
+        return collection.find({}, {"_id": 0})
+    raise ValueError(f"Unknown catalog source: {source}")
+
+
+def _shared_version() -> Optional[Dict[str, Any]]:
+    """The version and source every worker should serve; None if Redis is unreachable"""
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hsetnx(SHARED_KEY, "version", 1)
+        pipe.hgetall(SHARED_KEY)
+        shared = pipe.execute()[1]
+    except redis.RedisError as e:
+        logger.warning("Cannot read the shared catalog version: %s", e)
+        return None
+    return {"version": int(shared["version"]), "source": shared.get("source", "file")}
+
+
+def _initial_store() -> ProductStore:
+    # A worker starting after reloads from the file serves the shared
+    # version straight away; one reloaded from Mongo catches up in the
+    # background (see _sync)
+    shared = _shared_version()
+    if shared and shared["source"] == "file":
+        return ProductStore(_read_records("file"), version=shared["version"])
+    return ProductStore(_read_records("file"))
+
+
+_STORE = _initial_store()
+_RELOAD_LOCK = threading.Lock()
+_RELOAD_STATUS: Dict[str, Any] = {
+    "state": "idle",
+    "source": "file",
+    "last_error": None,
+    "build_seconds": None,
+}
+_failed_version: Optional[int] = None  # shared version whose build failed here
+_sync_thread: Optional[threading.Thread] = None
+
+
+def _sync() -> bool:
+    """
+    Start building the shared catalog version if this worker is behind it.
+    False if Redis is unreachable.
+    """
+    shared = _shared_version()
+    if shared is None:
+        return False
+    if shared["version"] > _STORE.version and shared["version"] != _failed_version:
+        _start(shared["source"], shared["version"])
+    return True
+
+
+def _sync_loop():
+    delay = SYNC_INTERVAL
+    while True:
+        time.sleep(delay)
+        # Back off while Redis is down, so requests never wait on it
+        delay = SYNC_INTERVAL if _sync() else min(delay * 2, SYNC_MAX_BACKOFF)
+
+
+def start_catalog_sync():
+    """Start this process's background thread following the shared catalog version (once)"""
+    global _sync_thread
+    if _sync_thread is None:
+        _sync_thread = threading.Thread(target=_sync_loop, name="catalog-sync", daemon=True)
+        _sync_thread.start()
+
+
+def get_store() -> ProductStore:
+    """The current catalog. Read it once per request and keep the reference."""
+    return _STORE
+
+
+def get_product(sku: str) -> Optional[Dict[str, Any]]:
+    return get_store().get(sku)
+
+
+def reload_store(source: str = "file", version: Optional[int] = None) -> ProductStore:
+    """
+    Build a new catalog snapshot (rows, indexes) and swap it in.
+
+    Requests that already hold the previous store keep using it until they
+    finish; new requests see the new version. The swap is a single reference
+    assignment, so readers never see a half-built catalog. `version` is the
+    shared version being built; without one this worker's version goes up.
+    """
+    global _STORE, _failed_version
+    with _RELOAD_LOCK:
+        version = version or _STORE.version + 1
+        if version <= _STORE.version:
+            return _STORE  # built meanwhile
+        _RELOAD_STATUS.update(state="running", source=source, last_error=None)
+        started = time.perf_counter()
+        try:
+            store = ProductStore(_read_records(source), version=version, source=source)
+        except Exception as e:
+            _failed_version = version
+            _RELOAD_STATUS.update(state="failed", last_error=str(e))
+            logger.warning("Catalog reload from %s failed: %s", source, e)
+            raise
+        _STORE = store
+        _RELOAD_STATUS.update(state="idle", build_seconds=round(time.perf_counter() - started, 3))
+        logger.info("Catalog reloaded from %s: version=%d products=%d", source, store.version, store.size)
+        return store
+
+
+def _start(source: str, version: Optional[int] = None) -> bool:
+    if _RELOAD_LOCK.locked():
+        return False
+
+    def _run():
+        try:
+            reload_store(source, version)
+        except Exception:
+            pass  # recorded in the reload status
+
+    threading.Thread(target=_run, name="catalog-reload", daemon=True).start()
+    return True
+
+
+def start_reload(source: str = "file") -> bool:
+    """
+    Reload the catalog on every worker: bump the shared version, which the
+    others pick up within SYNC_INTERVAL, and start building it here in a
+    background thread. False if a reload is already running here.
+    """
+    if _RELOAD_LOCK.locked():
+        return False
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hsetnx(SHARED_KEY, "version", _STORE.version)
+        pipe.hincrby(SHARED_KEY, "version", 1)
+        pipe.hset(SHARED_KEY, "source", source)
+        version = pipe.execute()[1]
+        if version <= _STORE.version:
+            # The shared key was reset (Redis flushed) while this worker ran
+            version = _STORE.version + 1
+            redis_client.hset(SHARED_KEY, "version", version)
+    except redis.RedisError as e:
+        logger.warning("Cannot publish the catalog reload, reloading this worker only: %s", e)
+        version = None
+    return _start(source, version)
+
+
+def catalog_status() -> Dict[str, Any]:
+    store = _STORE
+    return {
+        "version": store.version,
+        "products": store.size,
+        "built_at": datetime.fromtimestamp(store.built_at, timezone.utc).isoformat(),
+        "reload": dict(_RELOAD_STATUS),
+    }
@@ -1,79 +1,65 @@
 # backend/services/recommendation.py
 
-import json
-from pathlib import Path
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+import heapq
+from typing import List, Dict, Any, Optional, Sequence
 
-# Load data files
-DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+from services.catalog_index import iter_bits
+from services.customer_profiles import get_profile
+from services.product_store import ProductStore, get_store
+from services.recommendation_cache import RESULT_CACHE, make_key
+from services.segment_cache import BUDGET_TARGET, Segment
 
-with open(DATA_DIR / "products_fashion.json", "r", encoding="utf-8") as f:
-    PRODUCTS = json.load(f)
-
-with open(DATA_DIR / "customers_fashion.json", "r", encoding="utf-8") as f:
-    CUSTOMERS = {c["customer_id"]: c for c in json.load(f)}
-
-with open(DATA_DIR / "browsing_history_fashion.json", "r", encoding="utf-8") as f:
-    BROWSING_HISTORY = json.load(f)
-
-with open(DATA_DIR / "orders.json", "r", encoding="utf-8") as f:
-    ORDERS = json.load(f)
+# Relevance per unit of cosine similarity (for queries without keyword
+# matches), and the similarity below which a product does not count as a
+# semantic match
+SEMANTIC_WEIGHT = 4
+SEMANTIC_MIN_SIMILARITY = 0.25
 
 
 def get_customer_preferences(customer_id: str) -> Dict[str, Any]:
     """Extract customer preferences from profile"""
-    customer = CUSTOMERS.get(customer_id, {})
-    
-    return {
-        "primary_style": customer.get("primary_style"),
-        "color_preferences": customer.get("color_preferences", []),
-        "size_profile": customer.get("size_profile", {}),
-        "loyalty_tier": customer.get("loyalty_tier"),
-        "preferred_occasion": customer.get("preferred_occasion_focus", []),
-    }
+    return dict(get_profile(customer_id).preferences)
 
 
 def get_customer_browsing_patterns(customer_id: str) -> Dict[str, Any]:
     """Analyze customer's browsing and purchase history"""
-    # Get recent browsing history (last 30 days)
-    recent_history = [
-        event for event in BROWSING_HISTORY 
-        if event["customer_id"] == customer_id
-    ]
-    
-    # Get categories viewed
-    viewed_categories = {}
-    for event in recent_history:
-        if event["event_type"] in ["view_product", "add_to_cart", "purchase"]:
-            cat = event.get("category", "unknown")
-            viewed_categories[cat] = viewed_categories.get(cat, 0) + 1
-    
-    # Get search patterns
-    search_queries = [
-        event["search_query"] for event in recent_history 
-        if event["event_type"] == "search" and event["search_query"]
-    ]
-    
-    return {
-        "viewed_categories": viewed_categories,
-        "search_queries": search_queries,
-        "recent_actions": [e["event_type"] for e in recent_history[-10:]],
-    }
+    return get_profile(customer_id).browsing_patterns()
 
 
 def get_customer_budget_from_history(customer_id: str, default=5000) -> int:
     """Infer budget from purchase history"""
-    customer_orders = [o for o in ORDERS if o.get("customer_id") == customer_id]
-    
-    if customer_orders:
-        recent_prices = [o.get("total_amount", default) for o in customer_orders[-5:]]
-        return int(sum(recent_prices) / len(recent_prices)) if recent_prices else default
-    
-    return default
+    return get_profile(customer_id).budget(default)
 
 
 def recommend_products(customer_id: str, params: Dict, user_message: str = "") -> List[Dict]:
+    """
+    Cached front for the recommendation engine. Near-identical asks within a
+    session ("white sneakers" -> "White sneakers ") are answered from
+    RESULT_CACHE; entries are keyed by catalog and profile version, and by
+    the version of the in-stock bitmap they were ranked against, so they go
+    stale as soon as any of them changes (but not when stock moves without
+    a product selling out or coming back where the customer shops).
+    """
+    store = get_store()
+    index = store.index
+    query = params.get("query") or user_message or ""
+    key = make_key(
+        customer_id,
+        params,
+        query,
+        index.version,
+        get_profile(customer_id).version,
+        store.stock.mask_version(params.get("store_id")),
+    )
+    cached = RESULT_CACHE.get(key)
+    if cached is None:
+        cached = _recommend_products(store, customer_id, params, user_message)
+        RESULT_CACHE.put(key, cached)
+    # Callers annotate the dicts they get back, so hand out copies
+    return [dict(rec) for rec in cached]
+
+
+def _recommend_products(store: ProductStore, customer_id: str, params: Dict, user_message: str = "") -> List[Dict]:
     """
     Intelligent recommendation engine:
     1. Analyze user message for intent and preferences
@@ -81,226 +67,260 @@ def recommend_products(customer_id: str, params: Dict, user_message: str = "") -
     3. Apply filters and ranking
     4. Return personalized recommendations
     """
-    
-    # Get customer context
-    preferences = get_customer_preferences(customer_id)
-    browsing_patterns = get_customer_browsing_patterns(customer_id)
-    inferred_budget = get_customer_budget_from_history(customer_id)
-    
-    # Extract filter parameters
-    gender = params.get("gender", "Women")  # Default
-    category = params.get("category")
-    style = params.get("style", preferences.get("primary_style"))
-    max_price = params.get("max_price", inferred_budget)
+    return rank_products(store, resolve_params(customer_id, params, user_message))
+
+
+def resolve_params(customer_id: str, params: Dict, user_message: str = "") -> Dict[str, Any]:
+    """
+    The filters a recommendation is ranked with: explicit params first, then
+    the customer's profile (preferred style, occasion, colour, inferred
+    budget). Customers that resolve to the same filters get the same
+    recommendations, which is what batch runs share work on.
+    """
+    # Get customer context from the cached profile
+    profile = get_profile(customer_id)
+    preferences = profile.preferences
     pref_occasions = preferences.get("preferred_occasion") or []
-    occasion = params.get("occasion", pref_occasions[0] if pref_occasions else None)
     pref_colors = preferences.get("color_preferences") or []
-    color_pref = params.get("color", pref_colors[0] if pref_colors else None)
     # Respect free-text query from LLM/user
     query = params.get("query") or user_message or ""
-    query = query.strip().lower() if query else ""
-    
-    # Start with all products
-    results = PRODUCTS
-    
-    # Apply filters
+    return {
+        "gender": params.get("gender", "Women"),  # Default
+        "category": params.get("category"),
+        "style": params.get("style", preferences.get("primary_style")),
+        "max_price": params.get("max_price") if "max_price" in params else profile.budget(),
+        "occasion": params.get("occasion", pref_occasions[0] if pref_occasions else None),
+        "color": params.get("color", pref_colors[0] if pref_colors else None),
+        "size": params.get("size"),
+        # Stock scope: a store_id, "online" or "physical"; None is anywhere
+        "store_id": params.get("store_id"),
+        "query": query.strip().lower() if query else "",
+    }
+
+
+def lexical_scores(store: ProductStore, query: str, rows: Sequence[int]) -> Dict[int, float]:
+    """Keyword relevance of candidate rows to a free-text query; unmatched rows are left out"""
+    return store.index.score_query(list(set(query.split())), rows)
+
+
+def semantic_scores(store: ProductStore, query: str, rows: Sequence[int]) -> Dict[int, float]:
+    """Semantic relevance of the candidate rows close enough to the query to count as matches"""
+    if store.semantic is None or not len(rows):
+        return {}
+    return {
+        # Rounded: float32 products over different row subsets differ in
+        # the last bits, which must not reorder equal products
+        row: round(SEMANTIC_WEIGHT * sim, 4)
+        for row, sim in zip(rows, store.semantic.similarities(query, rows).tolist())
+        if sim >= SEMANTIC_MIN_SIMILARITY
+    }
+
+
+def _query_scores(store: ProductStore, query: str, rows: Sequence[int]) -> Dict[int, float]:
+    """
+    Relevance of candidate rows to a free-text query. Keyword matches win;
+    semantic similarity is the fallback when no candidate shares a word
+    with the query, so "something breezy for a beach wedding" still finds
+    products without outranking real keyword matches elsewhere.
+    """
+    return lexical_scores(store, query, rows) or semantic_scores(store, query, rows)
+
+
+def filter_mask(store: ProductStore, resolved: Dict[str, Any]) -> int:
+    """Bitmap of the rows passing the hard filters (everything but colour, size and query)"""
+    index = store.index
+    gender = resolved["gender"]
+    category = resolved["category"]
+    style = resolved["style"]
+    max_price = resolved["max_price"]
+    occasion = resolved["occasion"]
+
+    # Candidate retrieval: intersect the precomputed bitmaps for each filter
+    mask = index.all_mask
+
     if gender:
-        results = [p for p in results if p.get("gender", "").lower() == gender.lower()]
-    
+        mask &= index.lookup("gender", gender)
+
     if category:
-        # Try matching on category first, then sub_category as fallback
-        category_lower = category.lower()
-        results = [
-            p for p in results 
-            if p.get("category", "").lower() == category_lower or 
-               p.get("sub_category", "").lower() == category_lower or
-               any(category_lower in tag.lower() for tag in p.get("style_tags", []))
-        ]
-    
+        # Matches category, sub_category, or any style tag containing the term
+        mask &= index.category_mask(category)
+
     if style:
-        results = [p for p in results if style.lower() in [s.lower() for s in p.get("style_tags", [])]]
-    
+        mask &= index.lookup("style_tag", style)
+
     if max_price:
-        results = [p for p in results if p.get("price", 0) <= max_price]
-    
+        mask &= index.price_mask(max_price)
+
     if occasion:
-        results = [p for p in results if occasion.lower() in [o.lower() for o in p.get("occasion", [])]]
-    
+        mask &= index.lookup("occasion", occasion)
+
+    return mask
+
+
+def stock_mask(store: ProductStore, resolved: Dict[str, Any]) -> int:
+    """Bitmap of the rows in stock where the customer is shopping"""
+    return store.stock.mask(resolved["store_id"])
+
+
+def _prefer(store: ProductStore, resolved: Dict[str, Any], mask: int) -> int:
+    """Narrow `mask` to the preferred colour, then size, where any row has it"""
+    index = store.index
+    color_pref = resolved["color"]
+    size = resolved["size"]
+
     if color_pref:
         # Prioritize color preferences
-        color_matched = [p for p in results if p.get("base_color", "").lower() == color_pref.lower()]
-        if color_matched:
-            results = color_matched
+        color_mask = mask & index.lookup("base_color", color_pref)
+        if color_mask:
+            mask = color_mask
+
+    if size:
+        size_mask = mask & index.lookup("size", size)
+        if size_mask:
+            mask = size_mask
+
+    return mask
+
+
+def _top_rows(store: ProductStore, resolved: Dict[str, Any]) -> List[int]:
+    """Full retrieval: filter the catalog with the bitmaps, then rank"""
+    mask = _prefer(store, resolved, filter_mask(store, resolved) & stock_mask(store, resolved))
+    rows = list(iter_bits(mask))  # candidate rows, in catalog order
 
     # If a text query is provided, filter by relevance to the query
-    if query:
-        # Helper to singularize simple plurals (kurtas -> kurta)
-        def singular(token: str) -> str:
-            if token.endswith('ies'):
-                return token[:-3] + 'y'
-            if token.endswith('s') and len(token) > 3:
-                return token[:-1]
-            return token
-
-        query_tokens = [t.strip() for t in query.split() if t.strip()]
-        query_tokens = list({t.lower() for t in query_tokens})
-
-        def relevance_score(p):
-            score = 0
-            name = str(p.get('name', '')).lower()
-            category_field = str(p.get('category', '')).lower()
-            sub_category_field = str(p.get('sub_category', '')).lower()
-            brand = str(p.get('brand', '')).lower()
-            style_tags = [s.lower() for s in p.get('style_tags', [])]
-            tags = [t.lower() for t in p.get('tags', [])]
-            occasion_field = ' '.join([o.lower() for o in p.get('occasion', [])])
-
-            combined = ' '.join([name, category_field, sub_category_field, brand, occasion_field] + style_tags + tags)
-
-            for token in query_tokens:
-                tok = token
-                tok_sing = singular(tok)
-
-                # Exact high-weight matches
-                if tok == sub_category_field or tok_sing == sub_category_field:
-                    score += 6
-                if tok == category_field or tok_sing == category_field:
-                    score += 5
-                if tok == brand or tok_sing == brand:
-                    score += 4
-
-                # Tags / style / occasion
-                if tok in style_tags or tok_sing in style_tags:
-                    score += 3
-                if tok in tags or tok_sing in tags:
-                    score += 3
-                if tok in occasion_field or tok_sing in occasion_field:
-                    score += 2
-
-                # Name or substring match
-                if tok in name or tok_sing in name:
-                    score += 2
-
-                # fallback: token anywhere in combined
-                if tok in combined:
-                    score += 1
-
-            return score
-
-        scored = [(relevance_score(p), p) for p in results]
-        # Keep only products with at least one match, unless none match then keep all
-        matched = [p for s, p in scored if s > 0]
-        if matched:
-            # sort by relevance score desc, keep original budget sorting as secondary
-            scored_matched = sorted([(relevance_score(p), p) for p in matched], key=lambda x: (-x[0], abs(x[1].get('price', 0) - (max_price * 0.8))))
-            results = [p for s, p in scored_matched]
-    
-    # Sort by relevance (price proximity to budget)
+    scores: Dict[int, float] = {}
+    if resolved["query"]:
+        scores = _query_scores(store, resolved["query"], rows)
+    return rank_rows(store, resolved, rows, scores)
+
+
+def rank_rows(store: ProductStore, resolved: Dict[str, Any], rows: List[int], scores: Dict[int, float]) -> List[int]:
+    """Top 5 of the candidate rows (catalog order) given their query scores"""
+    index = store.index
+    max_price = resolved["max_price"]
+
+    # Keep only products with at least one match, unless none match then keep all
+    if scores:
+        rows = sorted(scores)
+
+    def price_gap(row: int, target: float) -> float:
+        return abs(index.prices[row] - target)
+
+    # Rank by price proximity to budget (prefer slightly below it), with
+    # query relevance breaking ties; without a budget, relevance alone
     if max_price:
-        results = sorted(
-            results,
-            key=lambda p: abs(p.get("price", 0) - (max_price * 0.8))  # Prefer slightly below budget
-        )
-    
-    # Return top recommendations with rich data
-    recommendations = []
-    top_results = results[:5]
-
-    def _pick_image(product):
-        imgs = product.get("images") or product.get("image") or []
-        if isinstance(imgs, list) and len(imgs) > 0:
-            return imgs[0]
-        if isinstance(imgs, str):
-            return imgs
-        return None
+        target = max_price * BUDGET_TARGET
+        rank_key = lambda row: (price_gap(row, target), -scores.get(row, 0), row)
+    elif scores:
+        rank_key = lambda row: (-scores[row], row)
+    else:
+        rank_key = None
 
-    for product in top_results:
-        image = _pick_image(product)
-        recommendations.append({
-            "sku": product.get("sku"),
-            "name": product.get("name"),
-            "brand": product.get("brand"),
-            "price": product.get("price"),
-            "currency": product.get("currency", "INR"),
-            "category": product.get("category"),
-            "sub_category": product.get("sub_category"),
-            "style_tags": product.get("style_tags", []),
-            "sizes": product.get("sizes", []),
-            "colors_available": [product.get("base_color")] + [
-                c.get("color") for c in product.get("color_variants", [])
-            ],
-            "images": product.get("images", []),
-            "image": image,
-            "occasion": product.get("occasion", []),
-            "rating": product.get("rating", 4.5),
-            "in_stock": True,
-            "related": False,
-        })
-
-    # Add complementary / related products to act as cross-sell (items that go with the results)
-    # Strategy: find products not in top_results that share style_tags, occasion or brand
-    top_skus = {p.get("sku") for p in top_results}
-    related_candidates = []
-    # Build sets for quick comparison
-    top_style_tags = set()
-    top_occasions = set()
-    top_brands = set()
-    for p in top_results:
-        for t in p.get("style_tags", []):
-            top_style_tags.add(t.lower())
-        for o in p.get("occasion", []):
-            top_occasions.add(o.lower())
-        if p.get("brand"):
-            top_brands.add(str(p.get("brand")).lower())
-
-    for p in PRODUCTS:
-        sku = p.get("sku")
-        if not sku or sku in top_skus:
-            continue
-
-        score = 0
-        # style tag overlap
-        p_tags = {t.lower() for t in p.get("style_tags", [])}
-        score += len(top_style_tags & p_tags)
-
-        # occasion overlap
-        p_occs = {o.lower() for o in p.get("occasion", [])}
-        score += len(top_occasions & p_occs)
-
-        # brand boost
-        if str(p.get("brand", "")).lower() in top_brands:
-            score += 1
-
-        if score > 0:
-            related_candidates.append((score, p))
-
-    # sort by score desc then price proximity to average of top results
-    if related_candidates:
-        avg_price = (sum([p.get("price", 0) for p in top_results]) / len(top_results)) if top_results else 0
-        ranked = sorted(related_candidates, key=lambda x: (-x[0], abs(x[1].get("price", 0) - avg_price)))
-        # take up to 3 related items
-        related_to_add = [p for s, p in ranked][:3]
-        for product in related_to_add:
-            image = _pick_image(product)
-            recommendations.append({
-                "sku": product.get("sku"),
-                "name": product.get("name"),
-                "brand": product.get("brand"),
-                "price": product.get("price"),
-                "currency": product.get("currency", "INR"),
-                "category": product.get("category"),
-                "sub_category": product.get("sub_category"),
-                "style_tags": product.get("style_tags", []),
-                "sizes": product.get("sizes", []),
-                "colors_available": [product.get("base_color")] + [
-                    c.get("color") for c in product.get("color_variants", [])
-                ],
-                "images": product.get("images", []),
-                "image": image,
-                "occasion": product.get("occasion", []),
-                "rating": product.get("rating", 4.5),
-                "in_stock": True,
-                "related": True,
-            })
+    return heapq.nsmallest(5, rows, key=rank_key) if rank_key else rows[:5]
 
+
+def _top_rows_in_segment(
+    store: ProductStore, segment: Segment, max_price: float, query: str, in_stock: int
+) -> Optional[List[int]]:
+    """
+    Top rows from a precomputed segment ranking, re-ranked by the query;
+    the same rows full retrieval would pick. None when the segment's kept
+    rows cannot decide that (too few of them are in stock or match the
+    query).
+    """
+    rows = [row for row in segment.rows if in_stock >> row & 1]
+    if not query:
+        # In-stock rows outside the segment rank below these too
+        return rows[:5] if len(rows) >= 5 or segment.complete else None
+    scores = lexical_scores(store, query, rows)
+    if not scores:
+        # Only a complete segment knows that no candidate matches by keyword,
+        # which is when full retrieval falls back to semantic matches, or
+        # keeps every candidate without those
+        if not segment.complete:
+            return None
+        scores = semantic_scores(store, query, rows)
+        if not scores:
+            return rows[:5]
+    elif len(scores) < 5 and not segment.complete:
+        # Matches further down the budget ranking could still make the top 5
+        return None
+    # Every row outside the segment is further from the budget than every
+    # row in it, so the best matches by (price gap, relevance) are all here
+    prices = store.index.prices
+    target = max_price * BUDGET_TARGET
+    return heapq.nsmallest(5, scores, key=lambda row: (abs(prices[row] - target), -scores[row], row))
+
+
+def rank_products(store: ProductStore, resolved: Dict[str, Any]) -> List[Dict]:
+    """Recommendations (top results plus cross-sell) for resolved filters"""
+    in_stock = stock_mask(store, resolved)
+    top_rows = None
+    if resolved["max_price"] and not resolved["style"] and not resolved["color"] and not resolved["size"]:
+        # Profile-free filters (anonymous / cold-start customers): start
+        # from the precomputed segment ranking
+        segment = store.segments.get(
+            resolved["gender"], resolved["category"], resolved["occasion"], resolved["max_price"]
+        )
+        if segment is not None:
+            top_rows = _top_rows_in_segment(
+                store, segment, resolved["max_price"], resolved["query"], in_stock
+            )
+    if top_rows is None:
+        top_rows = _top_rows(store, resolved)
+    return recommendations_for(store, top_rows, in_stock)
+
+
+def recommendations_for(store: ProductStore, top_rows: List[int], in_stock: int) -> List[Dict]:
+    """Recommendation dicts for ranked top rows, followed by their cross-sell"""
+    index = store.index
+    products = index.products
+
+    # Return top recommendations with rich data, then complementary /
+    # related products to act as cross-sell (items that go with the
+    # results): in-stock products not in top_results that share
+    # style_tags, occasion or brand, served from the index's precomputed
+    # affinity table
+    related_rows = index.related_rows(top_rows, 3, allowed=in_stock)
+    recommendations = [
+        recommendation_dict(products[row], related=False, in_stock=bool(in_stock >> row & 1))
+        for row in top_rows
+    ]
+    recommendations.extend(
+        recommendation_dict(products[row], related=True, in_stock=bool(in_stock >> row & 1))
+        for row in related_rows
+    )
     return recommendations
+
+
+def _pick_image(product: Dict[str, Any]):
+    imgs = product.get("images") or product.get("image") or []
+    if isinstance(imgs, list) and len(imgs) > 0:
+        return imgs[0]
+    if isinstance(imgs, str):
+        return imgs
+    return None
+
+
+def recommendation_dict(product: Dict[str, Any], related: bool, in_stock: bool = True) -> Dict[str, Any]:
+    """The recommendation payload for one catalog product"""
+    return {
+        "sku": product.get("sku"),
+        "name": product.get("name"),
+        "brand": product.get("brand"),
+        "price": product.get("price"),
+        "currency": product.get("currency", "INR"),
+        "category": product.get("category"),
+        "sub_category": product.get("sub_category"),
+        "style_tags": product.get("style_tags", []),
+        "sizes": product.get("sizes", []),
+        "colors_available": [product.get("base_color")] + [
+            c.get("color") for c in product.get("color_variants", [])
+        ],
+        "images": product.get("images", []),
+        "image": _pick_image(product),
+        "occasion": product.get("occasion", []),
+        "rating": product.get("rating", 4.5),
+        "in_stock": in_stock,
+        "related": related,
+    }
@@ -0,0 +1,97 @@
+# backend/services/recommendation_cache.py
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+RECO_CACHE_SIZE = int(os.getenv("RECO_CACHE_SIZE", 2048))
+RECO_CACHE_TTL = int(os.getenv("RECO_CACHE_TTL", 300))  # seconds
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip().lower()
+    if isinstance(value, (list, tuple, set)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    return value
+
+
+def make_key(
+    customer_id: Optional[str],
+    params: Dict[str, Any],
+    query: str,
+    catalog_version: Any,
+    profile_version: Any,
+    stock_version: Any = None,
+) -> str:
+    """
+    Cache key for a recommendation call. Matching in the engine is
+    case-insensitive, so string params are lowercased; the catalog, profile
+    and stock versions make entries go stale as soon as any changes.
+    """
+    return json.dumps(
+        [
+            customer_id,
+            _normalize(params or {}),
+            " ".join((query or "").lower().split()),
+            catalog_version,
+            profile_version,
+            stock_version,
+        ],
+        sort_keys=True,
+        default=str,
+    )
+
+
+class RecommendationCache:
+    """Bounded LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_size: int = RECO_CACHE_SIZE, ttl: float = RECO_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+RESULT_CACHE = RecommendationCache()
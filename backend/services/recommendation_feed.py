@@ -0,0 +1,246 @@
+# backend/services/recommendation_feed.py
+"""
+Materialized per-customer recommendation feeds in Redis.
+
+A returning customer's no-query recommendations (the landing-page feed)
+depend only on their profile and the catalog, so `materialize()` computes
+them for every customer ahead of time (through the batch path) and stores
+each feed under `reco:feed:<customer_id>` as one compact JSON value:
+
+    [catalog_fingerprint, profile_fingerprint, computed_at, [top skus], [related skus]]
+
+`get_feed()` serves a feed with a single GET and re-hydrates the SKUs from
+the catalog. A feed is stale when the catalog's content changed, the
+customer's preferences or inferred budget changed, one of its top picks
+sold out, or it is older than FEED_MAX_AGE; stale or missing feeds are
+recomputed on the spot and written back. Both fingerprints are content
+digests, so every worker and the CLI agree on them.
+
+Only one materialization runs at a time across workers and the CLI: a run
+holds `reco:feed:materialize` (SET NX with an expiry it renews as it writes).
+
+CLI: `python -m services.recommendation_feed [--workers N]`
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from db.redis_client import redis_client
+from services.batch_recommendation import BATCH_WORKERS, iter_batch
+from services.customer_profiles import get_profile, known_customers
+from services.product_store import ProductStore, get_store
+from services.recommendation import recommend_products, recommendation_dict
+
+FEED_EXPIRE = int(os.getenv("RECO_FEED_EXPIRE", 7 * 24 * 60 * 60))  # 7 days
+FEED_MAX_AGE = int(os.getenv("RECO_FEED_MAX_AGE", 24 * 60 * 60))  # recompute after a day
+WRITE_BATCH = 1000  # SETs per pipeline round trip
+RUN_KEY = "reco:feed:materialize"
+# A crashed run frees the lock after this long; live runs renew it per write batch
+RUN_LOCK_TTL = int(os.getenv("RECO_FEED_LOCK_TTL", 10 * 60))
+
+logger = logging.getLogger(__name__)
+
+
+def _feed_key(customer_id: str) -> str:
+    return f"reco:feed:{customer_id}"
+
+
+def _encode(recs: List[Dict[str, Any]], catalog_fingerprint: str, profile_fingerprint: str) -> str:
+    return json.dumps(
+        [
+            catalog_fingerprint,
+            profile_fingerprint,
+            int(time.time()),
+            [r["sku"] for r in recs if not r["related"]],
+            [r["sku"] for r in recs if r["related"]],
+        ],
+        separators=(",", ":"),
+    )
+
+
+def _hydrate(store: ProductStore, top: List[str], related: List[str]) -> Optional[List[Dict[str, Any]]]:
+    """The stored feed's recommendations; None once one of its top picks sold out"""
+    in_stock = store.stock.mask()
+    recs = []
+    for skus, is_related in ((top, False), (related, True)):
+        for sku in skus:
+            row = store.row_of(sku)
+            if row is None:
+                continue
+            available = bool(in_stock >> row & 1)
+            if not available and not is_related:
+                return None
+            recs.append(recommendation_dict(store.products[row], related=is_related, in_stock=available))
+    return recs
+
+
+# KEYS: run lock; ARGV: holder's token, new TTL (0: release) -> 1 if held
+_RENEW = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+if ARGV[2] == '0' then
+    redis.call('DEL', KEYS[1])
+else
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+_renew_script = redis_client.register_script(_RENEW)
+
+
+def _claim_run() -> Optional[str]:
+    """A token for the run lock, or None while another run holds it"""
+    token = uuid.uuid4().hex
+    return token if redis_client.set(RUN_KEY, token, nx=True, ex=RUN_LOCK_TTL) else None
+
+
+def _renew_run(token: str, ttl: int = RUN_LOCK_TTL) -> bool:
+    return bool(_renew_script(keys=[RUN_KEY], args=[token, ttl]))
+
+
+def materialize(
+    customer_ids: Optional[Iterable[str]] = None,
+    workers: int = BATCH_WORKERS,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """
+    Compute and store the feed of every given (default: known) customer.
+    RuntimeError if another run is in progress.
+    """
+    token = _claim_run()
+    if token is None:
+        raise RuntimeError("Feed materialization is already running")
+    try:
+        return _materialize(token, customer_ids, workers, on_progress)
+    finally:
+        _renew_run(token, 0)
+
+
+def _materialize(
+    token: str,
+    customer_ids: Optional[Iterable[str]],
+    workers: int,
+    on_progress: Optional[Callable[[int, int], None]],
+) -> int:
+    customer_ids = list(known_customers() if customer_ids is None else customer_ids)
+    store = get_store()
+    # Fingerprints as of before ranking, so a change during the run marks
+    # the feed stale rather than being hidden by it
+    profiles = {cid: get_profile(cid).fingerprint() for cid in customer_ids}
+    pipe = redis_client.pipeline(transaction=False)
+    written = 0
+    for line in iter_batch(customer_ids, {}, "", workers, on_progress):
+        customer_id = line["customer_id"]
+        value = _encode(line["recommendations"], store.fingerprint, profiles[customer_id])
+        pipe.set(_feed_key(customer_id), value, ex=FEED_EXPIRE)
+        written += 1
+        if written % WRITE_BATCH == 0:
+            pipe.execute()
+            if not _renew_run(token):
+                raise RuntimeError("Feed materialization lost its run lock")
+    pipe.execute()
+    return written
+
+
+def get_feed(customer_id: str) -> Dict[str, Any]:
+    """The customer's feed: materialized when fresh, recomputed otherwise"""
+    store = get_store()
+    profile = get_profile(customer_id).fingerprint()
+    raw = redis_client.get(_feed_key(customer_id))
+    if raw:
+        catalog, stored_profile, computed_at, top, related = json.loads(raw)
+        if (
+            catalog == store.fingerprint
+            and stored_profile == profile
+            and time.time() - computed_at <= FEED_MAX_AGE
+        ):
+            recs = _hydrate(store, top, related)
+            if recs is not None:
+                return {
+                    "customer_id": customer_id,
+                    "source": "materialized",
+                    "computed_at": computed_at,
+                    "recommendations": recs,
+                }
+
+    recs = recommend_products(customer_id, {}, "")
+    value = _encode(recs, store.fingerprint, profile)
+    redis_client.set(_feed_key(customer_id), value, ex=FEED_EXPIRE)
+    return {
+        "customer_id": customer_id,
+        "source": "recomputed",
+        "computed_at": json.loads(value)[2],
+        "recommendations": recs,
+    }
+
+
+_MATERIALIZE_STATUS: Dict[str, Any] = {
+    "state": "idle",
+    "customers": None,
+    "last_error": None,
+    "seconds": None,
+}
+
+
+def start_materialize(workers: int = BATCH_WORKERS) -> bool:
+    """
+    Materialize every feed in a background thread; False if a run is already
+    in progress (in any worker or the CLI)
+    """
+    token = _claim_run()
+    if token is None:
+        return False
+    _MATERIALIZE_STATUS.update(state="running", last_error=None)
+
+    def _run():
+        started = time.perf_counter()
+        try:
+            count = _materialize(token, None, workers, None)
+            _MATERIALIZE_STATUS.update(
+                state="idle", customers=count, seconds=round(time.perf_counter() - started, 3)
+            )
+        except Exception as e:
+            _MATERIALIZE_STATUS.update(state="failed", last_error=str(e))
+            logger.warning("Feed materialization failed: %s", e)
+        finally:
+            _renew_run(token, 0)
+
+    threading.Thread(target=_run, name="feed-materialize", daemon=True).start()
+    return True
+
+
+def materialize_status() -> Dict[str, Any]:
+    """This worker's last run, and whether a run is in progress anywhere"""
+    return {**_MATERIALIZE_STATUS, "running": bool(redis_client.exists(RUN_KEY))}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Materialize recommendation feeds into Redis")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+
+    def progress(done: int, total: int):
+        elapsed = time.perf_counter() - started
+        print(f"{done}/{total} feeds ({done / elapsed:.0f}/s)", file=sys.stderr, flush=True)
+
+    try:
+        count = materialize(workers=args.workers, on_progress=progress)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    print(f"Materialized {count} feeds", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
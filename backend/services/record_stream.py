@@ -0,0 +1,130 @@
+# backend/services/record_stream.py
+"""
+Incremental reader for the data files.
+
+`iter_records(path)` yields one record at a time from either a JSON array
+(`[{...}, {...}]`) or JSON Lines (one object per line), reading the file in
+fixed-size chunks. Loaders fold each record into their own structures as it
+arrives, so peak memory is the size of what they keep rather than the raw
+document plus a full list of intermediate dicts. Routes that return a whole
+file encode it back with `json_array` as it is read, routes that look up one
+record by id use a `RecordIndex` built in one pass, and records added at
+runtime go to a JSONL file through `append_records`.
+"""
+
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+CHUNK_SIZE = 1 << 16  # characters read per refill
+
+_SEPARATORS = re.compile(r"[\s,]*")
+_WHITESPACE = re.compile(r"\s*")
+
+
+def iter_records(path: Union[str, Path], chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Yield the records of a JSON array or JSONL file, in file order"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def refill() -> bool:
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buf = buf[pos:] + chunk
+            pos = 0
+            return True
+
+        # Find the first significant character to tell the two formats apart
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf) or not refill():
+                break
+        if pos == len(buf):
+            return
+        in_array = buf[pos] == "["
+        if in_array:
+            pos += 1
+        skip = _SEPARATORS if in_array else _WHITESPACE
+
+        while True:
+            pos = skip.match(buf, pos).end()
+            if pos == len(buf):
+                if refill():
+                    continue
+                if in_array:
+                    raise ValueError(f"{path}: unterminated JSON array")
+                return
+            if in_array and buf[pos] == "]":
+                return
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Record spans the chunk boundary (or the file is malformed)
+                if refill():
+                    continue
+                raise
+            if end == len(buf) and not eof and refill():
+                # A bare scalar may have been cut at the boundary; decode again
+                continue
+            yield record
+            pos = end
+
+
+class RecordIndex:
+    """
+    Records of a data file by the value of one field, read in a single pass
+    on first use and again only when the file changes on disk. The first
+    record wins when an id repeats.
+    """
+
+    def __init__(self, path: Union[str, Path], key: str):
+        self.path = Path(path)
+        self.key = key
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._records: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, value: Any) -> Optional[Any]:
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    records: Dict[Any, Any] = {}
+                    for record in iter_records(self.path):
+                        if isinstance(record, dict):
+                            records.setdefault(record.get(self.key), record)
+                    self._records, self._stamp = records, stamp
+        return self._records.get(value)
+
+
+def json_array(records: Iterable[Any], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Encode records as one JSON array, in chunks of about `chunk_size` bytes"""
+    parts = [b"["]
+    size = 1
+    for i, record in enumerate(records):
+        part = (b"," if i else b"") + json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        parts.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield b"".join(parts)
+            parts, size = [], 0
+    parts.append(b"]")
+    yield b"".join(parts)
+
+
+def append_records(path: Union[str, Path], records: Iterable[Any]):
+    """Append records to a JSONL file, as a single write"""
+    data = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in records)
+    if data:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(data)
@@ -0,0 +1,205 @@
+# backend/services/refinement.py
+"""
+Incremental refinement of recommendations across chat turns.
+
+Follow-ups such as "cheaper ones", "in black" or "size M" narrow what was
+just shown rather than start a new search. After every recommendation turn
+the session keeps that turn's filters, and once a turn has been refined,
+its candidate set in compact form: the products that passed the hard
+filters (gender, category, style, budget, occasion), as SKUs with their
+query scores:
+
+    {"v": catalog_fingerprint, "filters": {...}, "skus": [...],
+     "scores": [...], "semantic": [...]}
+
+(keyword scores, and the semantic scores full retrieval falls back to when
+no remaining candidate matches by keyword).
+
+A refinement turn starts from the previous filters and applies what the new
+message changes. When that only narrows them (a lower budget, an added
+colour or size, a category where there was none), a stored set is filtered
+and re-ranked in place, which picks the same products a full search would.
+New searches, refinements that widen the search (another category, a
+higher budget, a different colour), a reloaded catalog, and candidate sets
+larger than MAX_CANDIDATES go through recommend_products, so they share its
+result cache and segment rankings.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.catalog_index import _lower, bits_from_rows, iter_bits
+from services.product_store import ProductStore, get_store
+from services.recommendation import (
+    _prefer,
+    filter_mask,
+    lexical_scores,
+    rank_rows,
+    recommend_products,
+    recommendations_for,
+    resolve_params,
+    semantic_scores,
+    stock_mask,
+)
+
+# Larger candidate sets are not kept; their refinements search in full
+MAX_CANDIDATES = int(os.getenv("REFINE_MAX_CANDIDATES", 2000))
+# Budget multiplier for "cheaper" without an explicit price
+CHEAPER_FACTOR = 0.8
+
+# Messages that refer back to the previous results
+REFINEMENT_CUES = re.compile(
+    r"\b(cheaper|less expensive|more affordable|lower price|those|these|them|ones|same|instead|only|size)\b"
+)
+CHEAPER_CUES = re.compile(r"\b(cheaper|less expensive|more affordable|lower price)\b")
+# "in black", "in size M", "only in XL"
+IN_CUE = re.compile(r"^\W*(?:(?:and|but|only|any|anything|something)\s+)*in\s+\w")
+# Params that, named without a category, qualify what was just shown
+QUALIFIERS = ("color", "size")
+
+# Filters a refinement may add but not change
+EXACT_FILTERS = ("gender", "category", "style", "occasion", "color", "size")
+# Filters a refinement may change freely (stock is checked on every turn)
+FREE_FILTERS = ("store_id",)
+
+
+def is_refinement(message: str, params: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    True when a message refers back to the previous results: a cue word, or
+    a colour or size extracted from it that either follows "in" ("in black",
+    "in black dresses") or comes without a category of its own ("black").
+    """
+    text = (message or "").lower()
+    if REFINEMENT_CUES.search(text):
+        return True
+    params = params or {}
+    if not any(params.get(key) for key in QUALIFIERS):
+        return False
+    return bool(IN_CUE.search(text)) or not params.get("category")
+
+
+def turn_query(params: Dict[str, Any], message: str) -> str:
+    """The free-text query of a turn, normalized the way resolve_params does"""
+    return (params.get("query") or message or "").strip().lower()
+
+
+def refine_filters(previous: Dict[str, Any], params: Dict[str, Any], message: str) -> Dict[str, Any]:
+    """
+    The previous turn's filters with this turn's explicit params applied.
+    The previous query is kept unless the turn brings its own: it is what
+    the narrowed results are still ranked by.
+    """
+    filters = dict(previous)
+    for key in EXACT_FILTERS + FREE_FILTERS + ("max_price",):
+        value = params.get(key)
+        if value not in (None, ""):
+            filters[key] = value
+    if params.get("query"):
+        filters["query"] = params["query"].strip().lower()
+    if not params.get("max_price") and filters.get("max_price") and CHEAPER_CUES.search(message.lower()):
+        filters["max_price"] = round(filters["max_price"] * CHEAPER_FACTOR)
+    return filters
+
+
+def narrows(old: Dict[str, Any], new: Dict[str, Any]) -> bool:
+    """True when every product `new` can return passes `old`'s hard filters"""
+    for key in EXACT_FILTERS:
+        if old.get(key) and _lower(new.get(key)) != _lower(old[key]):
+            return False
+    if new.get("query", "") != old.get("query", ""):
+        return False
+    if old.get("max_price"):
+        try:
+            return bool(new.get("max_price")) and float(new["max_price"]) <= float(old["max_price"])
+        except (TypeError, ValueError):
+            return False
+    return True
+
+
+Scores = Tuple[Dict[int, float], Dict[int, float]]  # keyword, semantic
+
+
+def _encode(
+    store: ProductStore, resolved: Dict[str, Any], rows: Optional[List[int]] = None, scores: Scores = ({}, {})
+) -> Dict[str, Any]:
+    if rows is None:
+        return {"v": store.fingerprint, "filters": resolved}
+    products = store.index.products
+    lexical, semantic = scores
+    return {
+        "v": store.fingerprint,
+        "filters": resolved,
+        "skus": [products[row].get("sku") for row in rows],
+        "scores": [lexical.get(row, 0) for row in rows] if lexical else [],
+        "semantic": [semantic.get(row, 0) for row in rows] if semantic else [],
+    }
+
+
+def _rank(store: ProductStore, resolved: Dict[str, Any], hard: int, scores: Scores) -> List[Dict]:
+    # Same steps as full retrieval, over an already filtered bitmap. Stock
+    # is checked now rather than kept with the candidates, so products
+    # that sold out or came back since the last turn are handled
+    in_stock = stock_mask(store, resolved)
+    rows = list(iter_bits(_prefer(store, resolved, hard & in_stock)))
+    lexical, semantic = scores
+    ranked = {row: lexical[row] for row in rows if row in lexical}
+    if not ranked:
+        ranked = {row: semantic[row] for row in rows if row in semantic}
+    return recommendations_for(store, rank_rows(store, resolved, rows, ranked), in_stock)
+
+
+def _search(customer_id: str, store: ProductStore, resolved: Dict[str, Any]) -> Tuple[List[Dict], Dict[str, Any]]:
+    # Cached full retrieval; only the filters are kept for the next turn
+    return recommend_products(customer_id, resolved), _encode(store, resolved)
+
+
+def _collect(customer_id: str, store: ProductStore, resolved: Dict[str, Any]) -> Tuple[List[Dict], Dict[str, Any]]:
+    # Full retrieval that keeps the candidate set, for turns that go on
+    # narrowing the same search
+    hard = filter_mask(store, resolved)
+    if hard.bit_count() > MAX_CANDIDATES:
+        return _search(customer_id, store, resolved)
+    rows = list(iter_bits(hard))
+    scores = ({}, {})
+    if resolved["query"]:
+        scores = (lexical_scores(store, resolved["query"], rows), semantic_scores(store, resolved["query"], rows))
+    return _rank(store, resolved, hard, scores), _encode(store, resolved, rows, scores)
+
+
+def _refine(store: ProductStore, resolved: Dict[str, Any], previous: Dict[str, Any]) -> Tuple[List[Dict], Dict[str, Any]]:
+    rows, lexical, semantic = [], {}, {}
+    for i, sku in enumerate(previous["skus"]):
+        row = store.row_of(sku)
+        if row is not None:
+            rows.append(row)
+            for stored, scores in ((previous["scores"], lexical), (previous.get("semantic"), semantic)):
+                if stored and stored[i]:
+                    scores[row] = stored[i]
+    scores = (lexical, semantic)
+    hard = bits_from_rows(rows, store.size) & filter_mask(store, resolved)
+    kept = set(iter_bits(hard))
+    candidates = _encode(store, resolved, [row for row in rows if row in kept], scores)
+    return _rank(store, resolved, hard, scores), candidates
+
+
+def recommend_turn(
+    customer_id: str, params: Dict[str, Any], user_message: str, previous: Optional[Dict[str, Any]] = None
+) -> Tuple[List[Dict], Optional[Dict[str, Any]]]:
+    """
+    Recommendations for one chat turn, and the filters (plus candidate set,
+    once there is one) to keep in the session for the next.
+    """
+    store = get_store()
+    if previous and previous.get("v") == store.fingerprint and is_refinement(user_message, params):
+        resolved = refine_filters(previous["filters"], params, user_message)
+        if narrows(previous["filters"], resolved):
+            if "skus" in previous:
+                return _refine(store, resolved, previous)
+            return _collect(customer_id, store, resolved)
+        # A widened search is ranked by what this turn asks for, not by
+        # the query of the search it replaces
+        resolved["query"] = turn_query(params, user_message)
+    else:
+        resolved = resolve_params(customer_id, params, user_message)
+    return _search(customer_id, store, resolved)
@@ -3,7 +3,7 @@ from pydantic import BaseModel
 from typing import Dict, Any
 from services.sessions import get_session, save_session, SessionContext
 from services.orchestrator import process_message
-from services.inventory_service import get_inventory_by_sku
+from services.inventory_service import get_stock_levels
 
 sales_agent_router = APIRouter()
 
@@ -32,20 +32,12 @@ async def handle_message(req: SalesMessageRequest) -> Dict[str, Any]:
     response = {"reply": reply}
     if task_results and task_results.get("RECOMMEND_PRODUCTS"):
         recs = task_results.get("RECOMMEND_PRODUCTS")
-        # Enrich recommendations with inventory availability
+        # Enrich recommendations with inventory availability, read from the
+        # per-SKU stock levels the inventory index maintains
         enriched = []
         for r in recs:
-            sku = r.get("sku")
-            inv_items = get_inventory_by_sku(sku)
-            total_qty = 0
-            for inv in inv_items:
-                qty = getattr(inv, "quantity_available", None) or getattr(inv, "quantity", 0)
-                try:
-                    total_qty += int(qty)
-                except Exception:
-                    pass
             r_copy = dict(r)
-            r_copy["quantity_available"] = total_qty
+            r_copy["quantity_available"] = get_stock_levels(r.get("sku")).total
             enriched.append(r_copy)
 
         response["recommendations"] = enriched
@@ -0,0 +1,98 @@
+# backend/services/segment_cache.py
+"""
+Precomputed rankings for cold-start segments.
+
+Anonymous and unknown customers have no profile, so their recommendations
+only depend on gender, category, occasion and budget (plus the query). For
+every (gender, category, occasion, price band) combination present in the
+catalog, the candidate rows are ranked once per catalog snapshot the way
+the engine ranks them without a query: closest to 80% of the budget, then
+catalog order. Each segment keeps the best SEGMENT_DEPTH rows, extended over
+ties so that every row left out ranks strictly below every row kept.
+
+A request that falls in a segment then needs a dictionary lookup, and at
+most a re-rank of the kept rows by query relevance.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from services.catalog_index import CatalogIndex, _lower, iter_bits
+
+# Budgets that get precomputed segments (the default inferred budget is 5000)
+PRICE_BANDS = (1000, 1500, 2000, 2500, 3000, 4000, 5000, 7500, 10000)
+SEGMENT_DEPTH = 40
+# Fraction of the budget the ranking aims for (shared with recommendation.py)
+BUDGET_TARGET = 0.8
+
+
+class Segment(NamedTuple):
+    rows: array  # best rows first
+    complete: bool  # rows holds every candidate of the segment
+
+
+def _key(gender: Any, category: Any, occasion: Any, max_price: Any) -> tuple:
+    return (
+        _lower(gender) or None,
+        _lower(category) or None,
+        _lower(occasion) or None,
+        max_price,
+    )
+
+
+class SegmentCache:
+    """Ranked row prefixes per (gender, category, occasion, budget band)"""
+
+    def __init__(self, index: CatalogIndex, bands=PRICE_BANDS, depth: int = SEGMENT_DEPTH):
+        self.depth = depth
+        self._segments: Dict[tuple, Segment] = {}
+        prices = index.prices
+
+        genders = [None] + [g for g in index.values("gender") if g]
+        categories = [None] + sorted({c for f in ("category", "sub_category") for c in index.values(f) if c})
+        occasions = [None] + [o for o in index.values("occasion") if o]
+
+        for gender in genders:
+            gender_mask = index.lookup("gender", gender) if gender else index.all_mask
+            for category in categories:
+                category_mask = gender_mask & index.category_mask(category) if category else gender_mask
+                if not category_mask:
+                    continue
+                for occasion in occasions:
+                    mask = category_mask & index.lookup("occasion", occasion) if occasion else category_mask
+                    if not mask:
+                        continue
+                    by_price = sorted(iter_bits(mask), key=lambda row: (prices[row], row))
+                    sorted_prices = [prices[row] for row in by_price]
+                    for cap in bands:
+                        cut = bisect_right(sorted_prices, cap)
+                        if cut:
+                            self._segments[(gender, category, occasion, cap)] = self._rank(
+                                by_price, sorted_prices, cut, cap * BUDGET_TARGET, prices
+                            )
+
+    def _rank(self, by_price: List[int], sorted_prices: List[float], cut: int, target: float, prices) -> Segment:
+        # Only rows within `depth` positions of the target price (widened
+        # over equal prices) can be among the `depth` closest to it
+        pivot = bisect_left(sorted_prices, target, 0, cut)
+        lo = max(pivot - self.depth, 0)
+        hi = min(pivot + self.depth, cut)
+        while lo > 0 and sorted_prices[lo - 1] == sorted_prices[lo]:
+            lo -= 1
+        while hi < cut and sorted_prices[hi] == sorted_prices[hi - 1]:
+            hi += 1
+
+        window = sorted(by_price[lo:hi], key=lambda row: (abs(prices[row] - target), row))
+        end = min(self.depth, len(window))
+        last_gap = abs(prices[window[end - 1]] - target)
+        while end < len(window) and abs(prices[window[end]] - target) == last_gap:
+            end += 1
+        return Segment(array("I", window[:end]), end == cut)
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def get(self, gender: Any, category: Any, occasion: Any, max_price: Any) -> Optional[Segment]:
+        """The segment for these filters, or None when it was not precomputed"""
+        return self._segments.get(_key(gender, category, occasion, max_price))
@@ -0,0 +1,213 @@
+# backend/services/semantic_index.py
+"""
+Semantic product retrieval on CPU, with no model download.
+
+Products and queries are embedded as hashed feature vectors: whole words plus
+the character 3- and 4-grams of every word, each hashed into one of
+SEMANTIC_DIM signed buckets, then L2-normalized. Character n-grams make
+"breezy" close to "breeze" and "festival" close to "festive"; CONCEPTS adds a
+few catalog terms to query words that never appear in product data
+("beach" -> summer, linen, boho), standing in for what a learned model would
+know.
+
+Product vectors live in one contiguous float32 matrix (row N = catalog row
+N). `python -m services.semantic_index` precomputes it next to the catalog
+(products_fashion.emb.npy), and every worker memory-maps that one file, so
+the matrix is built once, offline, and shared through the page cache.
+Retrieval is a brute-force matrix product over the candidate rows, which is
+cheap at this dimension.
+
+Without NumPy, or without an up-to-date matrix (including catalogs loaded
+from MongoDB), `build_semantic_index` returns None and ranking stays purely
+lexical.
+"""
+
+import logging
+import os
+import re
+import sys
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is in requirements.txt
+    np = None
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+EMBEDDINGS_FILE = DATA_DIR / "products_fashion.emb.npy"
+
+SEMANTIC_DIM = int(os.getenv("SEMANTIC_DIM", 256))
+QUERY_CACHE_SIZE = 4096
+BATCH_ROWS = 65536  # product rows per matrix product
+
+WORD_WEIGHT = 1.0
+NGRAM_WEIGHT = 0.5
+
+# Query words that never occur in product data -> catalog terms they imply
+CONCEPTS = {
+    "beach": ("summer", "linen", "boho", "casual"),
+    "breezy": ("linen", "cotton", "summer", "relaxed"),
+    "airy": ("linen", "cotton", "summer", "relaxed"),
+    "wedding": ("festive", "ethnic", "partywear"),
+    "sangeet": ("festive", "ethnic", "partywear"),
+    "diwali": ("festive", "ethnic"),
+    "interview": ("formal", "office"),
+    "meeting": ("formal", "office"),
+    "work": ("office", "formal"),
+    "gym": ("athleisure", "sneakers"),
+    "workout": ("athleisure", "sneakers"),
+    "date": ("party", "feminine"),
+    "night": ("party", "partywear"),
+    "club": ("party", "partywear"),
+    "vacation": ("summer", "casual", "boho"),
+    "holiday": ("summer", "casual", "boho"),
+    "comfy": ("relaxed", "casual", "everyday"),
+    "comfortable": ("relaxed", "casual", "everyday"),
+    "classy": ("formal", "minimal"),
+    "traditional": ("ethnic", "festive"),
+}
+
+# Product fields that describe it, in the text that gets embedded
+TEXT_FIELDS = ("name", "category", "sub_category", "brand", "fit", "base_color", "material", "season")
+LIST_TEXT_FIELDS = ("occasion", "style_tags", "tags")
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+logger = logging.getLogger(__name__)
+
+
+def product_text(p: Dict[str, Any]) -> str:
+    parts = [str(p.get(f) or "") for f in TEXT_FIELDS]
+    for f in LIST_TEXT_FIELDS:
+        parts.extend(str(v) for v in p.get(f) or [])
+    if p.get("description"):
+        parts.append(str(p["description"]))
+    return " ".join(parts).replace("_", " ")
+
+
+def _features(text: str, expand: bool = False) -> Iterable[Tuple[str, float]]:
+    words = _WORD.findall(text.lower())
+    if expand:
+        words = words + [c for w in words for c in CONCEPTS.get(w, ())]
+    for word in words:
+        yield "w:" + word, WORD_WEIGHT
+        padded = f"<{word}>"
+        for n in (3, 4):
+            for i in range(len(padded) - n + 1):
+                yield padded[i:i + n], NGRAM_WEIGHT
+
+
+def embed(text: str, dim: int = SEMANTIC_DIM, expand: bool = False):
+    """Normalized hashed feature vector of `text` (float32, length `dim`)"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature, weight in _features(text, expand):
+        # crc32 rather than hash(): vectors are stored and must not depend
+        # on the process's hash seed
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dim] += weight if h & 0x80000000 else -weight
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    return vector
+
+
+def embed_catalog(records: Iterable[Dict[str, Any]], dim: int = SEMANTIC_DIM):
+    """float32 matrix with one normalized product vector per row"""
+    return np.array([embed(product_text(p), dim) for p in records], dtype=np.float32).reshape(-1, dim)
+
+
+class SemanticIndex:
+    """Cosine top-k over a fixed float32 product matrix"""
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.size, self.dim = matrix.shape
+        self.query_vector = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._query_vector)
+
+    def _query_vector(self, query: str):
+        vector = embed(query, self.dim, expand=True)
+        vector.setflags(write=False)
+        return vector
+
+    def similarities(self, query: str, rows: Optional[Sequence[int]] = None):
+        """Cosine similarity of `query` to each row (all rows when `rows` is None)"""
+        q = self.query_vector(" ".join(query.lower().split()))
+        if rows is None:
+            return np.concatenate([
+                self.matrix[start:start + BATCH_ROWS] @ q for start in range(0, self.size, BATCH_ROWS)
+            ]) if self.size else np.zeros(0, dtype=np.float32)
+        return self.matrix[np.asarray(rows, dtype=np.int64)] @ q
+
+    def top_k(self, query: str, k: int, rows: Optional[Sequence[int]] = None) -> List[Tuple[int, float]]:
+        """Best `k` (row, similarity) pairs, best first"""
+        sims = self.similarities(query, rows)
+        ids = np.arange(self.size) if rows is None else np.asarray(rows, dtype=np.int64)
+        return self._best(sims, ids, k)
+
+    def top_k_many(self, queries: Sequence[str], k: int) -> List[List[Tuple[int, float]]]:
+        """`top_k` for several queries with one matrix product per row batch"""
+        if not queries:
+            return []
+        q = np.stack([self.query_vector(" ".join(t.lower().split())) for t in queries])
+        sims = np.concatenate([
+            self.matrix[start:start + BATCH_ROWS] @ q.T for start in range(0, self.size, BATCH_ROWS)
+        ]) if self.size else np.zeros((0, len(queries)), dtype=np.float32)
+        ids = np.arange(self.size)
+        return [self._best(sims[:, i], ids, k) for i in range(len(queries))]
+
+    @staticmethod
+    def _best(sims, ids, k: int) -> List[Tuple[int, float]]:
+        if k <= 0 or not len(sims):
+            return []
+        if k < len(sims):
+            part = np.argpartition(-sims, k - 1)[:k]
+        else:
+            part = np.arange(len(sims))
+        # Highest similarity first, catalog order on ties
+        order = part[np.lexsort((ids[part], -sims[part]))]
+        return [(int(ids[i]), float(sims[i])) for i in order]
+
+
+def _embeddings_are_fresh(sources: Sequence[Path]) -> bool:
+    if not sources:
+        return False
+    try:
+        mtime = EMBEDDINGS_FILE.stat().st_mtime
+    except FileNotFoundError:
+        return False
+    return all(not src.exists() or src.stat().st_mtime <= mtime for src in sources)
+
+
+def build_semantic_index(size: int, sources: Sequence[Path] = ()) -> Optional[SemanticIndex]:
+    """
+    Semantic index for a catalog snapshot: the precomputed matrix, when it
+    is newer than every source file and has one row per product. Otherwise
+    None (the catalog is never embedded at load): run
+    `python -m services.semantic_index` after changing the catalog.
+    """
+    if np is None:
+        return None
+    if not _embeddings_are_fresh(sources):
+        if sources:
+            logger.warning("No up-to-date %s: semantic matching is off", EMBEDDINGS_FILE.name)
+        return None
+    matrix = np.load(EMBEDDINGS_FILE, mmap_mode="r")
+    if matrix.shape != (size, SEMANTIC_DIM):
+        logger.warning("Ignoring %s: shape %s does not match the catalog", EMBEDDINGS_FILE, matrix.shape)
+        return None
+    return SemanticIndex(matrix)
+
+
+if __name__ == "__main__":
+    from services.record_stream import iter_records
+
+    src = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA_DIR / "products_fashion.json"
+    dst = Path(sys.argv[2]) if len(sys.argv) > 2 else EMBEDDINGS_FILE
+    matrix = embed_catalog(iter_records(src))
+    tmp = dst.with_name(dst.name + ".tmp.npy")
+    np.save(tmp, matrix)
+    os.replace(tmp, dst)
+    print(f"Embedded {matrix.shape[0]} products into {dst} ({matrix.shape[1]} dims)")
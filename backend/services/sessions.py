@@ -17,6 +17,8 @@ class SessionContext:
     intent: Optional[str] = None
     filters: Optional[Dict[str, Any]] = None
     last_message: Optional[str] = None
+    # Previous recommendation turn's candidates (services.refinement)
+    candidates: Optional[Dict[str, Any]] = None
 
 
 # ----------------------------------
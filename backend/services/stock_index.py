@@ -0,0 +1,119 @@
+# backend/services/stock_index.py
+"""
+In-stock bitmaps next to the catalog index.
+
+For every store, for the "online" and "physical" channels and for anywhere
+at all, a bitmap over catalog rows marks the products with units available
+there. They have the same form as CatalogIndex's filter bitmaps, so
+retrieval ANDs them in with the other filters and out-of-stock products
+never reach ranking. SKUs without any inventory row are not stock-managed
+and count as in stock everywhere (as in services.stock_reservations).
+
+The bitmaps follow the inventory: `refresh()` re-derives the bits of the
+SKUs changed since the last refresh, from the inventory's change journal,
+and rebuilds them all when the inventory was reloaded or the journal no
+longer reaches back far enough. Each scope's bitmap carries a version that
+moves only when a bit of it flips, so results cached against one scope
+survive quantity changes that leave every product in or out of stock.
+"""
+
+import itertools
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from services.catalog_index import bits_from_rows
+from services.inventory_service import InventoryIndex, _quantity, inventory_index
+
+ANYWHERE = "*"
+
+_MASK_VERSIONS = itertools.count(1)
+
+
+def _scopes(items: Iterable) -> List[str]:
+    """Scopes in which an SKU with these inventory rows is in stock"""
+    scopes = set()
+    for item in items:
+        if _quantity(item) > 0:
+            scopes.update((ANYWHERE, item.store_id, "online" if item.store_type == "online" else "physical"))
+    return list(scopes)
+
+
+class StockIndex:
+    """Rows in stock per store / channel, for one catalog snapshot"""
+
+    def __init__(self, row_of: Callable[[str], Optional[int]], size: int):
+        self._row_of = row_of
+        self.size = size
+        self.all_mask = (1 << size) - 1
+        self.version: Optional[int] = None  # inventory version the bitmaps reflect
+        self._inventory: Optional[InventoryIndex] = None
+        self._masks: Dict[str, int] = {}
+        self._tracked = 0  # rows of SKUs with inventory rows
+        # Bumped when the scope's bitmap / the tracked rows change
+        self._mask_versions: Dict[str, int] = {}
+        self._tracked_version = 0
+        self._lock = threading.Lock()
+
+    def refresh(self) -> "StockIndex":
+        inventory = inventory_index()
+        if inventory is self._inventory and inventory.version == self.version:
+            return self
+        with self._lock:
+            version = inventory.version
+            changed = inventory.changes_since(self.version) if inventory is self._inventory else None
+            if changed is None:
+                self._rebuild(inventory)
+            else:
+                for sku in changed:
+                    self._update(inventory, sku)
+            self._inventory, self.version = inventory, version
+        return self
+
+    def _rebuild(self, inventory: InventoryIndex):
+        rows_by_scope: Dict[str, List[int]] = {}
+        tracked = []
+        for sku, items in list(inventory.by_sku.items()):
+            row = self._row_of(sku)
+            if row is None:
+                continue
+            tracked.append(row)
+            for scope in _scopes(items):
+                rows_by_scope.setdefault(scope, []).append(row)
+        masks = {scope: bits_from_rows(rows, self.size) for scope, rows in rows_by_scope.items()}
+        for scope in masks.keys() | self._masks.keys():
+            if masks.get(scope, 0) != self._masks.get(scope, 0):
+                self._mask_versions[scope] = next(_MASK_VERSIONS)
+        self._masks = masks
+        self._set_tracked(bits_from_rows(tracked, self.size))
+
+    def _set_tracked(self, tracked: int):
+        if tracked != self._tracked:
+            self._tracked = tracked
+            self._tracked_version = next(_MASK_VERSIONS)
+
+    def _update(self, inventory: InventoryIndex, sku: str):
+        row = self._row_of(sku)
+        if row is None:
+            return
+        bit = 1 << row
+        self._set_tracked(self._tracked | bit)
+        in_stock = set(_scopes(inventory.by_sku.get(sku, ())))
+        for scope in in_stock.union(self._masks):
+            mask = self._masks.get(scope, 0)
+            updated = mask | bit if scope in in_stock else mask & ~bit
+            if updated != mask:
+                self._masks[scope] = updated
+                self._mask_versions[scope] = next(_MASK_VERSIONS)
+
+    def mask(self, scope: Optional[str] = None) -> int:
+        """
+        Rows in stock in `scope`: a store_id, "online", "physical", or
+        anywhere (None)
+        """
+        self.refresh()
+        return self._masks.get(scope or ANYWHERE, 0) | (self.all_mask & ~self._tracked)
+
+    def mask_version(self, scope: Optional[str] = None) -> tuple:
+        """Changes whenever `mask(scope)` does: part of a cache key for results built from it"""
+        self.refresh()
+        return self._tracked_version, self._mask_versions.get(scope or ANYWHERE, 0)
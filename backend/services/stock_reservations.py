@@ -0,0 +1,463 @@
+# backend/services/stock_reservations.py
+"""
+Stock reservations shared by every worker, kept in Redis.
+
+Every (sku, store) has two counters: the units on hand and the units held by
+live reservations; what is left to reserve is on hand minus reserved.
+On-hand counters are seeded from the inventory rows with SETNX so that a
+restarting worker never overwrites what other workers already sold.
+Checkout reserves its lines with one server-side Lua script, which checks
+every counter and reserves them all or none, so concurrent checkouts cannot
+oversell and need no lock in Python. A reservation is a hash (on-hand key ->
+quantity) plus its deadline in the expiry sorted set:
+
+- commit (payment succeeded): the units leave both on hand and reserved
+- release (payment failed, cart abandoned): the units leave reserved
+- expiry: reservations past their deadline are released by the sweep that
+  runs before every reserve, so abandoned checkouts give stock back
+
+Ingested inventory deltas (restocks, store sales) move only the on-hand
+counters, through `adjust_stock`, so a store selling units that are held
+online can never be undone by the hold being released.
+
+Reservation state lives only in Redis. Every script that holds, releases or
+sells units also appends the change to the HOLDS_STREAM stream, in the same
+atomic step; `sync_holds` (run by a background thread in every server
+process, see `start_hold_sync`) reads it through one consumer group and logs
+each entry as inventory deltas (services.inventory_log), which is how every
+worker's stock levels and in-stock bitmaps follow checkouts. An entry is
+acknowledged only once logged, so a failed write is retried, and no request
+waits on the inventory log.
+
+Scripts receive every key they touch in KEYS, and all keys share the
+`{stock}` hash tag, so they also run on Redis Cluster (in one slot).
+
+SKUs without a counter (no inventory row) are not stock-managed and are
+accepted without being reserved.
+"""
+
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from redis.exceptions import RedisError, ResponseError
+
+from db.redis_client import redis_client
+from services.inventory_service import _on_hand, ingest_deltas, inventory_index, list_inventory
+
+RESERVATION_TTL = int(os.getenv("RESERVATION_TTL", 15 * 60))  # 15 minutes
+# Store that online checkouts reserve from
+DEFAULT_STORE = os.getenv("RESERVATION_DEFAULT_STORE", "ONLINE")
+SWEEP_LIMIT = 100  # expired reservations released per sweep
+
+HOLD_SYNC_BATCH = 100  # stream entries logged per inventory write
+HOLD_SYNC_BLOCK_MS = 1000  # how long the sync thread waits for new entries
+HOLD_CLAIM_IDLE_MS = 30_000  # entries a dead consumer left pending are taken over after this
+
+KEY_TAG = "{stock}"
+EXPIRY_KEY = f"{KEY_TAG}:reservations:expiry"
+HOLDS_STREAM = f"{KEY_TAG}:holds"
+HOLDS_GROUP = "inventory"
+# Shared by every worker: signs the tokens that prove who holds a reservation
+SECRET_KEY = f"{KEY_TAG}:secret"
+STOCK_PREFIX = f"{KEY_TAG}:on_hand:"
+RESERVED_PREFIX = f"{KEY_TAG}:reserved:"
+
+logger = logging.getLogger(__name__)
+
+# Appends a change of held (and sold) units to the holds stream:
+# `changed` is a flat list of on-hand key, quantity
+_PUBLISH = """
+local function publish(stream, reserved, sold, changed)
+    if #changed > 0 then
+        redis.call('XADD', stream, '*', 'reserved', reserved, 'sold', sold, (table.unpack or unpack)(changed))
+    end
+end
+"""
+
+# KEYS: reservation hash, expiry zset, holds stream, then per line its
+# on-hand and reserved counters
+# ARGV: reservation id, deadline, quantity per line...
+# -> {1, reserved on-hand counters...} or {0, index of the first short line, units left}
+_RESERVE = _PUBLISH + """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return {-1}
+end
+local reserved = {}
+for line = 1, #ARGV - 2 do
+    local on_hand = redis.call('GET', KEYS[2 + 2 * line])
+    if on_hand then
+        local left = tonumber(on_hand) - tonumber(redis.call('GET', KEYS[3 + 2 * line]) or 0)
+        if left < tonumber(ARGV[2 + line]) then
+            return {0, line, math.max(left, 0)}
+        end
+        table.insert(reserved, line)
+    end
+end
+if #reserved == 0 then
+    return {1}
+end
+local changed, out = {}, {1}
+for _, line in ipairs(reserved) do
+    local on_hand_key, quantity = KEYS[2 + 2 * line], ARGV[2 + line]
+    redis.call('INCRBY', KEYS[3 + 2 * line], quantity)
+    redis.call('HSET', KEYS[1], on_hand_key, quantity)
+    table.insert(changed, on_hand_key)
+    table.insert(changed, quantity)
+    table.insert(out, on_hand_key)
+end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+publish(KEYS[3], 1, 0, changed)
+return out
+"""
+
+# Gives back the units of a reservation (taking them off hand when sold).
+# KEYS: reservation hash, expiry zset, holds stream, then per line its
+# on-hand and reserved counters (a reservation's lines never change)
+# ARGV: reservation id, 1 to commit / 0 to release, and optionally a time:
+# only a reservation due by then is released (the expiry sweep)
+# -> 1, or 0 if unknown (or no longer due)
+_FINISH = _PUBLISH + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+if ARGV[3] then
+    local deadline = redis.call('ZSCORE', KEYS[2], ARGV[1])
+    if deadline and tonumber(deadline) > tonumber(ARGV[3]) then
+        return 0
+    end
+end
+local sold = ARGV[2] == '1'
+local changed = {}
+for i = 4, #KEYS, 2 do
+    local quantity = redis.call('HGET', KEYS[1], KEYS[i])
+    if quantity then
+        local reserved = tonumber(redis.call('GET', KEYS[i + 1]) or 0) - tonumber(quantity)
+        redis.call('SET', KEYS[i + 1], math.max(reserved, 0))
+        if sold then
+            local on_hand = tonumber(redis.call('GET', KEYS[i]) or 0) - tonumber(quantity)
+            redis.call('SET', KEYS[i], math.max(on_hand, 0))
+        end
+        table.insert(changed, KEYS[i])
+        table.insert(changed, quantity)
+    end
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+publish(KEYS[3], -1, sold and 1 or 0, changed)
+return 1
+"""
+
+# KEYS: reservation hash, expiry zset; ARGV: reservation id, new deadline
+# -> 1, or 0 if unknown (expired and swept, committed or released)
+_EXTEND = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+return 1
+"""
+
+# KEYS: on-hand counters; ARGV: change and seed per counter (on hand never
+# goes below 0, as in the inventory rows). A missing counter is created with
+# its seed, the row's quantity once the batch is applied, and takes no
+# further changes from the batch
+_ADJUST = """
+local seeded = {}
+for i = 1, #KEYS do
+    local on_hand = redis.call('GET', KEYS[i])
+    if seeded[KEYS[i]] then
+    elseif on_hand then
+        redis.call('SET', KEYS[i], math.max(tonumber(on_hand) + tonumber(ARGV[2 * i - 1]), 0))
+    elseif ARGV[2 * i] ~= '' then
+        redis.call('SET', KEYS[i], ARGV[2 * i])
+        seeded[KEYS[i]] = true
+    end
+end
+return #KEYS
+"""
+
+_reserve_script = redis_client.register_script(_RESERVE)
+_finish_script = redis_client.register_script(_FINISH)
+_extend_script = redis_client.register_script(_EXTEND)
+_adjust_script = redis_client.register_script(_ADJUST)
+
+_seeded = False
+_group_ready = False
+_sync_thread: Optional[threading.Thread] = None
+_CONSUMER = f"{socket.gethostname()}-{os.getpid()}"
+_secret: Optional[bytes] = None
+
+
+def _stock_key(sku: str, store_id: str) -> str:
+    return f"{STOCK_PREFIX}{sku}:{store_id}"
+
+
+def _reserved_key(sku: str, store_id: str) -> str:
+    return f"{RESERVED_PREFIX}{sku}:{store_id}"
+
+
+def _reserved_of(stock_key: str) -> str:
+    return RESERVED_PREFIX + stock_key[len(STOCK_PREFIX):]
+
+
+def _reservation_key(reservation_id: str) -> str:
+    return f"{KEY_TAG}:reservation:{reservation_id}"
+
+
+def _counter_keys(stock_keys: Iterable[str]) -> List[str]:
+    """On-hand and reserved counter of each line, as the scripts take them"""
+    return [key for stock_key in stock_keys for key in (stock_key, _reserved_of(stock_key))]
+
+
+def seed_stock(overwrite: bool = False) -> int:
+    """
+    Create the stock counters from the inventory rows; existing counters
+    are kept unless `overwrite` (a stock take). Returns counters written.
+    """
+    global _seeded
+    pipe = redis_client.pipeline(transaction=False)
+    for item in list_inventory():
+        key = _stock_key(item.sku, item.store_id)
+        if overwrite:
+            pipe.set(key, _on_hand(item))
+        else:
+            pipe.setnx(key, _on_hand(item))
+    written = sum(1 for ok in pipe.execute() if ok)
+    _seeded = True
+    return written
+
+
+def _ensure_seeded():
+    if not _seeded:
+        seed_stock()
+
+
+def available(sku: str, store_id: str = DEFAULT_STORE) -> Optional[int]:
+    """Units left to reserve, or None when the SKU is not stock-managed there"""
+    _ensure_seeded()
+    on_hand, reserved = redis_client.mget(_stock_key(sku, store_id), _reserved_key(sku, store_id))
+    if on_hand is None:
+        return None
+    return max(int(on_hand) - int(reserved or 0), 0)
+
+
+def adjust_stock(deltas: Iterable[Dict[str, Any]]):
+    """
+    Apply ingested inventory deltas ({"sku", "store_id", "quantity_change"})
+    to the on-hand counters, atomically. Call after ingest_deltas: counters
+    for rows the batch created are seeded from them.
+    """
+    deltas = list(deltas)
+    if deltas:
+        rows = inventory_index().by_sku_store
+        args = []
+        for d in deltas:
+            row = rows.get((d["sku"], d["store_id"]))
+            args += [d["quantity_change"], _on_hand(row) if row is not None else ""]
+        _adjust_script(keys=[_stock_key(d["sku"], d["store_id"]) for d in deltas], args=args)
+
+
+def _finish(reservation_id: str, sold: bool, due: Optional[float] = None) -> bool:
+    key = _reservation_key(reservation_id)
+    lines = redis_client.hkeys(key)
+    if not lines:
+        return False
+    args = [reservation_id, int(sold)] + ([due] if due is not None else [])
+    return bool(_finish_script(keys=[key, EXPIRY_KEY, HOLDS_STREAM, *_counter_keys(lines)], args=args))
+
+
+def release_expired(now: Optional[float] = None, limit: int = SWEEP_LIMIT) -> int:
+    """Give back the stock of reservations past their deadline; returns how many"""
+    now = now if now is not None else time.time()
+    expired = redis_client.zrangebyscore(EXPIRY_KEY, "-inf", now, start=0, num=limit)
+    released = 0
+    for reservation_id in expired:
+        # Skipped when committed, released or extended meanwhile
+        if _finish(reservation_id, sold=False, due=now):
+            released += 1
+    return released
+
+
+def reserve(
+    items: Iterable[Dict[str, Any]],
+    ttl: int = RESERVATION_TTL,
+    reservation_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Atomically reserve `items` ([{"sku", "quantity", "store_id"?}], store
+    defaulting to DEFAULT_STORE) for `ttl` seconds: all lines or none.
+    """
+    _ensure_seeded()
+    release_expired()
+
+    quantities: Dict[str, int] = {}
+    lines: Dict[str, Dict[str, Any]] = {}
+    for item in items:
+        sku = item.get("sku")
+        if not sku:
+            continue
+        try:
+            quantity = int(item.get("quantity") or 1)
+        except (TypeError, ValueError):
+            return {"error": f"Invalid quantity for {sku}"}
+        if quantity <= 0:
+            continue
+        store_id = item.get("store_id") or DEFAULT_STORE
+        key = _stock_key(sku, store_id)
+        quantities[key] = quantities.get(key, 0) + quantity
+        lines[key] = {"sku": sku, "store_id": store_id}
+
+    reservation_id = reservation_id or f"RSV-{uuid.uuid4().hex[:12].upper()}"
+    deadline = time.time() + ttl
+    counters = list(quantities)
+    result = _reserve_script(
+        keys=[_reservation_key(reservation_id), EXPIRY_KEY, HOLDS_STREAM, *_counter_keys(counters)],
+        args=[reservation_id, deadline, *(quantities[key] for key in counters)],
+    )
+    if result[0] == -1:
+        return {"error": "Reservation already exists", "reservation_id": reservation_id}
+    if result[0] == 0:
+        short = counters[int(result[1]) - 1]
+        return {
+            "error": "Insufficient stock",
+            **lines[short],
+            "requested": quantities[short],
+            "available": int(result[2]),
+        }
+
+    reserved = set(result[1:])
+    return {
+        # None when no line is stock-managed: there is nothing to commit
+        "reservation_id": reservation_id if reserved else None,
+        "expires_at": deadline,
+        "items": [
+            {**lines[key], "quantity": quantities[key], "reserved": key in reserved}
+            for key in counters
+        ],
+    }
+
+
+def _signing_key() -> bytes:
+    global _secret
+    if _secret is None:
+        redis_client.set(SECRET_KEY, secrets.token_hex(32), nx=True)
+        _secret = redis_client.get(SECRET_KEY).encode()
+    return _secret
+
+
+def reservation_token(reservation_id: str) -> str:
+    """Token handed to whoever made a reservation, needed to commit or release it over the API"""
+    return hmac.new(_signing_key(), reservation_id.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def holds_reservation(reservation_id: str, token: Optional[str]) -> bool:
+    return bool(token) and hmac.compare_digest(token, reservation_token(reservation_id))
+
+
+def extend(reservation_id: str, ttl: int = RESERVATION_TTL) -> Dict[str, Any]:
+    """Push a live reservation's deadline to `ttl` seconds from now"""
+    deadline = time.time() + ttl
+    keys = [_reservation_key(reservation_id), EXPIRY_KEY]
+    if not _extend_script(keys=keys, args=[reservation_id, deadline]):
+        return {"error": "Reservation not found or expired", "reservation_id": reservation_id}
+    return {"status": "held", "reservation_id": reservation_id, "expires_at": deadline}
+
+
+def commit(reservation_id: str) -> Dict[str, Any]:
+    """Make a reservation's units sold (after payment)"""
+    if not _finish(reservation_id, sold=True):
+        return {"error": "Reservation not found or expired", "reservation_id": reservation_id}
+    return {"status": "committed", "reservation_id": reservation_id}
+
+
+def release(reservation_id: str) -> Dict[str, Any]:
+    """Return a reservation's units to stock"""
+    if not _finish(reservation_id, sold=False):
+        return {"error": "Reservation not found or expired", "reservation_id": reservation_id}
+    return {"status": "released", "reservation_id": reservation_id}
+
+
+def _hold_deltas(fields: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Inventory deltas of one holds stream entry"""
+    reserved, sold = int(fields.pop("reserved")), fields.pop("sold") == "1"
+    deltas = []
+    for key, quantity in fields.items():
+        sku, store_id = key[len(STOCK_PREFIX):].rsplit(":", 1)
+        deltas.append({
+            "sku": sku,
+            "store_id": store_id,
+            "quantity_change": -int(quantity) if sold else 0,
+            "reserved_change": reserved * int(quantity),
+        })
+    return deltas
+
+
+def _ensure_group():
+    global _group_ready
+    if not _group_ready:
+        try:
+            redis_client.xgroup_create(HOLDS_STREAM, HOLDS_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        _group_ready = True
+
+
+def sync_holds(block_ms: Optional[int] = None) -> int:
+    """
+    Log pending holds stream entries as inventory deltas: this consumer's
+    unacknowledged ones first, then ones a dead consumer left idle, then new
+    ones (waiting up to `block_ms` for them). Returns entries logged.
+    """
+    _ensure_group()
+    entries = redis_client.xreadgroup(HOLDS_GROUP, _CONSUMER, {HOLDS_STREAM: "0"}, count=HOLD_SYNC_BATCH)
+    batch = entries[0][1] if entries else []
+    if not batch:
+        batch = redis_client.xautoclaim(
+            HOLDS_STREAM, HOLDS_GROUP, _CONSUMER, HOLD_CLAIM_IDLE_MS, count=HOLD_SYNC_BATCH
+        )[1]
+    if not batch:
+        entries = redis_client.xreadgroup(
+            HOLDS_GROUP, _CONSUMER, {HOLDS_STREAM: ">"}, count=HOLD_SYNC_BATCH, block=block_ms
+        )
+        batch = entries[0][1] if entries else []
+    if not batch:
+        return 0
+    deltas = [delta for _, fields in batch for delta in _hold_deltas(dict(fields))]
+    result = ingest_deltas(deltas)
+    if "error" in result:
+        # Not retryable (e.g. a row whose store is gone): logged and dropped
+        logger.warning("Dropping reservation deltas: %s", result)
+    ids = [entry_id for entry_id, _ in batch]
+    redis_client.xack(HOLDS_STREAM, HOLDS_GROUP, *ids)
+    redis_client.xdel(HOLDS_STREAM, *ids)
+    return len(batch)
+
+
+def _sync_loop():
+    backoff = 1.0
+    while True:
+        try:
+            sync_holds(HOLD_SYNC_BLOCK_MS)
+            backoff = 1.0
+        except (RedisError, OSError) as e:
+            # Entries stay pending and are retried
+            logger.warning("Reservation sync failed, retrying in %.0fs: %s", backoff, e)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+
+def start_hold_sync():
+    """Start this process's background thread logging holds (once)"""
+    global _sync_thread
+    if _sync_thread is None:
+        _sync_thread = threading.Thread(target=_sync_loop, name="reservation-sync", daemon=True)
+        _sync_thread.start()
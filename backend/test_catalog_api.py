@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the catalog routes (runs without the server, on
+fakeredis): python test_catalog_api.py, or pytest.
+"""
+
+import os
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("USE_FAKE_REDIS", "true")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers.catalog import catalog_router
+
+SKU = "SNEAKERS_CHUNKY_WHT_01"
+
+
+def test_missing_product_is_not_found_whatever_the_client_cached():
+    app = FastAPI()
+    app.include_router(catalog_router)
+    client = TestClient(app)
+    assert client.get("/products/NOPE", headers={"If-None-Match": "*"}).status_code == 404
+    response = client.get(f"/products/{SKU}")
+    assert response.status_code == 200 and response.json()["sku"] == SKU
+    etag = response.headers["ETag"]
+    assert client.get(f"/products/{SKU}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/products/{SKU}", headers={"If-None-Match": "*"}).status_code == 304
+
+
+if __name__ == "__main__":
+    test_missing_product_is_not_found_whatever_the_client_cached()
+    print("✅ All catalog API tests passed")
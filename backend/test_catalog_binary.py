@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the compiled catalog (services/catalog_binary.py): a
+store loaded from it must serve what the JSON store serves. Runs without
+the server, on fakeredis: python test_catalog_binary.py, or pytest.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("USE_FAKE_REDIS", "true")
+
+from services import product_store
+from services.catalog_binary import BinaryCatalog, compile_catalog
+from services.catalog_service import faceted_search
+from services.customer_profiles import known_customers
+from services.product_store import PRODUCTS_FILE, ProductStore
+from services.record_stream import iter_records
+from services.recommendation import rank_products, resolve_params
+
+SEARCHES = [
+    ({}, None, None, None),
+    ({"category": ["Footwear"]}, None, None, "price"),
+    ({"base_color": ["white", "black"], "size": ["M"]}, None, 3000, None),
+    ({}, "floral dress", None, "bestseller"),
+    ({"occasion": ["Festive", "Party"]}, "kurta", 5000, "-price"),
+]
+QUERIES = [({}, ""), ({"max_price": 3000}, "white sneakers"), ({"category": "Apparel"}, "floral dress")]
+
+
+@contextmanager
+def compiled_catalog():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "products.bin"
+        compile_catalog(iter_records(PRODUCTS_FILE), path)
+        yield path
+
+
+def test_compiled_store_serves_what_the_json_store_does():
+    with compiled_catalog() as path:
+        from_json = ProductStore(iter_records(PRODUCTS_FILE))
+        compiled = ProductStore(BinaryCatalog(path))
+        assert compiled.size == from_json.size
+        assert compiled.fingerprint == from_json.fingerprint
+        for row, product in enumerate(from_json.products):
+            assert compiled.products[row] == product
+            assert compiled.row_of(product["sku"]) == row
+            assert compiled.get_model(product["sku"]) == from_json.get_model(product["sku"])
+        assert compiled.row_of("NOPE") is None and compiled.row_of("") is None
+
+        for filters, q, max_price, sort in SEARCHES:
+            args = (filters, q, max_price, sort, 0, 50, None)
+            assert faceted_search(*args, store=compiled) == faceted_search(*args, store=from_json), filters
+
+        for customer_id in [None] + list(known_customers()):
+            for params, message in QUERIES:
+                resolved = resolve_params(customer_id, params, message)
+                assert rank_products(compiled, resolved) == rank_products(from_json, resolved), (customer_id, message)
+
+
+def test_stale_or_missing_binary_falls_back_to_json():
+    saved = product_store.PRODUCTS_BINARY
+    with compiled_catalog() as path:
+        product_store.PRODUCTS_BINARY = path
+        try:
+            assert isinstance(product_store._read_records("file"), BinaryCatalog)
+            # Compiled before the JSON last changed
+            stale = PRODUCTS_FILE.stat().st_mtime - 60
+            os.utime(path, (stale, stale))
+            assert not isinstance(product_store._read_records("file"), BinaryCatalog)
+            now = time.time()
+            os.utime(path, (now, now))
+            assert isinstance(product_store._read_records("file"), BinaryCatalog)
+            path.unlink()
+            records = product_store._read_records("file")
+            assert not isinstance(records, BinaryCatalog)
+            assert ProductStore(records).size == len(list(iter_records(PRODUCTS_FILE)))
+        finally:
+            product_store.PRODUCTS_BINARY = saved
+
+
+def test_other_files_are_rejected():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "products.bin"
+        path.write_bytes(b"[]" * 64)
+        try:
+            BinaryCatalog(path)
+            assert False, "not a compiled catalog"
+        except ValueError:
+            pass
+
+
+if __name__ == "__main__":
+    test_compiled_store_serves_what_the_json_store_does()
+    test_stale_or_missing_binary_falls_back_to_json()
+    test_other_files_are_rejected()
+    print("✅ All compiled catalog tests passed")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the inventory snapshot plus change log (runs without
+the server): python test_inventory_log.py, or pytest. Each test works on a
+scratch copy of the inventory data.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("USE_FAKE_REDIS", "true")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import catalog
+from routers.inventory import inventory_router
+from services import inventory_log, inventory_service
+from services.inventory_log import BASE_SNAPSHOT, DeltaLog, parse_delta
+from services.inventory_service import compact_inventory, ingest_deltas, sync_inventory
+
+SKU = "SNEAKERS_CHUNKY_WHT_01"  # 80 online, 6 in Bengaluru, 3 in Delhi
+
+
+@contextmanager
+def scratch_inventory():
+    saved = inventory_service._LOG, inventory_service._INDEX
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(inventory_service.DATA_DIR / BASE_SNAPSHOT, tmp)
+        inventory_service._LOG = DeltaLog(Path(tmp))
+        inventory_service._INDEX = inventory_service._load_index()
+        try:
+            yield inventory_service._LOG
+        finally:
+            inventory_service._LOG, inventory_service._INDEX = saved
+
+
+def quantities(index):
+    return {key: (item.quantity_available, item.quantity_reserved) for key, item in index.by_sku_store.items()}
+
+
+def test_parse_delta_rejects_malformed_fields():
+    for raw in (
+        {"store_id": "ONLINE", "quantity_change": 1},
+        {"sku": SKU, "quantity_change": 1},
+        {"sku": SKU, "store_id": "ONLINE", "quantity_change": "1"},
+        {"sku": SKU, "store_id": "ONLINE", "quantity_change": True},
+        {"sku": SKU, "store_id": "ONLINE", "quantity_change": 0, "reserved_change": 1.5},
+    ):
+        try:
+            parse_delta(raw)
+            assert False, raw
+        except ValueError:
+            pass
+    delta = parse_delta({"sku": SKU, "store_id": "ONLINE", "quantity_change": -1, "reserved_change": 0})
+    assert "reserved_change" not in delta and delta["last_updated"]
+
+
+def test_read_resumes_at_the_offset_and_skips_partial_lines():
+    with tempfile.TemporaryDirectory() as tmp:
+        log = DeltaLog(Path(tmp))
+        assert log.read(0) == ([], 0)
+        log.append(0, [{"sku": "A", "quantity_change": 1}, {"sku": "B", "quantity_change": 2}])
+        deltas, offset = log.read(0)
+        assert [d["sku"] for d in deltas] == ["A", "B"]
+        # A line still being written is left for the next read
+        with open(log.log_path(0), "a", encoding="utf-8") as f:
+            f.write('{"sku": "C", "quan')
+        assert log.read(0, offset) == ([], offset)
+        with open(log.log_path(0), "a", encoding="utf-8") as f:
+            f.write('tity_change": 3}\n')
+        deltas, end = log.read(0, offset)
+        assert [d["sku"] for d in deltas] == ["C"] and end > offset
+
+
+def test_restart_replays_the_log_tail():
+    with scratch_inventory():
+        assert "error" not in ingest_deltas([
+            {"sku": SKU, "store_id": "ONLINE", "quantity_change": -5},
+            {"sku": SKU, "store_id": "STORE_BLR_ORION", "quantity_change": 0, "reserved_change": 2},
+        ])
+        live = sync_inventory()
+        assert live.by_sku_store[(SKU, "ONLINE")].quantity_available == 75
+        restarted = inventory_service._load_index()
+        assert quantities(restarted) == quantities(live)
+        assert restarted.logged == 2
+
+
+def test_compaction_writes_a_new_generation():
+    with scratch_inventory() as log:
+        ingest_deltas([{"sku": SKU, "store_id": "ONLINE", "quantity_change": -5}])
+        before = quantities(sync_inventory())
+        assert compact_inventory() == 1
+        assert log.generation() == 1
+        assert not log.log_path(0).exists() and log.snapshot_path(1).exists()
+        ingest_deltas([{"sku": SKU, "store_id": "ONLINE", "quantity_change": -1}])
+        restarted = inventory_service._load_index()
+        assert restarted.generation == 1 and restarted.logged == 1
+        assert restarted.by_sku_store[(SKU, "ONLINE")].quantity_available == before[(SKU, "ONLINE")][0] - 1
+
+
+def test_reader_follows_another_process_compaction():
+    with scratch_inventory() as log:
+        index = sync_inventory()
+        # Another process compacts, then logs on top of its snapshot
+        rows = [item.model_dump() for item in index.items]
+        for row in rows:
+            if (row["sku"], row["store_id"]) == (SKU, "ONLINE"):
+                row["quantity_available"] = 10
+        log.write_snapshot(1, rows)
+        log.append(1, [parse_delta({"sku": SKU, "store_id": "ONLINE", "quantity_change": -3})])
+        reloaded = sync_inventory()
+        assert reloaded is not index and reloaded.generation == 1
+        assert reloaded.by_sku_store[(SKU, "ONLINE")].quantity_available == 7
+
+
+def test_lock_is_exclusive_and_released():
+    with tempfile.TemporaryDirectory() as tmp:
+        log = DeltaLog(Path(tmp))
+        held, done = threading.Event(), threading.Event()
+
+        def holder():
+            with log.locked():
+                held.set()
+                done.wait(5)
+
+        thread = threading.Thread(target=holder)
+        thread.start()
+        held.wait(5)
+        timeout, inventory_log.LOCK_TIMEOUT = inventory_log.LOCK_TIMEOUT, 0.05
+        try:
+            with log.locked():
+                assert False, "the lock is held"
+        except TimeoutError:
+            pass
+        finally:
+            inventory_log.LOCK_TIMEOUT = timeout
+            done.set()
+            thread.join()
+        with log.locked():
+            pass
+
+
+def test_delta_routes_need_the_admin_token():
+    app = FastAPI()
+    app.include_router(inventory_router)
+    client = TestClient(app)
+    body = {"deltas": [{"sku": SKU, "store_id": "ONLINE", "quantity_change": -1}]}
+    saved, catalog.ADMIN_TOKEN = catalog.ADMIN_TOKEN, None
+    try:
+        assert client.post("/deltas", json=body).status_code == 403
+        catalog.ADMIN_TOKEN = "secret"
+        assert client.post("/deltas", json=body).status_code == 401
+        assert client.post("/deltas/compact", headers={"X-Admin-Token": "guess"}).status_code == 401
+    finally:
+        catalog.ADMIN_TOKEN = saved
+
+
+if __name__ == "__main__":
+    test_parse_delta_rejects_malformed_fields()
+    test_read_resumes_at_the_offset_and_skips_partial_lines()
+    test_restart_replays_the_log_tail()
+    test_compaction_writes_a_new_generation()
+    test_reader_follows_another_process_compaction()
+    test_lock_is_exclusive_and_released()
+    test_delta_routes_need_the_admin_token()
+    print("✅ All inventory log tests passed")
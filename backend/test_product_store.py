@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the shared product store (runs without the server, on
+fakeredis): python test_product_store.py, or pytest.
+"""
+
+import os
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("USE_FAKE_REDIS", "true")
+
+import redis
+
+from services import product_store
+from services.product_store import get_store
+
+
+class _RedisDown:
+    def pipeline(self, *args, **kwargs):
+        raise redis.ConnectionError("Connection refused")
+
+
+def test_requests_never_wait_on_redis():
+    saved, product_store.redis_client = product_store.redis_client, _RedisDown()
+    try:
+        # The version check belongs to the background thread only
+        store = get_store()
+        assert get_store() is store
+        assert product_store._sync() is False
+    finally:
+        product_store.redis_client = saved
+    assert product_store._sync() is True
+
+
+if __name__ == "__main__":
+    test_requests_never_wait_on_redis()
+    print("✅ All product store tests passed")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the recommendation ranking (runs without the server):
+python test_recommendation.py, or pytest.
+"""
+
+import os
+import random
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("USE_FAKE_REDIS", "true")
+
+from services.catalog_index import CatalogIndex
+from services.product_store import ProductStore
+from services.recommendation import rank_products, recommend_products, resolve_params
+from services.semantic_index import SemanticIndex, embed_catalog
+
+
+def synthetic_catalog(size, tags=40, occasions=12, brands=60, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            "sku": f"SKU_{i}",
+            "name": f"product {i}",
+            "category": "Apparel",
+            "sub_category": "Tops",
+            "price": rng.randrange(300, 9000, 50),
+            "style_tags": rng.sample([f"tag{t}" for t in range(tags)], rng.randint(1, 3)),
+            "occasion": rng.sample([f"occ{o}" for o in range(occasions)], rng.randint(1, 2)),
+            "brand": rng.choice([f"brand{b}" for b in range(brands)]),
+        }
+        for i in range(size)
+    ]
+
+
+def scan_related(products, top_rows, limit=3, allowed=None):
+    """Cross-sell by scanning the whole catalog (what the index must match)"""
+    tags, occasions, brands = set(), set(), set()
+    for row in top_rows:
+        tags.update(products[row]["style_tags"])
+        occasions.update(products[row]["occasion"])
+        brands.add(products[row]["brand"].lower())
+    avg_price = sum(products[row]["price"] for row in top_rows) / len(top_rows)
+    scored = []
+    for row, p in enumerate(products):
+        if row in top_rows or (allowed is not None and not allowed >> row & 1):
+            continue
+        score = len(tags & set(p["style_tags"])) + len(occasions & set(p["occasion"])) + (p["brand"].lower() in brands)
+        if score > 0:
+            scored.append((-score, abs(p["price"] - avg_price), row))
+    return [row for _, _, row in sorted(scored)[:limit]]
+
+
+def test_query_without_budget():
+    """An explicit "no budget" with a query ranks by relevance alone"""
+    recs = recommend_products("UNKNOWN", {"max_price": None}, "white sneakers")
+    top = [r for r in recs if not r["related"]]
+    assert top, recs
+    assert "sneaker" in top[0]["sub_category"].lower() or "sneaker" in top[0]["name"].lower()
+
+
+
+def test_cross_sell_matches_full_scan():
+    products = synthetic_catalog(3000)
+    index = CatalogIndex(products)
+    rng = random.Random(1)
+    for _ in range(200):
+        top_rows = rng.sample(range(len(products)), 5)
+        assert index.related_rows(top_rows, 3) == scan_related(products, top_rows)
+
+
+def test_in_stock_cross_sell_from_one_large_group():
+    # Every product shares one signature, and only ~3% are in stock
+    products = synthetic_catalog(3000)
+    for p in products:
+        p.update(style_tags=["tag0"], occasion=["occ0"], brand="brand0")
+    index = CatalogIndex(products)
+    rng = random.Random(2)
+    for _ in range(50):
+        allowed = sum(1 << row for row in range(len(products)) if rng.random() < 0.03)
+        top_rows = rng.sample(range(len(products)), 5)
+        related = index.related_rows(top_rows, 3, allowed=allowed)
+        assert len(related) == 3
+        assert related == scan_related(products, top_rows, allowed=allowed)
+
+
+
+def test_keyword_matches_outrank_semantic_ones():
+    products = [
+        {"sku": f"BAG_{i}", "name": "Leather Tote", "category": "Accessories", "sub_category": "Bags",
+         "base_color": "White", "price": 1900 + i, "gender": "Women"}
+        for i in range(10)
+    ] + [
+        {"sku": f"SNK_{i}", "name": "Chunky Sneakers", "category": "Footwear", "sub_category": "Sneakers",
+         "base_color": "Grey", "price": 1000 + i, "gender": "Women"}
+        for i in range(5)
+    ]
+    store = ProductStore(products, source="mongo")
+    store.semantic = SemanticIndex(embed_catalog(products))
+    params = {"max_price": 2500, "style": None, "occasion": None, "color": None}
+    recs = rank_products(store, resolve_params("UNKNOWN", params, "white sneakers"))
+    assert [r["sku"] for r in recs if not r["related"]] == [f"SNK_{i}" for i in range(4, -1, -1)]
+    # Colour only reaches the semantic text: without any keyword match,
+    # semantic similarity still finds the white products
+    recs = rank_products(store, resolve_params("UNKNOWN", params, "white"))
+    assert recs and all(r["sku"].startswith("BAG_") for r in recs if not r["related"])
+
+
+if __name__ == "__main__":
+    test_query_without_budget()
+    test_cross_sell_matches_full_scan()
+    test_in_stock_cross_sell_from_one_large_group()
+    test_keyword_matches_outrank_semantic_ones()
+    print("✅ recommendation tests passed")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Regression tests for materialized recommendation feeds (runs without the
+server, on fakeredis): python test_recommendation_feed.py, or pytest.
+"""
+
+import os
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("USE_FAKE_REDIS", "true")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from db.redis_client import redis_client
+from routers import catalog
+from routers.recommendation import recommendation_router
+from services import recommendation_feed
+from services.customer_profiles import known_customers
+from services.recommendation_feed import get_feed, materialize, materialize_status, start_materialize
+
+
+def test_one_materialization_at_a_time():
+    redis_client.delete(recommendation_feed.RUN_KEY)
+    # Another worker (or the CLI) is materializing
+    token = recommendation_feed._claim_run()
+    try:
+        assert materialize_status()["running"]
+        assert not start_materialize(1)
+        try:
+            materialize(workers=1)
+            assert False, "a second run must not start"
+        except RuntimeError:
+            pass
+    finally:
+        recommendation_feed._renew_run(token, 0)
+    assert not materialize_status()["running"]
+
+    customers = list(known_customers())
+    assert materialize(workers=1) == len(customers)
+    assert not redis_client.exists(recommendation_feed.RUN_KEY)
+    assert get_feed(customers[0])["source"] == "materialized"
+
+
+def test_batch_and_materialize_need_the_admin_token():
+    app = FastAPI()
+    app.include_router(recommendation_router)
+    client = TestClient(app)
+    saved, catalog.ADMIN_TOKEN = catalog.ADMIN_TOKEN, None
+    try:
+        batch = {"customer_ids": ["CUST_F_001"], "workers": 4}
+        assert client.post("/recommendations/batch", json=batch).status_code == 403
+        assert client.post("/recommendations/feed/materialize").status_code == 403
+        catalog.ADMIN_TOKEN = "secret"
+        headers = {"X-Admin-Token": "guess"}
+        assert client.post("/recommendations/batch", json=batch, headers=headers).status_code == 401
+        assert client.post("/recommendations/feed/materialize", headers=headers).status_code == 401
+        assert not materialize_status()["running"]
+    finally:
+        catalog.ADMIN_TOKEN = saved
+
+
+if __name__ == "__main__":
+    test_one_materialization_at_a_time()
+    test_batch_and_materialize_need_the_admin_token()
+    print("✅ All recommendation feed tests passed")
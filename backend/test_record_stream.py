@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the incremental data file reader (runs without the
+server): python test_record_stream.py, or pytest.
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from services.record_stream import RecordIndex, append_records, iter_records, json_array
+
+RECORDS = [{"id": i, "name": f"record {i}", "tags": ["a", "b"] * i} for i in range(50)] + [7, "x", None]
+
+
+def write(tmp, name, text):
+    path = Path(tmp) / name
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_array_and_jsonl_read_the_same_records():
+    with tempfile.TemporaryDirectory() as tmp:
+        array = write(tmp, "a.json", json.dumps(RECORDS, indent=2))
+        lines = write(tmp, "a.jsonl", "".join(json.dumps(r) + "\n" for r in RECORDS))
+        # Chunks smaller than a record make every record span a boundary
+        for chunk_size in (1, 7, 1 << 16):
+            assert list(iter_records(array, chunk_size)) == RECORDS
+            assert list(iter_records(lines, chunk_size)) == RECORDS
+        assert list(iter_records(write(tmp, "blank.json", " \n"))) == []
+        assert list(iter_records(write(tmp, "empty.json", "[ ]"))) == []
+        # json_array encodes them back
+        assert json.loads(b"".join(json_array(iter_records(array), chunk_size=64))) == RECORDS
+
+
+def test_scalar_cut_at_a_chunk_boundary_is_read_whole():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write(tmp, "n.jsonl", "12345\n678\n")
+        assert list(iter_records(path, 3)) == [12345, 678]
+
+
+def test_truncated_and_malformed_files_raise():
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, text, good in (
+            ("open.json", '[{"id": 1}, {"id": 2}', 2),
+            ("cut.json", '[{"id": 1}, {"id": ', 1),
+            ("cut.jsonl", '{"id": 1}\n{"id": ', 1),
+            ("bad.jsonl", '{"id": 1}\n{id: 2}\n', 1),
+        ):
+            path = write(tmp, name, text)
+            records = []
+            try:
+                for record in iter_records(path, 4):
+                    records.append(record)
+                assert False, name
+            except ValueError:
+                pass
+            # Records before the damage are still yielded
+            assert records == [{"id": i} for i in range(1, good + 1)]
+
+
+def test_append_records_extends_a_jsonl_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "log.jsonl"
+        append_records(path, RECORDS[:2])
+        append_records(path, [])
+        append_records(path, RECORDS[2:4])
+        assert list(iter_records(path)) == RECORDS[:4]
+
+
+def test_record_index_looks_up_ids_and_follows_file_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write(tmp, "a.json", json.dumps(RECORDS + [{"id": 3, "name": "duplicate"}]))
+        index = RecordIndex(path, "id")
+        assert index.get(3)["name"] == "record 3"
+        assert index.get(99) is None
+        stamp = index._stamp
+        index.get(4)
+        assert index._stamp is stamp
+        append_records(write(tmp, "a.json", ""), [{"id": 99, "name": "new"}])
+        os.utime(path, ns=(stamp[0] + 10**9, stamp[0] + 10**9))
+        assert index.get(99)["name"] == "new" and index.get(3) is None
+
+
+if __name__ == "__main__":
+    test_array_and_jsonl_read_the_same_records()
+    test_scalar_cut_at_a_chunk_boundary_is_read_whole()
+    test_truncated_and_malformed_files_raise()
+    test_append_records_extends_a_jsonl_file()
+    test_record_index_looks_up_ids_and_follows_file_changes()
+    print("✅ All record stream tests passed")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Regression tests for chat-turn refinement (runs without the server):
+python test_refinement.py, or pytest.
+"""
+
+import os
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("USE_FAKE_REDIS", "true")
+
+from services.product_store import get_store
+from services.recommendation import rank_products
+from services.recommendation_cache import RESULT_CACHE
+from services.refinement import is_refinement, recommend_turn
+
+CUSTOMER = "C_REFINE_TEST"
+FIRST = "show me floral dresses under 3000"
+# What the orchestrator's keyword heuristics extract from FIRST
+FIRST_PARAMS = {"category": "Apparel", "sub_category": "Dresses", "max_price": 3000}
+
+
+def test_colour_and_size_follow_ups_are_refinements():
+    assert is_refinement("in black", {"color": "black"})
+    assert is_refinement("anything in size M?", {"size": "M"})
+    assert is_refinement("black", {"color": "black"})
+    assert is_refinement("in black dresses", {"category": "Apparel", "color": "black"})
+    assert not is_refinement("in the mood for a party", {})
+    assert not is_refinement("black heels", {"category": "Footwear", "color": "black"})
+
+
+def test_in_black_narrows_the_previous_search():
+    _, first = recommend_turn(CUSTOMER, FIRST_PARAMS, FIRST)
+    recs, refined = recommend_turn(CUSTOMER, {"color": "black"}, "in black", first)
+    filters = refined["filters"]
+    assert filters["category"] == "Apparel"
+    assert filters["max_price"] == 3000
+    assert filters["color"] == "black"
+    assert filters["query"] == FIRST
+    assert "skus" in refined
+    assert recs == rank_products(get_store(), filters)
+
+    # Refining again re-ranks the stored candidates, with the same picks
+    recs, cheaper = recommend_turn(CUSTOMER, {}, "cheaper ones", refined)
+    assert cheaper["filters"]["max_price"] < 3000
+    assert recs == rank_products(get_store(), cheaper["filters"])
+
+
+def test_widened_search_drops_the_previous_query():
+    _, first = recommend_turn(CUSTOMER, FIRST_PARAMS, FIRST)
+    message = "show me heels instead"
+    recs, widened = recommend_turn(CUSTOMER, {"category": "Footwear"}, message, first)
+    assert widened["filters"]["category"] == "Footwear"
+    assert widened["filters"]["query"] == message
+    assert recs == rank_products(get_store(), widened["filters"])
+
+
+def test_new_searches_use_the_result_cache():
+    RESULT_CACHE.clear()
+    hits = RESULT_CACHE.stats()["hits"]
+    recommend_turn(CUSTOMER, FIRST_PARAMS, FIRST)
+    recommend_turn(CUSTOMER, FIRST_PARAMS, FIRST)
+    assert RESULT_CACHE.stats()["hits"] == hits + 1
+
+
+if __name__ == "__main__":
+    test_colour_and_size_follow_ups_are_refinements()
+    test_in_black_narrows_the_previous_search()
+    test_widened_search_drops_the_previous_query()
+    test_new_searches_use_the_result_cache()
+    print("✅ All refinement tests passed")
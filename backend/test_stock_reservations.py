@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Regression tests for stock reservations against ingested inventory deltas
+(runs without the server, on fakeredis): python test_stock_reservations.py,
+or pytest. Each test works on a scratch copy of the inventory data.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("USE_FAKE_REDIS", "true")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from db.redis_client import redis_client
+from routers.inventory import inventory_router
+from services import inventory_service, stock_reservations
+from services.inventory_log import BASE_SNAPSHOT, DeltaLog
+from services.inventory_service import get_stock_levels, ingest_deltas, inventory_index
+from services.order_service import OrderService
+from services.product_store import get_store
+from services.stock_reservations import (
+    adjust_stock, available, commit, release, release_expired, reserve, sync_holds,
+)
+
+SKU = "SNEAKERS_CHUNKY_WHT_01"  # 80 online, 6 in Bengaluru, 3 in Delhi
+
+
+@contextmanager
+def scratch_inventory():
+    saved = inventory_service._LOG, inventory_service._INDEX
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(inventory_service.DATA_DIR / BASE_SNAPSHOT, tmp)
+        inventory_service._LOG = DeltaLog(Path(tmp))
+        inventory_service._INDEX = inventory_service._load_index()
+        redis_client.flushdb()
+        stock_reservations.seed_stock()
+        stock_reservations._group_ready = False
+        try:
+            yield
+        finally:
+            inventory_service._LOG, inventory_service._INDEX = saved
+            redis_client.flushdb()
+            stock_reservations._seeded = False
+
+
+def ingest(deltas):
+    assert "error" not in ingest_deltas(deltas)
+    adjust_stock(deltas)
+
+
+def test_release_after_store_sale_does_not_oversell():
+    with scratch_inventory():
+        held = reserve([{"sku": SKU, "quantity": 79}])
+        assert available(SKU) == 1
+        ingest([{"sku": SKU, "store_id": "ONLINE", "quantity_change": -80}])
+        assert available(SKU) == 0
+        release(held["reservation_id"])
+        assert available(SKU) == 0
+        assert "error" in reserve([{"sku": SKU, "quantity": 1}])
+
+
+def test_delta_for_a_new_store_seeds_its_counter():
+    with scratch_inventory():
+        ingest([{"sku": SKU, "store_id": "STORE_PUNE_FC", "quantity_change": 5,
+                 "store_name": "Pune FC Road", "store_type": "physical"}])
+        assert available(SKU, "STORE_PUNE_FC") == 5
+        short = reserve([{"sku": SKU, "quantity": 6, "store_id": "STORE_PUNE_FC"}])
+        assert short["error"] == "Insufficient stock" and short["available"] == 5
+
+
+def test_holds_and_sales_reach_the_stock_views():
+    with scratch_inventory():
+        row = get_store().row_of(SKU)
+        held = reserve([{"sku": SKU, "quantity": 6, "store_id": "STORE_BLR_ORION"}])
+        assert sync_holds() == 1
+        assert get_stock_levels(SKU).cities["Bengaluru"] == 0
+        assert not get_store().stock.mask("STORE_BLR_ORION") >> row & 1
+
+        assert commit(held["reservation_id"])["status"] == "committed"
+        assert sync_holds() == 1
+        item = inventory_index().by_sku_store[(SKU, "STORE_BLR_ORION")]
+        assert (item.quantity_available, item.quantity_reserved) == (0, 0)
+        assert available(SKU, "STORE_BLR_ORION") == 0
+
+        ingest([{"sku": SKU, "store_id": "STORE_BLR_ORION", "quantity_change": 2}])
+        assert get_store().stock.mask("STORE_BLR_ORION") >> row & 1
+
+
+def test_failed_hold_log_write_is_retried():
+    with scratch_inventory():
+        reserve([{"sku": SKU, "quantity": 6, "store_id": "STORE_BLR_ORION"}])
+        # The request only touched Redis
+        assert get_stock_levels(SKU).cities["Bengaluru"] == 6
+
+        def locked_out(deltas):
+            raise TimeoutError("inventory_deltas.lock is held by another process")
+
+        stock_reservations.ingest_deltas = locked_out
+        try:
+            sync_holds()
+            assert False, "the write error must reach the sync loop"
+        except TimeoutError:
+            pass
+        finally:
+            stock_reservations.ingest_deltas = ingest_deltas
+        assert sync_holds() == 1
+        assert get_stock_levels(SKU).cities["Bengaluru"] == 0
+        assert sync_holds() == 0
+
+
+def test_stock_version_moves_only_when_a_product_flips():
+    with scratch_inventory():
+        stock = get_store().stock
+        before = stock.mask_version("STORE_DELHI_CP")
+        ingest([{"sku": SKU, "store_id": "STORE_DELHI_CP", "quantity_change": -2}])
+        assert stock.mask_version("STORE_DELHI_CP") == before
+        ingest([{"sku": SKU, "store_id": "STORE_DELHI_CP", "quantity_change": -1}])
+        sold_out = stock.mask_version("STORE_DELHI_CP")
+        assert sold_out != before
+        # Other scopes' results stay cached
+        online = stock.mask_version("online")
+        ingest([{"sku": SKU, "store_id": "STORE_DELHI_CP", "quantity_change": 4}])
+        assert stock.mask_version("online") == online
+        assert stock.mask_version("STORE_DELHI_CP") != sold_out
+
+
+def test_reservation_api_bounds_ttl_and_checks_the_holder():
+    app = FastAPI()
+    app.include_router(inventory_router)
+    client = TestClient(app)
+    with scratch_inventory():
+        line = [{"sku": SKU, "quantity": 1}]
+        assert client.post("/reservations", json={"items": line, "ttl": 999999999}).status_code == 422
+        held = client.post("/reservations", json={"items": line, "ttl": 60}).json()
+        url = f"/reservations/{held['reservation_id']}"
+        assert client.post(f"{url}/release").status_code == 403
+        assert client.post(f"{url}/commit", headers={"X-Reservation-Token": "guess"}).status_code == 403
+        response = client.post(f"{url}/release", headers={"X-Reservation-Token": held["token"]})
+        assert response.json()["status"] == "released"
+
+
+def _order_with_expired_hold(quantity):
+    items = [{"sku": SKU, "quantity": quantity}]
+    held = reserve(items, ttl=-1)
+    order = OrderService.create_order("C_STOCK_TEST", items, {"total": 1}, reservation_id=held["reservation_id"])
+    payment = OrderService.init_payment(order["order_id"])
+    release_expired()
+    return payment["payment_id"]
+
+
+def test_payment_takes_an_expired_hold_again():
+    with scratch_inventory():
+        payment_id = _order_with_expired_hold(10)
+        assert available(SKU) == 80
+        assert OrderService.process_payment(payment_id, {"status": "success"})["status"] == "success"
+        assert available(SKU) == 70
+
+
+def test_capture_is_refused_when_an_expired_hold_sold_out():
+    with scratch_inventory():
+        payment_id = _order_with_expired_hold(10)
+        ingest([{"sku": SKU, "store_id": "ONLINE", "quantity_change": -75}])
+        assert OrderService.hold_stock(payment_id)["error"] == "Insufficient stock"
+        assert available(SKU) == 5
+
+
+def test_capture_holds_an_expired_order_again():
+    with scratch_inventory():
+        payment_id = _order_with_expired_hold(10)
+        assert OrderService.hold_stock(payment_id)["reservation_id"]
+        assert available(SKU) == 70
+
+
+def test_stock_gone_after_capture_awaits_a_refund():
+    with scratch_inventory():
+        payment_id = _order_with_expired_hold(10)
+        ingest([{"sku": SKU, "store_id": "ONLINE", "quantity_change": -75}])
+        result = OrderService.process_payment(payment_id, {"status": "success"})
+        assert result["status"] == "refund_pending"
+        assert OrderService.get_payment_status(payment_id)["status"] == "completed"
+        assert OrderService.get_order(result["order_id"])["status"] == "refund_pending"
+        assert available(SKU) == 5
+
+
+if __name__ == "__main__":
+    test_release_after_store_sale_does_not_oversell()
+    test_delta_for_a_new_store_seeds_its_counter()
+    test_holds_and_sales_reach_the_stock_views()
+    test_failed_hold_log_write_is_retried()
+    test_stock_version_moves_only_when_a_product_flips()
+    test_reservation_api_bounds_ttl_and_checks_the_holder()
+    test_payment_takes_an_expired_hold_again()
+    test_capture_is_refused_when_an_expired_hold_sold_out()
+    test_capture_holds_an_expired_order_again()
+    test_stock_gone_after_capture_awaits_a_refund()
+    print("✅ All stock reservation tests passed")
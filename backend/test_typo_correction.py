@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Regression tests for typo-tolerant matching (services/fuzzy_match.py):
+python test_typo_correction.py, or pytest.
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("USE_FAKE_REDIS", "true")
+
+from graph.nodes import infer_params_from_text
+from services import fuzzy_match
+from services.fuzzy_match import TrigramIndex, closest_term
+from services.product_store import get_store
+
+KEYWORDS = ["shoe", "shoes", "sneakers", "bag", "denim", "tee", "shirt", "kurta", "dress"]
+# Stands in for the system word list
+WORDS = ["a", "for", "jacked", "means", "short", "shout", "truck", "up", "what", "wheel", "white"]
+
+
+@contextmanager
+def word_list(words):
+    """Use `words` as the word list (None: no word list at all)"""
+    saved = fuzzy_match.DICTIONARY_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "words"
+        if words is not None:
+            path.write_text("\n".join(words) + "\n", encoding="utf-8")
+        fuzzy_match.DICTIONARY_FILE = path
+
+        def clear():
+            fuzzy_match.english_words.cache_clear()
+            fuzzy_match._term_index.cache_clear()
+            get_store().index.vocabulary.lookup.cache_clear()
+
+        clear()
+        try:
+            yield
+        finally:
+            fuzzy_match.DICTIONARY_FILE = saved
+            clear()
+
+
+def test_typos_are_corrected():
+    with word_list(WORDS):
+        assert closest_term("white snekers", KEYWORDS) == "sneakers"
+        assert closest_term("a kurtha for diwali", KEYWORDS) == "kurta"
+        assert get_store().index.correct_tokens(["snekers"]) == ["sneakers"]
+        assert infer_params_from_text("white snekers")["sub_category"] == "Sneakers"
+
+
+def test_words_beyond_the_edit_limit_do_not_match():
+    # One edit is allowed at these lengths; each word is two or more away
+    with word_list([]):
+        for word in ("shout", "bagel", "dense", "teens"):
+            assert closest_term(word, KEYWORDS) is None, word
+    index = TrigramIndex(KEYWORDS)
+    assert index.lookup("shout") == ()
+    assert index.lookup("dense") == ()
+
+
+def test_everyday_words_are_not_typos():
+    with word_list(WORDS):
+        # One edit from "shirt" / "jeans" / "jacket", but meant as typed
+        assert closest_term("short", KEYWORDS + ["jeans"]) is None
+        assert closest_term("what it means", KEYWORDS + ["jeans"]) is None
+        assert get_store().index.vocabulary.lookup("jacked") == ()
+        for text in ("wheel", "jacked", "a jacked up truck wheel"):
+            params = infer_params_from_text(text)
+            assert "category" not in params, (text, params)
+
+
+def test_without_a_word_list_typos_only_adjust_scores():
+    with word_list(None):
+        assert closest_term("white snekers", KEYWORDS) is None
+        for text in ("jacked", "white snekers"):
+            params = infer_params_from_text(text)
+            assert "category" not in params, (text, params)
+        # Relevance scoring still reads it as sneakers
+        assert get_store().index.correct_tokens(["snekers"]) == ["sneakers"]
+
+
+def test_keywords_match_whole_words():
+    assert "category" not in infer_params_from_text("wheel")
+    assert "category" not in infer_params_from_text("bagel")
+    assert infer_params_from_text("floral dresses")["sub_category"] == "Dresses"
+    assert infer_params_from_text("black tshirts")["sub_category"] == "T-Shirts"
+    assert infer_params_from_text("show me kurtas")["sub_category"] == "Kurtas"
+
+
+def test_no_category_from_unrelated_words():
+    params = infer_params_from_text("shout")
+    assert "category" not in params, params
+
+
+if __name__ == "__main__":
+    test_typos_are_corrected()
+    test_words_beyond_the_edit_limit_do_not_match()
+    test_everyday_words_are_not_typos()
+    test_without_a_word_list_typos_only_adjust_scores()
+    test_keywords_match_whole_words()
+    test_no_category_from_unrelated_words()
+    print("✅ typo correction tests passed")